@@ -1,7 +1,10 @@
 import sys
 import os
+import signal
+import asyncio
 import argparse
 import threading
+import contextlib
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -16,7 +19,6 @@ if sys.platform == 'darwin':
 
 from rich.console import Console
 from rich.panel import Panel
-import time
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.markdown import Markdown
 from rich.text import Text
@@ -32,8 +34,14 @@ from services.llm_handler import (
     AutoImplementHandler,
     LocalCodingHandler
 )
-from services.mcpserver import start_mcp_server
+from services.mcpserver import create_mcp_server, start_mcp_server
 from services.mcpclient import MCPClient
+from services.backend_router import BackendRouter
+from utils.telemetry import UsageRecorder, summarize_usage, format_usage_summary
+from services.session_db import SessionDatabase, format_session_list, format_search_results, stored_contents_containing
+from services.blob_store import BlobStore
+from services.batch import BatchRunner, load_prompts, summarize_results
+from utils.cancellation import CANCELLED_MESSAGE
 
 console = Console()
 
@@ -49,6 +57,210 @@ def start_background_mcp():
         }
     ).start()
 
+def start_sandboxed_mcp(sandbox_path: Path):
+    """
+    Starts another MCP server confined to `sandbox_path` on a free port, for
+    batch prompts that work on a different directory; returns the server and
+    a client for it.
+    """
+    server = create_mcp_server(config.MCP_SERVER_HOST, 0, sandbox_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = MCPClient(
+        endpoint=f"http://{config.MCP_SERVER_HOST}:{server.server_address[1]}",
+        api_key=config.MCP_API_KEY
+    )
+    return server, client
+
+async def read_input(prompt: str) -> str:
+    """console.input() on a daemon thread, so the event loop stays free while the user types."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(line, error):
+        if not future.done():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(line)
+
+    def reader():
+        try:
+            line, error = console.input(prompt), None
+        except BaseException as e:
+            line, error = None, e
+        with contextlib.suppress(RuntimeError):  # The loop is gone if the REPL already exited
+            loop.call_soon_threadsafe(resolve, line, error)
+
+    threading.Thread(target=reader, daemon=True).start()
+    return await future
+
+@contextlib.contextmanager
+def interrupt_handler(loop: asyncio.AbstractEventLoop, callback):
+    """Routes Ctrl-C to `callback` on the event loop instead of raising KeyboardInterrupt."""
+    try:
+        loop.add_signal_handler(signal.SIGINT, callback)
+    except (NotImplementedError, RuntimeError):
+        # Windows event loops have no add_signal_handler
+        previous = signal.signal(signal.SIGINT, lambda signum, frame: loop.call_soon_threadsafe(callback))
+        try:
+            yield
+        finally:
+            signal.signal(signal.SIGINT, previous)
+        return
+    try:
+        yield
+    finally:
+        loop.remove_signal_handler(signal.SIGINT)
+
+async def rotate_silly_messages(ctx: CommandContext, progress: Progress, task_id):
+    while not ctx.cancel_event.is_set():
+        color, message = get_silly_message()
+        progress.update(task_id, description=f"[{color}]{message}[/]")
+        await asyncio.sleep(7)
+
+async def run_request(ctx: CommandContext, processor: CommandProcessor, user_input: str):
+    """
+    Runs one request on a worker thread while the event loop keeps the spinner
+    and Ctrl-C responsive. Ctrl-C sets ctx.cancel_event; the handlers stop at
+    their next model token, tool call or shell poll, roll the conversation
+    back, and the REPL returns to the prompt.
+    """
+    loop = asyncio.get_running_loop()
+    ctx.cancel_event.clear()
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        TextColumn("({task.elapsed:.2f}s)"),
+        console=console,
+        transient=True
+    ) as progress:
+        task_id = progress.add_task("", total=None)
+
+        def cancel():
+            if not ctx.cancel_event.is_set():
+                ctx.cancel_event.set()
+                progress.update(task_id, description="[yellow]Cancelling...[/]")
+
+        request = loop.run_in_executor(None, processor.execute, user_input)
+        messages = asyncio.create_task(rotate_silly_messages(ctx, progress, task_id))
+        with interrupt_handler(loop, cancel):
+            try:
+                response = await request
+            finally:
+                messages.cancel()
+
+        final_message = progress.tasks[task_id].description
+        progress.stop_task(task_id)
+        total_time = progress.tasks[task_id].elapsed
+
+    if response == CANCELLED_MESSAGE:
+        console.print(f"\n{response} ({total_time:.2f}s)")
+        return
+    console.print("\n🤖 [bold]Assistant:[/]")
+    console.print(f"{final_message} ({total_time:.2f}s)")
+    console.print(Panel(Markdown(response), title=f"🤖 {ctx.model_name}", border_style="#9c9a9a"))
+
+class NotFoundHandler(CommandHandler):
+    """Fallback handler for unknown commands."""
+    def can_handle(self) -> bool:
+        return True
+    def handle(self) -> None:
+        self.ctx.response = f"[red]Error:[/] Command not found: {self.ctx.user_input}"
+
+def make_context(args, root_path: Path, mcp_client: MCPClient, backend_router=None) -> CommandContext:
+    ctx = CommandContext(
+        root_path=root_path,
+        mcp_client=mcp_client,
+        sandbox_path=config.SANDBOX_PATH
+    )
+    ctx.debug_mode = args.debug or config.DEBUG_MODE
+    ctx.dry_run = args.dry_run
+    ctx.auto_confirm = args.auto_confirm
+    ctx.budget_seconds = args.budget_seconds
+    ctx.budget_tokens = args.budget_tokens
+    ctx.budget_tool_calls = args.budget_tool_calls
+    ctx.session_name = args.session
+    ctx.backend_router = backend_router
+    return ctx
+
+def build_processor(ctx: CommandContext, llm=None, llm_lock=None) -> CommandProcessor:
+    """The middleware and handler chain; `llm`/`llm_lock` share an already loaded local model."""
+    processor = CommandProcessor(ctx)
+    processor.add_middleware(SecurityMiddleware(ctx))
+    processor.add_handler(FilesystemCommandHandler(ctx))
+    processor.add_handler(DeepSeekAnalysisHandler(ctx))
+    processor.add_handler(AutoImplementHandler(ctx))
+    processor.add_handler(LocalCodingHandler(ctx, llm=llm, llm_lock=llm_lock))
+    processor.add_handler(NotFoundHandler(ctx))
+    return processor
+
+def run_batch(args, project_dir: Path, mcp_client: MCPClient, backend_router=None) -> int:
+    """
+    Runs the prompts in `args.batch` headlessly and writes one JSON result per
+    prompt; returns the exit status (1 if any prompt failed). Confirmations
+    follow --confirm-policy instead of reading stdin, and every context shares
+    one loaded local model, serialized by its lock. A prompt with its own
+    "dir" gets an MCP server sandboxed to that directory, so its file tools
+    work on the same tree as its shell commands.
+    """
+    prompts_path = Path(args.batch)
+    output_path = Path(args.output) if args.output else prompts_path.with_suffix(".results.jsonl")
+    try:
+        items = load_prompts(prompts_path)
+    except OSError as e:
+        console.print(f"[red]Error:[/] Could not read {prompts_path}: {e}")
+        return 1
+
+    shared_model = {}
+    shared_model_lock = threading.Lock()
+    sandboxes = {}
+    sandboxes_lock = threading.Lock()
+    sandbox_root = Path(config.SANDBOX_PATH).resolve()
+
+    def client_for(root_path: Path) -> MCPClient:
+        if root_path == project_dir:
+            return mcp_client
+        if not root_path.is_relative_to(sandbox_root):
+            raise ValueError(f"Project directory is outside the sandbox: {root_path}")
+        with sandboxes_lock:
+            if root_path not in sandboxes:
+                sandboxes[root_path] = start_sandboxed_mcp(root_path)
+            return sandboxes[root_path][1]
+
+    def make_processor(root_path: Path, session_name: str) -> CommandProcessor:
+        ctx = make_context(args, root_path, client_for(root_path), backend_router)
+        ctx.session_name = session_name
+        ctx.confirm_policy = args.confirm_policy or config.BATCH_CONFIRM_POLICY
+        with shared_model_lock:
+            processor = build_processor(ctx, shared_model.get("llm"), shared_model.get("lock"))
+            local = next(h for h in processor.handlers if isinstance(h, LocalCodingHandler))
+            shared_model.setdefault("llm", local.llm)
+            shared_model.setdefault("lock", local.llm_lock)
+        return processor
+
+    def report(result):
+        mark = {"ok": "[green]✓[/]", "cancelled": "[yellow]-[/]"}.get(result["status"], "[red]✗[/]")
+        detail = result.get("error") or f"{result['tokens']} tokens"
+        console.print(f"{mark} {result['id']} {result['status']} ({result['seconds']:.1f}s, {detail})")
+
+    runner = BatchRunner(make_processor, project_dir, concurrency=args.concurrency)
+    console.print(f"[bold]Running {len(items)} prompts ({runner.concurrency} at a time) -> {output_path}[/]")
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        with interrupt_handler(loop, runner.cancel):
+            return await runner.run(items, output_path, on_result=report)
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        for server, _ in sandboxes.values():
+            server.shutdown()
+            server.server_close()
+    counts = summarize_results(results)
+    console.print("[bold]Batch finished:[/] " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    return 0 if set(counts) <= {"ok"} else 1
+
 def create_env_template_if_needed():
     """Create a .env file from a template if one doesn't exist."""
     env_path = Path('.env')
@@ -65,6 +277,69 @@ def create_env_template_if_needed():
             f.write(template)
         console.print("[bold yellow]Created a new .env file. Please edit it to add your DeepSeek API key.[/]")
 
+async def repl(ctx: CommandContext, processor: CommandProcessor, project_dir: Path):
+    """Reads commands until exit; Ctrl-C cancels the request in flight, or ends the session at the prompt."""
+    while True:
+        try:
+            user_input = (await read_input("\n👤 [bold]You:[/] ")).strip()
+        except EOFError:
+            break
+        if not user_input:
+            continue
+        if user_input.lower() in ('exit', 'quit'):
+            break
+        if user_input.lower() == 'clear':
+            for handler in processor.handlers:
+                if isinstance(handler, LocalCodingHandler):
+                    handler.clear_history()
+            console.print("[green]Local conversation history cleared.[/]")
+            continue
+        if user_input.lower() == 'stats':
+            summary = summarize_usage(UsageRecorder(project_dir).load())
+            report = format_usage_summary(summary)
+            for handler in processor.handlers:
+                if getattr(handler, 'response_cache', None) is not None:
+                    cache_stats = handler.response_cache.stats()
+                    report += "\n\n**Response cache:** " + ", ".join(f"{k}={v}" for k, v in cache_stats.items())
+            console.print(Panel(Markdown(report), title="📊 Model usage", border_style="#9c9a9a"))
+            continue
+        words = user_input.split()
+        if config.SESSION_STORE == "sqlite" and (
+                (words[0].lower() == 'sessions' and (len(words) == 1 or words[1].lower() in ('search', 'delete')))
+                or (words[0].lower() == 'session' and len(words) == 2)):
+            command, _, argument = user_input.partition(" ")
+            argument = argument.strip()
+            database = SessionDatabase.for_root(project_dir)
+            if command.lower() == 'session' and argument:
+                for handler in processor.handlers:
+                    if hasattr(handler, 'switch_session'):
+                        handler.switch_session(argument)
+                ctx.session_name = argument
+                console.print(f"[green]Switched to session '{argument}'.[/]")
+            elif argument.lower().startswith('search '):
+                results = database.search(argument[len('search '):])
+                console.print(Panel(Markdown(format_search_results(results)), title="🔎 Past conversations", border_style="#9c9a9a"))
+            elif argument.lower().startswith('delete '):
+                name = argument[len('delete '):].strip()
+                if name == ctx.session_name:
+                    console.print("[red]Error:[/] Switch to another session before deleting this one.")
+                else:
+                    deleted = [h for h in ('deepseek', 'local') if database.delete_session(h, name)]
+                    console.print(f"[green]Deleted session '{name}'.[/]" if deleted else f"[red]Error:[/] No session '{name}'.")
+            else:
+                table = format_session_list(database.list_sessions(), current=ctx.session_name)
+                usage = "\n\n`session <name>` switches, `sessions search <text>` searches, `sessions delete <name>` deletes."
+                console.print(Panel(Markdown(table + usage), title="💬 Sessions", border_style="#9c9a9a"))
+            continue
+        if user_input.lower() == '@deepseek clear':
+            for handler in processor.handlers:
+                if isinstance(handler, DeepSeekAnalysisHandler):
+                    handler.clear_history()
+            console.print("[green]DeepSeek conversation history cleared.[/]")
+            continue
+
+        await run_request(ctx, processor, user_input)
+
 def main():
     create_env_template_if_needed()
     parser = argparse.ArgumentParser(description="DeepCoderX - AI Coding Assistant")
@@ -72,7 +347,20 @@ def main():
     parser.add_argument("--debug", action="store_true", help="Enable debug mode")
     parser.add_argument("--dry-run", action="store_true", help="Enable dry-run mode")
     parser.add_argument("--auto-confirm", action="store_true", help="Auto-confirm file modifications")
+    parser.add_argument("--budget-seconds", type=float, help="Wall-clock limit per request")
+    parser.add_argument("--budget-tokens", type=int, help="Total token limit per request")
+    parser.add_argument("--budget-tool-calls", type=int, help="Tool call limit per request")
+    parser.add_argument("--session", default=SessionDatabase.DEFAULT_SESSION, help="Named conversation to resume or start")
+    parser.add_argument("--batch", metavar="PROMPTS_JSONL", help="Run the prompts in a JSONL file headlessly and exit")
+    parser.add_argument("--output", help="Batch results file (default: <prompts>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, help="Batch prompts in flight at once (default: BATCH_CONCURRENCY)")
+    parser.add_argument("--confirm-policy", choices=("approve", "deny"),
+                        help="Answer to file-modifying confirmations in batch mode (default: BATCH_CONFIRM_POLICY)")
     args = parser.parse_args()
+    # Batch files are named relative to where the command was run, not the project
+    for name in ("batch", "output"):
+        if getattr(args, name):
+            setattr(args, name, str(Path(getattr(args, name)).resolve()))
     
     try:
         project_dir = Path(args.dir).resolve()
@@ -90,29 +378,18 @@ def main():
         api_key=config.MCP_API_KEY
     )
     
-    ctx = CommandContext(
-        root_path=project_dir,
-        mcp_client=mcp_client,
-        sandbox_path=config.SANDBOX_PATH
+    if config.SESSION_STORE == "sqlite":
+        SessionDatabase.for_root(project_dir).apply_retention()
+    BlobStore.for_root(project_dir).collect_garbage(
+        stored_contents_containing(project_dir, "<<blob:") + stored_contents_containing(project_dir, "Handle: res-")
     )
-    ctx.debug_mode = args.debug or config.DEBUG_MODE
-    ctx.dry_run = args.dry_run
-    ctx.auto_confirm = args.auto_confirm
-    
-    processor = CommandProcessor(ctx)
-    processor.add_middleware(SecurityMiddleware(ctx))
-    processor.add_handler(FilesystemCommandHandler(ctx))
-    processor.add_handler(DeepSeekAnalysisHandler(ctx))
-    processor.add_handler(AutoImplementHandler(ctx))
-    processor.add_handler(LocalCodingHandler(ctx))
-
-    # Add a fallback handler for unknown commands
-    class NotFoundHandler(CommandHandler):
-        def can_handle(self) -> bool:
-            return True
-        def handle(self) -> None:
-            self.ctx.response = f"[red]Error:[/] Command not found: {self.ctx.user_input}"
-    processor.add_handler(NotFoundHandler(ctx))
+    backend_router = BackendRouter() if config.ROUTER_ENABLED else None
+
+    if args.batch:
+        sys.exit(run_batch(args, project_dir, mcp_client, backend_router))
+
+    ctx = make_context(args, project_dir, mcp_client, backend_router)
+    processor = build_processor(ctx)
 
     # Display the startup logo
    
@@ -133,83 +410,20 @@ def main():
         f"[bold]DeepCoderX[/] | [green]Project:[/] {project_dir.name}",
         border_style="#9c9a9a"
     ))
-    console.print("[dim]Type 'exit' or 'quit' to end the session.[/]")
+    console.print("[dim]Type 'exit' or 'quit' to end the session, 'stats' for model usage, "
+                  "'sessions' to list or search past conversations.[/]")
 
-    while True:
-        try:
-            user_input = console.input("\n👤 [bold]You:[/] ").strip()
-            if not user_input:
-                continue
-            if user_input.lower() in ('exit', 'quit'):
-                raise KeyboardInterrupt
-            if user_input.lower() == 'clear':
-                for handler in processor.handlers:
-                    if isinstance(handler, LocalCodingHandler):
-                        handler.clear_history()
-                console.print("[green]Local conversation history cleared.[/]")
-                continue
-            if user_input.lower() == '@deepseek clear':
-                for handler in processor.handlers:
-                    if isinstance(handler, DeepSeekAnalysisHandler):
-                        handler.clear_history()
-                console.print("[green]DeepSeek conversation history cleared.[/]")
-                continue
-
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                TextColumn("({task.elapsed:.2f}s)"),
-                console=console,
-                transient=True
-            ) as progress:
-                task_id = progress.add_task("", total=None)
-                
-                # Run the AI execution in a separate thread
-                response = None
-                def ai_task():
-                    nonlocal response
-                    response = processor.execute(user_input)
-
-                ai_thread = threading.Thread(target=ai_task)
-                ai_thread.start()
-
-                # And run the silly message updater in another thread
-                stop_silly_updater = threading.Event()
-                def silly_updater():
-                    while not stop_silly_updater.is_set():
-                        color, message = get_silly_message()
-                        progress.update(task_id, description=f"[{color}]{message}[/]")
-                        time.sleep(7)
-                
-                silly_thread = threading.Thread(target=silly_updater, daemon=True)
-                silly_thread.start()
-
-                # Keep the main thread responsive for the timer
-                while ai_thread.is_alive():
-                    time.sleep(0.1)
-
-                stop_silly_updater.set()
-                ai_thread.join()
-                final_message = progress.tasks[task_id].description
-                progress.stop_task(task_id)
-                total_time = progress.tasks[task_id].elapsed
-                
-                console.print("\n🤖 [bold]Assistant:[/]")
-                console.print(f"{final_message} ({total_time:.2f}s)")
-                console.print(Panel(Markdown(response), title=f"🤖 {ctx.model_name}", border_style="#9c9a9a"))
-
-        except (KeyboardInterrupt, EOFError):
-            if 'ai_thread' in locals() and ai_thread.is_alive():
-                # Give the AI thread a moment to finish
-                ai_thread.join(timeout=1.0)
-            
-            # Save session histories on exit
-            for handler in processor.handlers:
-                if hasattr(handler, '_save_history'):
-                    handler._save_history()
+    try:
+        asyncio.run(repl(ctx, processor, project_dir))
+    except KeyboardInterrupt:
+        pass
 
-            console.print("\n[bold]Session ended[/]")
-            break
+    # Save session histories on exit
+    for handler in processor.handlers:
+        if hasattr(handler, '_save_history'):
+            handler._save_history()
+
+    console.print("\n[bold]Session ended[/]")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -23,6 +23,11 @@ class Config:
     DEEPSEEK_ENABLED = os.getenv("DEEPSEEK_ENABLED", "true").lower() == "true"
     DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
     DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+
+    # Opt-in on-disk cache for identical DeepSeek requests (bypass per command with --no-cache)
+    DEEPSEEK_CACHE_ENABLED = os.getenv("DEEPSEEK_CACHE_ENABLED", "false").lower() == "true"
+    DEEPSEEK_CACHE_TTL = int(os.getenv("DEEPSEEK_CACHE_TTL", "86400"))  # seconds
+    DEEPSEEK_CACHE_MAX_ENTRIES = int(os.getenv("DEEPSEEK_CACHE_MAX_ENTRIES", "500"))
     
     # Local model configuration
     DUAL_MODEL_MODE = os.getenv("DUAL_MODEL_MODE", "true").lower() == "true"
@@ -36,6 +41,9 @@ class Config:
         default_model_path = Path.home() / ".cache" / "lm-studio" / "models" / "Qwen" / "Qwen2.5-Coder-1.5B-Instruct-GGUF" / "qwen2.5-coder-1.5b-instruct-q8_0.gguf"
         LOCAL_MODEL_PATH = os.getenv("LOCAL_MODEL_PATH", str(default_model_path))
     
+    # Constrain local tool calls with a GBNF grammar and stop generation after a complete call
+    LOCAL_CONSTRAINED_DECODING = os.getenv("LOCAL_CONSTRAINED_DECODING", "false").lower() == "true"
+
     # System role definition
     DEEPSEEK_SYSTEM_PROMPT = os.getenv(
         "DEEPSEEK_SYSTEM_PROMPT",
@@ -49,7 +57,11 @@ class Config:
         - `read_file(path: str)`: Reads the content of a file.\n
         - `write_file(path: str, content: str)`: Writes content to a file.\n
         - `list_dir(path: str)`: Lists the contents of a directory.\n
-        - `delete_path(path: str)`: Deletes a file or directory. This tool is disabled for you.\n\n
+        - `delete_path(path: str)`: Deletes a file or directory. This tool is disabled for you.\n
+        - `read_result(handle: str, page: int)`: Reads another page of a truncated tool result.\n
+        - `search_code(query: str)`: Ranks functions and classes across the project by keyword relevance and returns their locations.\n
+        - `semantic_search(query: str)`: Finds code by meaning rather than exact keywords, using local embeddings. Use it when search_code misses because the code uses different words.\n
+        - `find_dependents(path: str, transitive: bool)`: Lists the project files that import a file, directly or transitively. Use it to find every file a refactor affects.\n\n
         """
     )
     LOCAL_SYSTEM_PROMPT = os.getenv(
@@ -61,6 +73,7 @@ When you need to access files, you must use these tools. You can only use one to
 - `read_file(path: str)`: Reads the content of a file.
 - `write_file(path: str, content: str)`: Writes content to a file.
 - `list_dir(path: str)`: Lists the contents of a directory.
+- `read_result(handle: str, page: int)`: Reads another page of a truncated tool result.
 
 To use a tool, respond with a JSON object like this: 
 {\"tool\": \"read_file\", \"path\": \"/path/to/file.py\"}
@@ -68,6 +81,103 @@ To use a tool, respond with a JSON object like this:
 After you use a tool, the system will provide you with the result, and you can then continue the conversation.
 If you have enough information to answer the user's request, provide the final answer directly without using a tool."""
     )
+    # Backend routing between the local model and DeepSeek
+    ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+    ROUTER_LOCAL_MAX_PROMPT_TOKENS = int(os.getenv("ROUTER_LOCAL_MAX_PROMPT_TOKENS", "1500"))
+    ROUTER_CONTEXT_THRESHOLD = int(os.getenv("ROUTER_CONTEXT_THRESHOLD", "2"))
+    ROUTER_SLOW_SECONDS = float(os.getenv("ROUTER_SLOW_SECONDS", "30"))
+    ROUTER_COOLDOWN_SECONDS = float(os.getenv("ROUTER_COOLDOWN_SECONDS", "30"))
+
+    # Caps on project file discovery (0 disables a cap)
+    FS_WALK_MAX_FILES = int(os.getenv("FS_WALK_MAX_FILES", "20000"))
+    FS_WALK_MAX_SECONDS = float(os.getenv("FS_WALK_MAX_SECONDS", "5"))
+
+    # File tree embedded in the context file (0 disables a cap)
+    FILE_TREE_MAX_DEPTH = int(os.getenv("FILE_TREE_MAX_DEPTH", "4"))
+    FILE_TREE_MAX_ENTRIES = int(os.getenv("FILE_TREE_MAX_ENTRIES", "25"))
+    FILE_TREE_MAX_LINES = int(os.getenv("FILE_TREE_MAX_LINES", "300"))
+
+    # Query-specific code chunks (BM25) added to each DeepSeek question
+    CONTEXT_SEARCH_ENABLED = os.getenv("CONTEXT_SEARCH_ENABLED", "true").lower() == "true"
+    CONTEXT_SEARCH_MAX_TOKENS = int(os.getenv("CONTEXT_SEARCH_MAX_TOKENS", "3000"))
+    CONTEXT_SEARCH_MAX_CHUNKS = int(os.getenv("CONTEXT_SEARCH_MAX_CHUNKS", "8"))
+
+    # Conversation store: "sqlite" (named, searchable sessions in .deepcoderx/sessions.db) or "jsonl" (one log per handler)
+    SESSION_STORE = os.getenv("SESSION_STORE", "sqlite").lower()
+    # Session database retention (0 disables a limit)
+    SESSION_RETENTION_DAYS = int(os.getenv("SESSION_RETENTION_DAYS", "90"))
+    SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "50"))
+    SESSION_MAX_ARCHIVED_MESSAGES = int(os.getenv("SESSION_MAX_ARCHIVED_MESSAGES", "2000"))
+
+    # Tool outputs at least this many characters are stored once in .deepcoderx/blobs and referenced from the history
+    BLOB_MIN_BYTES = int(os.getenv("BLOB_MIN_BYTES", "2048"))
+    BLOB_CACHE_ENTRIES = int(os.getenv("BLOB_CACHE_ENTRIES", "64"))
+
+    # Session logs: fsync interval, records between snapshots, and the size that triggers compaction
+    SESSION_FSYNC_SECONDS = float(os.getenv("SESSION_FSYNC_SECONDS", "1"))
+    SESSION_SNAPSHOT_EVERY = int(os.getenv("SESSION_SNAPSHOT_EVERY", "100"))
+    SESSION_COMPACT_BYTES = int(os.getenv("SESSION_COMPACT_BYTES", str(4 * 1024 * 1024)))
+
+    # Share of project files added or removed before the context file's tree section is re-rendered
+    CONTEXT_REFRESH_THRESHOLD = float(os.getenv("CONTEXT_REFRESH_THRESHOLD", "0.05"))
+
+    # Token budget of the ranked repository map sent with a session's first DeepSeek question (0 disables it)
+    REPO_MAP_MAX_TOKENS = int(os.getenv("REPO_MAP_MAX_TOKENS", "1024"))
+
+    # How question-specific chunks are ranked: "bm25" (keywords), "embedding" (local model) or "hybrid" (both, fused)
+    CONTEXT_STRATEGY = os.getenv("CONTEXT_STRATEGY", "bm25").lower()
+
+    # Local embedding index: model (required for the "embedding"/"hybrid" strategies; a second model is
+    # loaded, so pick a small embedding model), context size, batch size and text per chunk
+    EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH", "")
+    EMBEDDING_N_CTX = int(os.getenv("EMBEDDING_N_CTX", "512"))
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "16"))
+    EMBEDDING_MAX_CHARS = int(os.getenv("EMBEDDING_MAX_CHARS", "1500"))
+    # How long the semantic_search tool waits for a cold index before answering "still building"
+    SEMANTIC_SEARCH_WAIT_SECONDS = float(os.getenv("SEMANTIC_SEARCH_WAIT_SECONDS", "5"))
+
+    # Minimum seconds between filesystem rescans of the project index
+    PROJECT_INDEX_REFRESH_SECONDS = float(os.getenv("PROJECT_INDEX_REFRESH_SECONDS", "5"))
+
+    # Symbol extraction: process pool size (0 = CPU count) and the batch size that warrants one
+    SYMBOL_EXTRACT_WORKERS = int(os.getenv("SYMBOL_EXTRACT_WORKERS", "0"))
+    SYMBOL_PARALLEL_MIN_FILES = int(os.getenv("SYMBOL_PARALLEL_MIN_FILES", "200"))
+
+    # NLU model backend: "auto" (local model when present, else DeepSeek), "local" or "deepseek"
+    NLU_BACKEND = os.getenv("NLU_BACKEND", "auto").lower()
+
+    # NLU request deadline, retry backoff and optional hedging of slow DeepSeek calls
+    NLU_DEADLINE_SECONDS = float(os.getenv("NLU_DEADLINE_SECONDS", "15"))
+    NLU_MAX_RETRIES = int(os.getenv("NLU_MAX_RETRIES", "3"))
+    NLU_BACKOFF_BASE_SECONDS = float(os.getenv("NLU_BACKOFF_BASE_SECONDS", "0.25"))
+    NLU_BACKOFF_MAX_SECONDS = float(os.getenv("NLU_BACKOFF_MAX_SECONDS", "2"))
+    NLU_HEDGE_ENABLED = os.getenv("NLU_HEDGE_ENABLED", "false").lower() == "true"
+    NLU_HEDGE_PERCENTILE = float(os.getenv("NLU_HEDGE_PERCENTILE", "95"))
+
+    # NLU intent cache persisted to .deepcoderx/nlu_cache.json
+    NLU_CACHE_ENABLED = os.getenv("NLU_CACHE_ENABLED", "true").lower() == "true"
+    NLU_CACHE_MAX_ENTRIES = int(os.getenv("NLU_CACHE_MAX_ENTRIES", "500"))
+
+    # Per-call model telemetry written to .deepcoderx/llm_metrics.jsonl
+    TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+    TELEMETRY_MAX_BYTES = int(os.getenv("TELEMETRY_MAX_BYTES", "5242880"))  # 5MB before rollover
+
+    # Per-request agent budgets (0 disables a limit) and per-call completion caps
+    BUDGET_MAX_SECONDS = float(os.getenv("BUDGET_MAX_SECONDS", "600"))
+    BUDGET_MAX_TOKENS = int(os.getenv("BUDGET_MAX_TOKENS", "300000"))
+    BUDGET_MAX_TOOL_CALLS = int(os.getenv("BUDGET_MAX_TOOL_CALLS", "50"))
+    DEEPSEEK_MAX_TOKENS = int(os.getenv("DEEPSEEK_MAX_TOKENS", "4096"))
+    LOCAL_MAX_TOKENS = int(os.getenv("LOCAL_MAX_TOKENS", "2048"))
+
+    # Headless --batch runs: prompts in flight at once, and how file-modifying confirmations are answered (approve/deny)
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    BATCH_CONFIRM_POLICY = os.getenv("BATCH_CONFIRM_POLICY", "deny").lower()
+
+    # Tool result size limits (characters)
+    TOOL_RESULT_MAX_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "6000"))
+    TOOL_RESULTS_TURN_MAX_CHARS = int(os.getenv("TOOL_RESULTS_TURN_MAX_CHARS", "16000"))
+    TOOL_RESULT_PAGE_CHARS = int(os.getenv("TOOL_RESULT_PAGE_CHARS", "6000"))
+
     # MCP server configuration
     MCP_SERVER_HOST = os.getenv("MCP_SERVER_HOST", "localhost")
     MCP_SERVER_PORT = int(os.getenv("MCP_SERVER_PORT", "8080"))
@@ -82,8 +192,11 @@ If you have enough information to answer the user's request, provide the final a
     SCRIPTS_DIR: {SCRIPTS_DIR}
     DEEPSEEK_ENABLED: {DEEPSEEK_ENABLED}
     DEEPSEEK_API_URL: {DEEPSEEK_API_URL}
+    DEEPSEEK_CACHE_ENABLED: {DEEPSEEK_CACHE_ENABLED}
     DUAL_MODEL_MODE: {DUAL_MODEL_MODE}
     LOCAL_MODEL_PATH: {LOCAL_MODEL_PATH}
+    LOCAL_CONSTRAINED_DECODING: {LOCAL_CONSTRAINED_DECODING}
+    NLU_BACKEND: {NLU_BACKEND}
     MCP_SERVER_HOST: {MCP_SERVER_HOST}
     MCP_SERVER_PORT: {MCP_SERVER_PORT}
     """
@@ -5,7 +5,13 @@ import os
 from typing import Any
 # from models.session import CommandContext
 from .session import CommandContext  # Use relative import
+from utils.cancellation import CANCELLED_MESSAGE, RequestCancelled, check_cancelled
+
 class CommandHandler:
+    # Whether a request another handler failed over (ctx.failover) may be
+    # handed to this one; only model backends can answer it in its place.
+    accepts_failover = False
+
     def __init__(self, context: CommandContext):
         self.ctx = context
         
@@ -15,6 +21,13 @@ class CommandHandler:
     def can_handle(self) -> bool:
         raise NotImplementedError("Subclasses must implement can_handle()")
 
+    def checkpoint(self) -> Any:
+        """State to restore if the request is cancelled; stateless handlers keep none."""
+        return None
+
+    def rollback(self, state: Any) -> None:
+        """Restores the state returned by checkpoint()."""
+
 class CommandProcessor:
     def __init__(self, context: CommandContext):
         self.ctx = context
@@ -41,9 +54,33 @@ class CommandProcessor:
             if self.ctx.abort:
                 return self.ctx.abort_reason
                 
-        for handler in self.handlers:
-            if handler.can_handle():
+        # A handler that cannot reach its backend sets ctx.failover; the request
+        # is then offered to the remaining handlers that accept failovers (which
+        # may come earlier in the list). If none takes it, the failed handler's
+        # response is returned.
+        tried = []
+        while True:
+            handler = next((h for h in self.handlers
+                            if h not in tried and (not tried or h.accepts_failover) and h.can_handle()), None)
+            if handler is None:
+                break
+            self.ctx.failover = False
+            state = handler.checkpoint()
+            try:
+                check_cancelled(self.ctx)
                 handler.handle()
+            except RequestCancelled:
+                # Leave the conversation as it was before the cancelled request
+                handler.rollback(state)
+                self.ctx.response = CANCELLED_MESSAGE
                 return self.ctx.response
-                
+            if not self.ctx.failover:
+                return self.ctx.response
+            tried.append(handler)
+            if self.ctx.debug_mode:
+                from utils.logging import console
+                console.print(f"[bold red]DEBUG:[/] {type(handler).__name__} failed over", style="dim")
+
+        if tried:
+            return self.ctx.response
         return "No handler found for command"
\ No newline at end of file
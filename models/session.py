@@ -1,5 +1,6 @@
 # models/session.py
 
+import threading
 from pathlib import Path
 from typing import Dict, Any
 from utils.security import SecurityError  # Use absolute import
@@ -20,8 +21,17 @@ class CommandContext:
         self.abort_reason: str = ""
         self.dry_run = False
         self.auto_confirm = False
+        self.confirm_policy = "ask"  # File-modifying confirmations: "ask" on stdin, "approve" or "deny"
         self.debug_mode = debug_mode
         self.status = "Processing..."
+        self.backend_router = None  # services.backend_router.BackendRouter, set by the app
+        self.failover: bool = False  # Set by a handler that could not serve the request
+        self.session_name = "default"  # Named conversation in the session database
+        self.cancel_event = threading.Event()  # Set (e.g. by Ctrl-C) to cancel the request in flight
+        # Per-request agent budgets; None falls back to the BUDGET_* settings
+        self.budget_seconds = None
+        self.budget_tokens = None
+        self.budget_tool_calls = None
         
     def set_error(self, reason: str):
         self.abort = True
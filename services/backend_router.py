@@ -0,0 +1,112 @@
+# services/backend_router.py
+
+import re
+import time
+import threading
+from typing import Dict, Optional
+
+from config import config
+
+class BackendStats:
+    """Rolling latency/throughput and failure state for one model backend."""
+    ALPHA = 0.3  # EWMA smoothing factor
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.tokens_per_sec: Optional[float] = None
+        self.calls = 0
+        self.consecutive_failures = 0
+        self.unavailable_until = 0.0
+
+    def record_success(self, latency: float, completion_tokens: int = 0):
+        self.calls += 1
+        self.consecutive_failures = 0
+        self.unavailable_until = 0.0
+        self.latency = latency if self.latency is None else (
+            self.ALPHA * latency + (1 - self.ALPHA) * self.latency
+        )
+        if completion_tokens and latency > 0:
+            rate = completion_tokens / latency
+            self.tokens_per_sec = rate if self.tokens_per_sec is None else (
+                self.ALPHA * rate + (1 - self.ALPHA) * self.tokens_per_sec
+            )
+
+    def record_failure(self, cooldown: float, now: float):
+        self.calls += 1
+        self.consecutive_failures += 1
+        # Back off exponentially on repeated failures, up to ten cooldowns
+        backoff = cooldown * min(2 ** (self.consecutive_failures - 1), 10)
+        self.unavailable_until = now + backoff
+
+class BackendRouter:
+    """
+    Chooses between the local model and DeepSeek for each request.
+
+    Short, self-contained prompts stay local; prompts that are large or need
+    cross-file context go to the cloud. A backend that recently failed is
+    skipped until its cooldown expires, and a backend whose smoothed latency
+    exceeds ROUTER_SLOW_SECONDS loses to the other one when that is faster.
+    """
+    LOCAL = "local"
+    CLOUD = "deepseek"
+
+    CONTEXT_HINTS = [
+        r'\bcodebase\b', r'\bproject\b', r'\barchitecture\b', r'\bcross-file\b',
+        r'\bacross\b', r'\ball (?:the )?files\b', r'\bdependenc(?:y|ies)\b',
+        r'\brepo(?:sitory)?\b', r'\brefactor\b', r'\bmodules?\b',
+    ]
+    FILE_REFERENCE = re.compile(r'(?:^|\s)@?[\w./-]+\.\w{1,5}\b')
+
+    def __init__(self, cloud_enabled: Optional[bool] = None):
+        if cloud_enabled is None:
+            cloud_enabled = bool(config.DEEPSEEK_ENABLED and config.DEEPSEEK_API_KEY)
+        self.cloud_enabled = cloud_enabled
+        self.stats: Dict[str, BackendStats] = {self.LOCAL: BackendStats(), self.CLOUD: BackendStats()}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
+    def estimate_context_need(self, prompt: str, analysis_hint: bool = False) -> int:
+        """Scores how much project-wide context a prompt is likely to need."""
+        query = prompt.lower()
+        score = sum(1 for pattern in self.CONTEXT_HINTS if re.search(pattern, query))
+        # One file fits in a local prompt; each additional file adds to the need
+        file_count = len(self.FILE_REFERENCE.findall(prompt))
+        score += max(0, min(file_count, 4) - 1)
+        if analysis_hint:
+            score += 1
+        return score
+
+    def is_available(self, backend: str) -> bool:
+        if backend == self.CLOUD and not self.cloud_enabled:
+            return False
+        return time.time() >= self.stats[backend].unavailable_until
+
+    def is_slow(self, backend: str) -> bool:
+        latency = self.stats[backend].latency
+        return latency is not None and latency > config.ROUTER_SLOW_SECONDS
+
+    def choose(self, prompt: str, analysis_hint: bool = False) -> str:
+        heavy = (
+            self.estimate_tokens(prompt) > config.ROUTER_LOCAL_MAX_PROMPT_TOKENS
+            or self.estimate_context_need(prompt, analysis_hint) >= config.ROUTER_CONTEXT_THRESHOLD
+        )
+        preferred, other = (self.CLOUD, self.LOCAL) if heavy else (self.LOCAL, self.CLOUD)
+
+        if not self.is_available(preferred):
+            return other if self.is_available(other) else preferred
+        if self.is_slow(preferred) and self.is_available(other):
+            other_latency = self.stats[other].latency
+            if other_latency is not None and other_latency < self.stats[preferred].latency:
+                return other
+        return preferred
+
+    def record_success(self, backend: str, latency: float, completion_tokens: int = 0):
+        with self._lock:
+            self.stats[backend].record_success(latency, completion_tokens)
+
+    def record_failure(self, backend: str):
+        with self._lock:
+            self.stats[backend].record_failure(config.ROUTER_COOLDOWN_SECONDS, time.time())
@@ -0,0 +1,170 @@
+# services/batch.py
+
+import re
+import json
+import time
+import asyncio
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from config import config
+from models.router import CommandProcessor
+from utils.cancellation import CANCELLED_MESSAGE
+
+def load_prompts(path: Path) -> List[Dict[str, Any]]:
+    """
+    Batch items from a JSONL file: {"prompt": ..., "id": ..., "dir": ...} per
+    line, or a bare JSON string as the prompt. "id" defaults to the line
+    number and "dir" to the project directory. A line that cannot be used is
+    kept as an item with an "error", so it still gets a result. An id that
+    repeats an earlier one (or maps to the same session) gets its line number
+    appended, since two items must never share a session.
+    """
+    items = []
+    sessions = set()
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                items.append({"id": str(number), "error": f"Invalid JSON on line {number}: {e}"})
+                continue
+            if isinstance(item, str):
+                item = {"prompt": item}
+            if not isinstance(item, dict) or not isinstance(item.get("prompt"), str) or not item["prompt"].strip():
+                items.append({"id": str(number), "error": f"Line {number} has no prompt"})
+                continue
+            item_id = str(item.get("id", number))
+            while session_name(item_id) in sessions:
+                item_id = f"{item_id}-line{number}"
+            sessions.add(session_name(item_id))
+            item["id"] = item_id
+            items.append(item)
+    return items
+
+def session_name(item_id: str) -> str:
+    """The isolated session a batch item's conversation is kept under."""
+    return "batch-" + re.sub(r'[^\w.-]', '_', item_id)
+
+class BatchRunner:
+    """
+    Runs prompts without a terminal, up to `concurrency` at a time.
+
+    `make_processor(root_path, session_name)` builds a fresh CommandContext
+    and handler chain for each prompt, so histories and per-request state
+    never mix; the conversation starts empty and is kept under its
+    "batch-<id>" session for later review. Each result is appended to the
+    output JSONL as soon as its prompt finishes. `cancel()` (Ctrl-C) stops
+    the prompts in flight and skips the rest.
+    """
+
+    def __init__(self, make_processor: Callable[[Path, str], CommandProcessor], root_path: Path,
+                 concurrency: Optional[int] = None):
+        self.make_processor = make_processor
+        self.root_path = Path(root_path)
+        self.concurrency = max(1, concurrency or config.BATCH_CONCURRENCY)
+        self.cancelled = False
+        self._active: Set[Any] = set()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self.cancelled = True
+        with self._lock:
+            for ctx in self._active:
+                ctx.cancel_event.set()
+
+    async def run(self, items: List[Dict[str, Any]], output_path: Path,
+                  on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """Runs every item and returns the results in input order."""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as executor, \
+                open(output_path, "a", encoding="utf-8") as output:
+
+            async def run_item(index: int, item: Dict[str, Any]):
+                async with semaphore:
+                    result = await loop.run_in_executor(executor, self.run_item, item)
+                # Written from the event loop only, so lines never interleave
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+                results[index] = result
+                if on_result is not None:
+                    on_result(result)
+
+            await asyncio.gather(*(run_item(i, item) for i, item in enumerate(items)))
+        return results
+
+    def run_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs one prompt in its own context and returns its result record."""
+        result = {
+            "id": item["id"],
+            "prompt": item.get("prompt"),
+            "dir": None,
+            "status": "error",
+            "response": None,
+            "model": None,
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "seconds": 0.0,
+            "tokens": 0,
+            "tool_calls": 0,
+        }
+        if "error" in item:
+            result["error"] = item["error"]
+            return result
+        if self.cancelled:
+            result["status"] = "cancelled"
+            return result
+
+        started = time.monotonic()
+        root_path = (self.root_path / item["dir"]).resolve() if item.get("dir") else self.root_path
+        result["dir"] = str(root_path)
+        ctx = None
+        try:
+            if not root_path.is_dir():
+                raise FileNotFoundError(f"Project directory does not exist: {root_path}")
+            processor = self.make_processor(root_path, session_name(item["id"]))
+            ctx = processor.ctx
+            for handler in processor.handlers:
+                if hasattr(handler, "clear_history"):
+                    handler.clear_history()
+            with self._lock:
+                self._active.add(ctx)
+            if self.cancelled:
+                ctx.cancel_event.set()
+            response = processor.execute(item["prompt"])
+
+            result["response"] = response
+            result["model"] = ctx.model_name
+            if response == CANCELLED_MESSAGE:
+                result["status"] = "cancelled"
+            elif ctx.abort:
+                result["status"] = "blocked"
+            else:
+                result["status"] = "ok"
+            for handler in processor.handlers:
+                budget = getattr(handler, "budget", None)
+                if budget is not None:
+                    result["tokens"] += budget.tokens_used
+                    result["tool_calls"] += budget.tool_calls_used
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            with self._lock:
+                self._active.discard(ctx)
+            result["seconds"] = round(time.monotonic() - started, 3)
+        return result
+
+def summarize_results(results: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Result counts by status."""
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return counts
@@ -0,0 +1,142 @@
+# services/blob_store.py
+
+import os
+import re
+import time
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from config import config
+
+BLOB_REF = re.compile(r'<<blob:([0-9a-f]{64})>>')
+# ToolResultStore paging handles name a blob by a digest prefix
+RESULT_REF = re.compile(r'\bres-([0-9a-f]{16})\b')
+
+class BlobStore:
+    """
+    Content-addressed, zlib-compressed storage for large tool outputs.
+
+    `pack()` swaps a large text for a <<blob:sha256>> reference, so a file
+    read or directory listing that recurs across turns is stored once under
+    .deepcoderx/blobs/ and the persisted history only carries the reference.
+    `expand_messages()` puts the text back when a prompt is built.
+    """
+    DIR_NAME = "blobs"
+    _instances: Dict[Path, "BlobStore"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, directory: Path, min_bytes: Optional[int] = None, cache_entries: Optional[int] = None):
+        self.directory = Path(directory)
+        self.min_bytes = min_bytes if min_bytes is not None else config.BLOB_MIN_BYTES
+        self.cache_entries = cache_entries if cache_entries is not None else config.BLOB_CACHE_ENTRIES
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_root(cls, root_path: Path) -> "BlobStore":
+        """Returns the shared blob store for a project."""
+        key = Path(root_path).resolve()
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(key / ".deepcoderx" / cls.DIR_NAME)
+            return cls._instances[key]
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / digest[2:]
+
+    def _remember(self, digest: str, text: str):
+        with self._lock:
+            self._cache[digest] = text
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def put(self, text: str) -> str:
+        """Stores `text` (once per distinct content) and returns its digest."""
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        try:
+            # Reused content counts as recent, so GC spares it until the new reference is persisted
+            os.utime(path)
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            temp_path.write_bytes(zlib.compress(data, 6))
+            os.replace(temp_path, path)
+        self._remember(digest, text)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        with self._lock:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                return self._cache[digest]
+        try:
+            text = zlib.decompress(self._path(digest).read_bytes()).decode("utf-8")
+        except (OSError, zlib.error, UnicodeDecodeError):
+            return None
+        self._remember(digest, text)
+        return text
+
+    def find(self, prefix: str) -> Optional[str]:
+        """The digest of a stored blob starting with `prefix`, or None."""
+        shard = self.directory / prefix[:2]
+        try:
+            for blob in shard.iterdir():
+                if blob.name.startswith(prefix[2:]) and not blob.name.endswith(".tmp"):
+                    return shard.name + blob.name
+        except OSError:
+            pass
+        return None
+
+    def pack(self, text: str) -> str:
+        """`text` itself if it is small, otherwise a reference to its blob."""
+        if not isinstance(text, str) or len(text) < self.min_bytes:
+            return text
+        try:
+            return f"<<blob:{self.put(text)}>>"
+        except OSError:
+            return text
+
+    def expand(self, text: str) -> str:
+        if "<<blob:" not in text:
+            return text
+
+        def replace(match):
+            content = self.get(match.group(1))
+            return content if content is not None else "[Tool result no longer available]"
+        return BLOB_REF.sub(replace, text)
+
+    def expand_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """A copy of `messages` with blob references replaced by their content."""
+        return [dict(m, content=self.expand(m["content"])) if isinstance(m.get("content"), str)
+                and "<<blob:" in m["content"] else m for m in messages]
+
+    def collect_garbage(self, live_texts: Iterable[str], min_age_seconds: float = 86400) -> int:
+        """Deletes blobs no live text references, sparing recent ones that may not be persisted yet."""
+        live: Set[str] = set()
+        live_prefixes: Set[str] = set()
+        for text in live_texts:
+            live.update(BLOB_REF.findall(text))
+            live_prefixes.update(RESULT_REF.findall(text))
+        cutoff = time.time() - min_age_seconds
+        removed = 0
+        if not self.directory.is_dir():
+            return removed
+        for shard in self.directory.iterdir():
+            if not shard.is_dir():
+                continue
+            for blob in shard.iterdir():
+                digest = shard.name + blob.name
+                try:
+                    if digest not in live and digest[:16] not in live_prefixes and blob.stat().st_mtime < cutoff:
+                        blob.unlink()
+                        removed += 1
+                except OSError:
+                    continue
+        return removed
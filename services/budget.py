@@ -0,0 +1,123 @@
+# services/budget.py
+
+import time
+from typing import Optional
+
+from config import config
+
+class RequestBudget:
+    """
+    Wall-clock, token and tool-call limits for one agent request.
+
+    Limits come from the CommandContext (budget_seconds, budget_tokens,
+    budget_tool_calls) and fall back to the BUDGET_* settings. A limit of
+    0 or None means unlimited.
+    """
+    BUDGET_EXHAUSTED_PROMPT = (
+        "[Budget exhausted: {reason}] Do not call any more tools. "
+        "Give your best final answer now using the information you already have."
+    )
+    TOOL_CALL_SKIPPED = "[Budget exhausted: tool call limit of {limit} reached] '{tool}' was not run."
+    MIN_CALL_SECONDS = 5
+    # Allowance for the single best-effort answer requested after exhaustion
+    FINAL_CALL_SECONDS = 30
+    FINAL_CALL_TOKENS = 1024
+
+    def __init__(self, max_seconds: Optional[float] = None, max_tokens: Optional[int] = None,
+                 max_tool_calls: Optional[int] = None):
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.max_tool_calls = max_tool_calls
+        self.started = time.monotonic()
+        self.tokens_used = 0
+        self.tool_calls_used = 0
+        self.finalizing = False
+
+    @classmethod
+    def from_context(cls, ctx) -> "RequestBudget":
+        def limit(name, default):
+            value = getattr(ctx, name, None)
+            return value if isinstance(value, (int, float)) else default
+        return cls(
+            max_seconds=limit("budget_seconds", config.BUDGET_MAX_SECONDS),
+            max_tokens=limit("budget_tokens", config.BUDGET_MAX_TOKENS),
+            max_tool_calls=limit("budget_tool_calls", config.BUDGET_MAX_TOOL_CALLS),
+        )
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining_seconds(self) -> Optional[float]:
+        if not self.max_seconds:
+            return None
+        return max(0.0, self.max_seconds - self.elapsed)
+
+    def remaining_tokens(self) -> Optional[int]:
+        if not self.max_tokens:
+            return None
+        return max(0, self.max_tokens - self.tokens_used)
+
+    def remaining_tool_calls(self) -> Optional[int]:
+        if not self.max_tool_calls:
+            return None
+        return max(0, self.max_tool_calls - self.tool_calls_used)
+
+    def charge_tokens(self, tokens: Optional[int]):
+        self.tokens_used += tokens or 0
+
+    def charge_tool_calls(self, count: int = 1):
+        self.tool_calls_used += count
+
+    def take_tool_call(self) -> bool:
+        """Charges one tool call; returns False, without charging, once the limit is used up."""
+        if self.remaining_tool_calls() == 0:
+            return False
+        self.charge_tool_calls(1)
+        return True
+
+    def skipped_tool_call(self, tool: str) -> str:
+        """Result reported for a tool call that was not run because the limit is used up."""
+        return self.TOOL_CALL_SKIPPED.format(limit=self.max_tool_calls, tool=tool)
+
+    def exhausted(self) -> Optional[str]:
+        """Returns the reason the budget is used up, or None."""
+        if self.remaining_seconds() == 0:
+            return f"wall time limit of {self.max_seconds:g}s reached"
+        if self.remaining_tokens() == 0:
+            return f"token limit of {self.max_tokens} reached"
+        if self.remaining_tool_calls() == 0:
+            return f"tool call limit of {self.max_tool_calls} reached"
+        return None
+
+    def call_timeout(self, default: float) -> float:
+        """Timeout for the next model call, never beyond the remaining wall time."""
+        remaining = self.remaining_seconds()
+        if self.finalizing:
+            return min(default, max(remaining or 0, self.FINAL_CALL_SECONDS))
+        if remaining is None:
+            return default
+        return max(self.MIN_CALL_SECONDS, min(default, remaining))
+
+    def call_max_tokens(self, default: int) -> int:
+        """Completion cap for the next model call, never beyond the remaining tokens."""
+        remaining = self.remaining_tokens()
+        if self.finalizing:
+            return min(default, max(remaining or 0, self.FINAL_CALL_TOKENS))
+        if remaining is None:
+            return default
+        return max(1, min(default, remaining))
+
+    def hint(self) -> str:
+        """Short remaining-budget note appended to tool results for the model."""
+        parts = []
+        if self.remaining_tool_calls() is not None:
+            parts.append(f"{self.remaining_tool_calls()} tool calls")
+        if self.remaining_seconds() is not None:
+            parts.append(f"{self.remaining_seconds():.0f}s")
+        if self.remaining_tokens() is not None:
+            parts.append(f"{self.remaining_tokens()} tokens")
+        return f"[Remaining budget: {', '.join(parts)}]" if parts else ""
+
+    def exhausted_prompt(self, reason: str) -> str:
+        return self.BUDGET_EXHAUSTED_PROMPT.format(reason=reason)
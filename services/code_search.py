@@ -0,0 +1,251 @@
+# services/code_search.py
+
+import re
+import math
+import sqlite3
+import threading
+import contextlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from config import config
+from services.project_index import ProjectIndex
+
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+_CAMEL = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+_STOPWORDS = {
+    "the", "and", "for", "with", "this", "that", "from", "import", "return", "def", "class", "self",
+    "none", "true", "false", "not", "is", "in", "of", "to", "a", "an", "if", "else", "elif",
+    "const", "let", "var", "function", "func", "new", "it", "be", "or", "as", "at", "by", "on",
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased identifier terms plus their snake_case/camelCase parts."""
+    terms = []
+    for identifier in _IDENTIFIER.findall(text):
+        lowered = identifier.lower()
+        parts = [p.lower() for piece in identifier.split("_") for p in _CAMEL.findall(piece)]
+        for term in ([lowered] + parts if len(parts) > 1 else [lowered]):
+            if len(term) > 1 and term not in _STOPWORDS:
+                terms.append(term)
+    return terms
+
+class CodeSearchIndex:
+    """
+    BM25 inverted index over function- and class-level code chunks.
+
+    Chunks come from the symbols in the project index: one per function or
+    method, a header chunk per class (up to its first member), and fixed
+    windows over the remaining module-level lines. Postings live in
+    .deepcoderx/code_search.db and are rebuilt only for files whose content
+    hash changed.
+    """
+    FILE_NAME = "code_search.db"
+    K1 = 1.2
+    B = 0.75
+    WINDOW_LINES = 60
+    MAX_CHUNK_LINES = 200
+    _instances: Dict[Path, "CodeSearchIndex"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, index: ProjectIndex, db_path: Optional[Path] = None):
+        self.index = index
+        self.root_path = index.root_path
+        self.db_path = Path(db_path) if db_path else self.root_path / ".deepcoderx" / self.FILE_NAME
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, hash TEXT)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, path TEXT NOT NULL, "
+                "name TEXT, start_line INTEGER NOT NULL, end_line INTEGER NOT NULL, length INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_path ON chunks(path)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, chunk_id INTEGER NOT NULL, tf INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS postings_term ON postings(term)")
+            conn.execute("CREATE INDEX IF NOT EXISTS postings_chunk ON postings(chunk_id)")
+
+    @classmethod
+    def for_root(cls, root_path: Path) -> "CodeSearchIndex":
+        """Returns the shared search index for a project."""
+        key = Path(root_path).resolve()
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(ProjectIndex.for_root(root_path))
+            return cls._instances[key]
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- Indexing ---
+
+    def update(self) -> Dict[str, int]:
+        """Re-chunks files whose hash changed and drops files that left the project index."""
+        with self._lock:
+            self.index.refresh()
+            records = {r["path"]: r for r in self.index.files() if r["language"] and r["hash"]}
+            counts = {"indexed": 0, "removed": 0}
+            with self._connect() as conn:
+                known = dict(conn.execute("SELECT path, hash FROM files").fetchall())
+                stale = [p for p in known if p not in records or known[p] != records[p]["hash"]]
+                for path in stale:
+                    self._delete_file(conn, path)
+                counts["removed"] = sum(1 for p in stale if p not in records)
+                for path, record in records.items():
+                    if known.get(path) == record["hash"]:
+                        continue
+                    self._index_file(conn, record)
+                    counts["indexed"] += 1
+            return counts
+
+    @staticmethod
+    def _delete_file(conn: sqlite3.Connection, path: str):
+        conn.execute("DELETE FROM postings WHERE chunk_id IN (SELECT id FROM chunks WHERE path = ?)", (path,))
+        conn.execute("DELETE FROM chunks WHERE path = ?", (path,))
+        conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _chunk_ranges(self, record: Dict[str, Any], line_count: int) -> List[Dict[str, Any]]:
+        symbols = sorted(record.get("symbols", []), key=lambda s: s["line"])
+        ranges = []
+        for symbol in symbols:
+            start, end = symbol["line"], symbol.get("end_line") or symbol["line"]
+            members = [s for s in symbols if s.get("parent") == symbol["name"] and s["line"] > start]
+            if symbol["kind"] in ("class", "struct", "interface") and members:
+                # The members get their own chunks
+                end = members[0]["line"] - 1
+            ranges.append({"name": symbol["name"], "start": start, "end": min(end, start + self.MAX_CHUNK_LINES)})
+        # Module-level code between definitions (or whole files without symbols) is windowed
+        covered = set()
+        for chunk in ranges:
+            covered.update(range(chunk["start"], chunk["end"] + 1))
+        gap_start = None
+        for line in range(1, line_count + 2):
+            if line <= line_count and line not in covered:
+                gap_start = gap_start or line
+                continue
+            if gap_start is not None:
+                for start in range(gap_start, line, self.WINDOW_LINES):
+                    ranges.append({"name": None, "start": start, "end": min(line - 1, start + self.WINDOW_LINES - 1)})
+                gap_start = None
+        return ranges
+
+    def _index_file(self, conn: sqlite3.Connection, record: Dict[str, Any]):
+        try:
+            lines = (self.root_path / record["path"]).read_text(encoding="utf-8", errors="ignore").splitlines()
+        except OSError:
+            return
+        conn.execute("INSERT OR REPLACE INTO files (path, hash) VALUES (?, ?)", (record["path"], record["hash"]))
+        # The path itself is searchable, e.g. "context manager" finds services/context_manager.py
+        path_terms = tokenize(record["path"].replace("/", " ").replace(".", " "))
+        for chunk in self._chunk_ranges(record, len(lines)):
+            text = "\n".join(lines[chunk["start"] - 1:chunk["end"]])
+            if not text.strip():
+                continue
+            terms = Counter(tokenize(text) + path_terms)
+            if not terms:
+                continue
+            cursor = conn.execute(
+                "INSERT INTO chunks (path, name, start_line, end_line, length) VALUES (?, ?, ?, ?, ?)",
+                (record["path"], chunk["name"], chunk["start"], chunk["end"], sum(terms.values()))
+            )
+            conn.executemany(
+                "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                [(term, cursor.lastrowid, tf) for term, tf in terms.items()]
+            )
+
+    # --- Querying ---
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Top chunks for a query as {"path", "name", "start_line", "end_line", "score"}, best first."""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._connect() as conn:
+            total, avg_length = conn.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+            if not total:
+                return []
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = conn.execute(
+                    "SELECT p.chunk_id, p.tf, c.length FROM postings p JOIN chunks c ON c.id = p.chunk_id "
+                    "WHERE p.term = ?", (term,)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log((total - len(postings) + 0.5) / (len(postings) + 0.5) + 1)
+                for chunk_id, tf, length in postings:
+                    norm = tf * (self.K1 + 1) / (tf + self.K1 * (1 - self.B + self.B * length / avg_length))
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * norm
+            best = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+            results = []
+            for chunk_id, score in best:
+                path, name, start, end = conn.execute(
+                    "SELECT path, name, start_line, end_line FROM chunks WHERE id = ?", (chunk_id,)
+                ).fetchone()
+                results.append({"id": chunk_id, "path": path, "name": name, "start_line": start,
+                                "end_line": end, "score": round(score, 3)})
+        return results
+
+    def chunk_text(self, result: Dict[str, Any]) -> str:
+        try:
+            lines = (self.root_path / result["path"]).read_text(encoding="utf-8", errors="ignore").splitlines()
+        except OSError:
+            return ""
+        return "\n".join(lines[result["start_line"] - 1:result["end_line"]])
+
+    def chunks(self) -> List[Dict[str, Any]]:
+        """Every indexed chunk with its file's content hash, ordered by path and line."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT c.id, c.path, c.name, c.start_line, c.end_line, f.hash FROM chunks c "
+                "JOIN files f ON f.path = c.path ORDER BY c.path, c.start_line"
+            ).fetchall()
+        return [{"id": r[0], "path": r[1], "name": r[2], "start_line": r[3], "end_line": r[4], "hash": r[5]}
+                for r in rows]
+
+    def select_context(self, query: str, max_tokens: Optional[int] = None, max_chunks: Optional[int] = None,
+                       exclude: Optional[Set[int]] = None) -> List[Dict[str, Any]]:
+        """
+        The best-scoring chunks for a query that fit in the token budget, with
+        their text under "text". Chunk ids in `exclude` (already sent) are skipped.
+        """
+        max_chunks = max_chunks if max_chunks is not None else config.CONTEXT_SEARCH_MAX_CHUNKS
+        return fit_to_budget(self.search(query, limit=max_chunks * 3), self.chunk_text,
+                             max_tokens, max_chunks, exclude)
+
+def fit_to_budget(results: Iterable[Dict[str, Any]], chunk_text: Callable[[Dict[str, Any]], str],
+                  max_tokens: Optional[int] = None, max_chunks: Optional[int] = None,
+                  exclude: Optional[Set[int]] = None) -> List[Dict[str, Any]]:
+    """Takes ranked results in order while they fit the token and chunk budget, adding their "text"."""
+    max_tokens = max_tokens if max_tokens is not None else config.CONTEXT_SEARCH_MAX_TOKENS
+    max_chunks = max_chunks if max_chunks is not None else config.CONTEXT_SEARCH_MAX_CHUNKS
+    selected, used = [], 0
+    for result in results:
+        if exclude and result["id"] in exclude:
+            continue
+        text = chunk_text(result)
+        cost = len(text) // 4 + 10
+        if not text or used + cost > max_tokens:
+            continue
+        selected.append(dict(result, text=text))
+        used += cost
+        if len(selected) >= max_chunks:
+            break
+    return selected
+
+def format_chunks(chunks: Iterable[Dict[str, Any]]) -> str:
+    """Renders selected chunks as fenced code blocks headed by path and line range."""
+    blocks = []
+    for chunk in chunks:
+        language = Path(chunk["path"]).suffix.lstrip(".")
+        blocks.append(f"### {chunk['path']}:{chunk['start_line']}-{chunk['end_line']}\n```{language}\n{chunk['text']}\n```")
+    return "\n\n".join(blocks)
@@ -2,21 +2,34 @@
 
 import json
 import re
+import hashlib
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+from config import config
 
 from models.session import CommandContext
 from utils.logging import console
+from services.project_index import ProjectIndex
+from utils.file_tree import FileTreeRenderer
 
 class ContextManager:
     """
     Manages the creation, reading, and updating of the project context file.
     """
     CONTEXT_FILE_NAME = ".deepcoderx_context.md"
+    FILE_TREE_CACHE_NAME = "file_tree.json"
+    STATE_FILE_NAME = "context_state.json"
+    KEY_FILES = ["requirements.txt", "config.py", "app.py", "run.py"]
+    DESCRIPTION_FILE = "DeepCoderX.md"
+    # Generated sections, each delimited by markers so it can be replaced without touching the log entries
+    SECTIONS = ("tree", "key_files", "description")
 
     def __init__(self, context: CommandContext):
         self.ctx = context
         self.context_file_path = self.ctx.root_path / self.CONTEXT_FILE_NAME
+        self.state_path = self.ctx.root_path / ".deepcoderx" / self.STATE_FILE_NAME
+        self.refreshed: List[str] = []
 
     def context_file_exists(self) -> bool:
         """Checks if the context file exists in the project root."""
@@ -36,8 +49,10 @@ class ContextManager:
         self.ctx.status = "Building project context for the first time..."
         console.print("[yellow]Performing one-time deep analysis to build project context...[/]")
 
-        file_tree = self._get_file_tree()
-        project_description = self._get_project_description()
+        paths = self._indexed_paths()
+        file_tree = self._section("tree", self._render_section("tree", paths))
+        key_files = self._section("key_files", self._render_section("key_files", paths))
+        project_description = self._section("description", self._render_section("description", paths))
 
         context_content = f"""CONTEXT FILE FOR PROJECT.
 -----------------------------
@@ -102,26 +117,135 @@ YOUR GOAL: Help the user achieve the goals for the project. Write the best code
 {project_description}
 
 ## END PROJECT DESCRIPTION ##
+
+
+## KEY FILES ##
+
+{key_files}
+
+## END KEY FILES ##
 """
 
         self.context_file_path.write_text(context_content)
+        self._save_state(self._fingerprints(paths), paths)
+        self.refreshed = list(self.SECTIONS)
         console.print(f"[green]Project context saved to {self.CONTEXT_FILE_NAME}[/]")
         return context_content
 
+    def refresh_context(self, force: bool = False) -> str:
+        """
+        Brings the context file up to date and returns its content.
+
+        Each generated section is fingerprinted from its inputs (the indexed
+        paths, the key files' size and mtime, the description file), and only
+        sections whose fingerprint changed are re-rendered in place; entries
+        added to the file since are kept. A changed tree is only re-rendered
+        once the share of files added or removed reaches
+        CONTEXT_REFRESH_THRESHOLD, unless `force` is set. Files written before
+        sections were delimited are rebuilt only when forced.
+        """
+        self.refreshed = []
+        if not self.context_file_exists():
+            return self.build_and_save_context()
+        content = self.read_context_file()
+        if not any(self._markers(name)[0] in content for name in self.SECTIONS):
+            return self.build_and_save_context() if force else content
+
+        paths = self._indexed_paths()
+        state = self._load_state()
+        fingerprints = self._fingerprints(paths)
+        changed = [name for name in self.SECTIONS if state["sections"].get(name) != fingerprints[name]]
+        if "tree" in changed and not force and self._tree_staleness(state["paths"], paths) < config.CONTEXT_REFRESH_THRESHOLD:
+            # Keep the old fingerprint so the drift keeps accumulating until it crosses the threshold
+            changed.remove("tree")
+            fingerprints["tree"] = state["sections"].get("tree")
+            paths = state["paths"]
+        if not changed:
+            return content
+
+        for name in changed:
+            start, end = self._markers(name)
+            pattern = re.compile(re.escape(start) + r".*?" + re.escape(end), re.DOTALL)
+            if not pattern.search(content):
+                fingerprints[name] = state["sections"].get(name)
+                continue
+            body = self._section(name, self._render_section(name, paths))
+            content = pattern.sub(lambda _: body, content, count=1)
+            self.refreshed.append(name)
+
+        if self.refreshed:
+            self.context_file_path.write_text(content)
+            if self.ctx.debug_mode:
+                console.print(f"[bold red]DEBUG:[/] Refreshed context sections: {', '.join(self.refreshed)}", style="dim")
+        self._save_state(fingerprints, paths)
+        return content
+
+    @staticmethod
+    def _markers(name: str):
+        return f"<!-- deepcoderx:{name} -->", f"<!-- /deepcoderx:{name} -->"
+
+    def _section(self, name: str, body: str) -> str:
+        start, end = self._markers(name)
+        return f"{start}\n{body}\n{end}"
+
+    def _render_section(self, name: str, paths: List[str]) -> str:
+        if name == "tree":
+            cache_path = self.ctx.root_path / ".deepcoderx" / self.FILE_TREE_CACHE_NAME
+            return FileTreeRenderer().render_cached(paths, cache_path)
+        if name == "key_files":
+            return self._get_key_files_content().strip() or "No key files found."
+        return self._get_project_description()
+
+    def _indexed_paths(self) -> List[str]:
+        index = ProjectIndex.for_root(self.ctx.root_path)
+        index.refresh()
+        return index.paths()
+
+    def _fingerprints(self, paths: List[str]) -> Dict[str, str]:
+        return {
+            "tree": FileTreeRenderer().fingerprint(paths),
+            "key_files": self._stat_fingerprint(self.KEY_FILES),
+            "description": self._stat_fingerprint([self.DESCRIPTION_FILE]),
+        }
+
+    def _stat_fingerprint(self, names: List[str]) -> str:
+        digest = hashlib.sha1()
+        for name in names:
+            try:
+                stat = (self.ctx.root_path / name).stat()
+                digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+            except OSError:
+                digest.update(f"{name}:missing\n".encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _tree_staleness(old_paths: List[str], new_paths: List[str]) -> float:
+        """Share of files added or removed since the tree was rendered."""
+        drift = len(set(old_paths).symmetric_difference(new_paths))
+        return drift / max(len(old_paths), 1)
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            state = json.loads(self.state_path.read_text())
+            return {"sections": dict(state["sections"]), "paths": list(state["paths"])}
+        except (OSError, ValueError, KeyError, TypeError):
+            return {"sections": {}, "paths": []}
+
+    def _save_state(self, fingerprints: Dict[str, Optional[str]], paths: List[str]):
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            self.state_path.write_text(json.dumps({"sections": fingerprints, "paths": paths}))
+        except OSError:
+            pass
+
     def _get_file_tree(self) -> str:
-        """Generates a string representation of the file tree."""
-        tree = []
-        for path in sorted(self.ctx.root_path.rglob('*')):
-            depth = len(path.relative_to(self.ctx.root_path).parts) - 1
-            indent = "    " * depth
-            tree.append(f"{indent}{path.name}")
-        return "\n".join(tree)
+        """Renders the indexed (ignore-filtered) files as a capped tree, reusing the cached copy if nothing moved."""
+        return self._render_section("tree", self._indexed_paths())
 
     def _get_key_files_content(self) -> str:
         """Reads the content of key files like requirements.txt, etc."""
         content = ""
-        key_files = ["requirements.txt", "config.py", "app.py", "run.py"]
-        for file_name in key_files:
+        for file_name in self.KEY_FILES:
             file_path = self.ctx.root_path / file_name
             if file_path.exists():
                 content += f"### {file_name}\n```\n{file_path.read_text()[:1000]}\n```\n\n"
@@ -129,7 +253,7 @@ YOUR GOAL: Help the user achieve the goals for the project. Write the best code
 
     def _get_project_description(self) -> str:
         """Reads the project description from the DeepCoderX.md file."""
-        description_file = self.ctx.root_path / "DeepCoderX.md"
+        description_file = self.ctx.root_path / self.DESCRIPTION_FILE
         if description_file.exists():
             # A simple way to extract the core concept and features
             content = description_file.read_text()
@@ -0,0 +1,213 @@
+# services/embedding_index.py
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+from llama_cpp import Llama
+
+from config import config
+from utils.logging import console
+from services.code_search import CodeSearchIndex, fit_to_budget
+
+_embedding_llm = None
+_embedding_llm_failed = False
+_embedding_llm_lock = threading.Lock()
+
+def embedding_model_path() -> Optional[str]:
+    """
+    EMBEDDING_MODEL_PATH if that file exists. llama.cpp needs a separate
+    context in embedding mode, so the coding model cannot be reused; rather
+    than silently loading a second copy of LOCAL_MODEL_PATH, embeddings are
+    off until a (typically much smaller) embedding model is configured.
+    """
+    path = config.EMBEDDING_MODEL_PATH
+    return str(path) if path and Path(path).is_file() else None
+
+def get_embedding_model() -> Optional[Llama]:
+    """Loads the local model in embedding mode once per process; returns None if it is unavailable."""
+    global _embedding_llm, _embedding_llm_failed
+    with _embedding_llm_lock:
+        if _embedding_llm is None and not _embedding_llm_failed:
+            model_path = embedding_model_path()
+            try:
+                if model_path is None:
+                    raise FileNotFoundError("EMBEDDING_MODEL_PATH is not set to a GGUF file")
+                _embedding_llm = Llama(model_path=model_path, embedding=True, n_ctx=config.EMBEDDING_N_CTX,
+                                       n_batch=config.EMBEDDING_N_CTX, verbose=False)
+            except Exception as e:
+                _embedding_llm_failed = True
+                console.print(f"[bold yellow]Embedding Warning:[/] Local model unavailable: {e}", style="dim")
+        return _embedding_llm
+
+def embed_texts(texts: List[str]) -> Optional[np.ndarray]:
+    """Unit-length embeddings for `texts` as a float32 matrix, or None without a local model."""
+    llm = get_embedding_model()
+    if llm is None:
+        return None
+    with _embedding_llm_lock:
+        raw = llm.embed(texts)
+    vectors = []
+    for item in raw:
+        vector = np.asarray(item, dtype=np.float32)
+        # Models without a pooling layer return one vector per token
+        if vector.ndim == 2:
+            vector = vector.mean(axis=0)
+        vectors.append(vector)
+    return normalize(np.vstack(vectors))
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+class EmbeddingIndex:
+    """
+    Dense vectors for the code search chunks, for retrieval by meaning rather
+    than by shared keywords.
+
+    Vectors come from the local GGUF model run by llama_cpp in embedding mode,
+    so indexing and search work offline on CPU. They are stored as a float32
+    matrix in .deepcoderx/embeddings.npy (memory-mapped on load) next to a
+    JSON list of the chunk each row belongs to, keyed by path, line range and
+    file hash, so `update()` only embeds chunks of files that changed. Search
+    is an exact (brute-force) cosine scan of the matrix.
+    """
+    MATRIX_NAME = "embeddings.npy"
+    KEYS_NAME = "embeddings.json"
+    _instances: Dict[Path, "EmbeddingIndex"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, search: CodeSearchIndex, embed_fn: Optional[Callable[[List[str]], Optional[np.ndarray]]] = None,
+                 directory: Optional[Path] = None):
+        self.search_index = search
+        self.root_path = search.root_path
+        self.embed_fn = embed_fn or embed_texts
+        self.directory = Path(directory) if directory else self.root_path / ".deepcoderx"
+        self.matrix: Optional[np.ndarray] = None
+        self.rows: List[Dict[str, Any]] = []
+        # (matrix, rows) swapped in as one reference, so search never pairs a new matrix with old rows
+        self._snapshot = (None, [])
+        self.ready = threading.Event()
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    @classmethod
+    def for_root(cls, root_path: Path) -> "EmbeddingIndex":
+        """Returns the shared embedding index for a project."""
+        key = Path(root_path).resolve()
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(CodeSearchIndex.for_root(root_path))
+            return cls._instances[key]
+
+    @staticmethod
+    def _key(chunk: Dict[str, Any]) -> str:
+        return f"{chunk['path']}:{chunk['start_line']}-{chunk['end_line']}@{chunk['hash']}"
+
+    def _load(self) -> Dict[str, np.ndarray]:
+        """Stored vectors by chunk key; empty if nothing is stored or the files disagree."""
+        try:
+            keys = json.loads((self.directory / self.KEYS_NAME).read_text())
+            matrix = np.load(self.directory / self.MATRIX_NAME, mmap_mode="r")
+        except (OSError, ValueError):
+            return {}
+        if keys.get("model") != embedding_model_path() or len(keys.get("keys", [])) != matrix.shape[0]:
+            return {}
+        return {key: matrix[row] for row, key in enumerate(keys["keys"])}
+
+    def _save(self, keys: List[str], matrix: np.ndarray):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        matrix_path = self.directory / self.MATRIX_NAME
+        keys_path = self.directory / self.KEYS_NAME
+        # Write both files aside and swap them in, so a reader never maps a half-written matrix
+        with open(f"{matrix_path}.tmp", "wb") as f:
+            np.save(f, matrix)
+        Path(f"{keys_path}.tmp").write_text(json.dumps({"model": embedding_model_path(), "keys": keys}))
+        os.replace(f"{matrix_path}.tmp", matrix_path)
+        os.replace(f"{keys_path}.tmp", keys_path)
+
+    def update(self) -> Dict[str, int]:
+        """Embeds chunks that have no stored vector yet and drops vectors of chunks that are gone."""
+        with self._lock:
+            self.search_index.update()
+            chunks = self.search_index.chunks()
+            stored = self._load() if self.matrix is None else dict(zip((self._key(r) for r in self.rows), self.matrix))
+            missing = [c for c in chunks if self._key(c) not in stored]
+
+            batch_size = max(1, config.EMBEDDING_BATCH_SIZE)
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                vectors = self.embed_fn([self._embedding_text(c) for c in batch])
+                if vectors is None:
+                    raise RuntimeError("no local embedding model is available")
+                stored.update(zip((self._key(c) for c in batch), vectors))
+
+            counts = {"embedded": len(missing), "removed": len(set(stored) - {self._key(c) for c in chunks})}
+            if missing or counts["removed"] or self.matrix is None:
+                keys = [self._key(c) for c in chunks]
+                matrix = np.vstack([stored[k] for k in keys]).astype(np.float32) if keys else np.zeros((0, 0), np.float32)
+                self._save(keys, matrix)
+                self.matrix = np.load(self.directory / self.MATRIX_NAME, mmap_mode="r")
+            self.rows = chunks
+            self._snapshot = (self.matrix, chunks)
+            self.ready.set()
+            return counts
+
+    def _embedding_text(self, chunk: Dict[str, Any]) -> str:
+        return f"{chunk['path']}\n{self.search_index.chunk_text(chunk)}"[:config.EMBEDDING_MAX_CHARS]
+
+    def start_background_update(self) -> threading.Thread:
+        """Runs `update()` on a daemon thread unless one is already running."""
+        with self._instances_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self.last_error = None
+                self._worker = threading.Thread(target=self._background_update, name="embedding-index", daemon=True)
+                self._worker.start()
+            return self._worker
+
+    def _background_update(self):
+        try:
+            self.update()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Chunks closest in meaning to the query, best first, in the same shape as CodeSearchIndex.search."""
+        matrix, rows = self._snapshot
+        if matrix is None or not rows or not query.strip():
+            return []
+        vectors = self.embed_fn([query[:config.EMBEDDING_MAX_CHARS]])
+        if vectors is None:
+            return []
+        scores = np.asarray(matrix @ vectors[0])
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        results = []
+        for row in top[np.argsort(-scores[top])]:
+            chunk = rows[row]
+            results.append({"id": chunk["id"], "path": chunk["path"], "name": chunk["name"],
+                            "start_line": chunk["start_line"], "end_line": chunk["end_line"],
+                            "score": round(float(scores[row]), 3)})
+        return results
+
+    def select_context(self, query: str, max_tokens: Optional[int] = None, max_chunks: Optional[int] = None,
+                       exclude: Optional[Set[int]] = None) -> List[Dict[str, Any]]:
+        """Like CodeSearchIndex.select_context, ranked by embedding similarity."""
+        max_chunks = max_chunks if max_chunks is not None else config.CONTEXT_SEARCH_MAX_CHUNKS
+        return fit_to_budget(self.search(query, limit=max_chunks * 3), self.search_index.chunk_text,
+                             max_tokens, max_chunks, exclude)
+
+def fuse_rankings(rankings: List[List[Dict[str, Any]]], k: int = 60) -> List[Dict[str, Any]]:
+    """Reciprocal rank fusion of several ranked result lists, keyed by chunk id."""
+    scores: Dict[int, float] = {}
+    results: Dict[int, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking):
+            scores[result["id"]] = scores.get(result["id"], 0.0) + 1.0 / (k + rank + 1)
+            results.setdefault(result["id"], result)
+    return [dict(results[i], score=round(scores[i], 4)) for i in sorted(scores, key=lambda i: -scores[i])]
@@ -0,0 +1,248 @@
+# services/import_graph.py
+
+import posixpath
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from services.project_index import ProjectIndex
+
+_JS_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx')
+_MODULE_SUFFIXES = {'.py': 'python', '.java': 'java'}
+
+class ImportGraph:
+    """
+    File-level dependency graph built from the project index.
+
+    Imports are resolved to project paths (relative to the root): Python and
+    Java by full dotted module name from a source root (relative Python
+    imports within the importer's package), JavaScript/TypeScript by
+    relative specifier, and Go by package directory under the go.mod module
+    path. Imports that do not resolve to a project file (stdlib,
+    third-party) are left out.
+    `update()` re-resolves only files whose content hash changed, unless files
+    were added or removed, which can change how other imports resolve, and
+    bumps `version` whenever the graph changed.
+    """
+    _instances: Dict[Path, "ImportGraph"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, index: ProjectIndex):
+        self.index = index
+        self.edges: Dict[str, Set[str]] = {}
+        self.reverse: Dict[str, Set[str]] = {}
+        self._hashes: Dict[str, Optional[str]] = {}
+        self._modules: Dict[str, List[str]] = {}
+        self._paths: Set[str] = set()
+        self._go_module: Optional[str] = None
+        self.version = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_root(cls, root_path: Path) -> "ImportGraph":
+        """Returns the shared graph for a project."""
+        key = Path(root_path).resolve()
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(ProjectIndex.for_root(root_path))
+            return cls._instances[key]
+
+    def update(self) -> "ImportGraph":
+        """Refreshes the index and re-resolves the imports of changed files."""
+        with self._lock:
+            self.index.refresh()
+            records = {r["path"]: r for r in self.index.files()}
+            if set(records) != set(self._hashes):
+                self._build_module_map(records)
+                changed = set(records)
+            else:
+                changed = {p for p, r in records.items() if r["hash"] != self._hashes.get(p)}
+            if not changed:
+                return self
+
+            self.edges = {p: self.edges.get(p, set()) for p in records}
+            for path in changed:
+                self.edges[path] = self._resolve_all(path, records[path])
+            self._hashes = {p: r["hash"] for p, r in records.items()}
+            self.reverse = {p: set() for p in records}
+            for source, targets in self.edges.items():
+                for target in targets:
+                    self.reverse[target].add(source)
+            self.version += 1
+        return self
+
+    # --- Resolution ---
+
+    def _build_module_map(self, records: Dict[str, dict]):
+        """
+        Maps the full dotted name of each Python/Java file, as seen from each
+        source root above it, to that file. Python roots are the project root
+        and the parent of every top-level package (e.g. src/ for
+        src/pkg/__init__.py); Java roots are the project root and any src/ or
+        java/ directory. Only whole names are registered, so `import json`
+        never resolves to utils/json.py.
+        """
+        self._modules = {}
+        packages = {posixpath.dirname(p) for p in records if posixpath.basename(p) == "__init__.py"}
+        python_roots = {""} | {posixpath.dirname(d) for d in packages if posixpath.dirname(d) not in packages}
+        for path in records:
+            stem, suffix = posixpath.splitext(path)
+            language = _MODULE_SUFFIXES.get(suffix)
+            if language is None:
+                continue
+            parts = stem.split("/")
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            for start in range(len(parts)):
+                root = "/".join(stem.split("/")[:start])
+                is_root = (root in python_roots if language == "python"
+                           else start == 0 or posixpath.basename(root) in ("src", "java"))
+                if is_root and parts[start:]:
+                    self._modules.setdefault(".".join(parts[start:]), []).append(path)
+
+        self._go_module = None
+        if "go.mod" in records:
+            try:
+                for line in (self.index.root_path / "go.mod").read_text(encoding="utf-8", errors="ignore").splitlines():
+                    if line.startswith("module "):
+                        self._go_module = line.split()[1].strip()
+                        break
+            except OSError:
+                pass
+        self._paths = set(records)
+
+    def _resolve_all(self, path: str, record: dict) -> Set[str]:
+        targets = set()
+        for name in record.get("imports", []):
+            targets.update(self._resolve(path, record.get("language"), name))
+        targets.discard(path)
+        return targets
+
+    def _resolve(self, path: str, language: Optional[str], name: str) -> List[str]:
+        if language == "python":
+            if name.startswith("."):
+                return self._resolve_relative(path, name)
+            return self._lookup_module(name)
+        if language == "java":
+            return self._lookup_module(name)
+        if language in ("javascript", "typescript"):
+            if not name.startswith("."):
+                return []
+            base = posixpath.normpath(posixpath.join(posixpath.dirname(path), name))
+            candidates = [base] + [base + ext for ext in _JS_EXTENSIONS] + [f"{base}/index{ext}" for ext in _JS_EXTENSIONS]
+            return next(([c] for c in candidates if c in self._paths), [])
+        if language == "go":
+            if not self._go_module or not (name == self._go_module or name.startswith(self._go_module + "/")):
+                return []
+            directory = name[len(self._go_module):].strip("/")
+            return [p for p in self._paths
+                    if posixpath.dirname(p) == directory and p.endswith(".go") and not p.endswith("_test.go")]
+        return []
+
+    def _lookup_module(self, name: str) -> List[str]:
+        return sorted(self._modules.get(name, []))
+
+    def _resolve_relative(self, path: str, name: str) -> List[str]:
+        """`from .mod import x` and friends, resolved inside the importer's package."""
+        level = len(name) - len(name.lstrip("."))
+        package = posixpath.dirname(path).split("/") if posixpath.dirname(path) else []
+        if level - 1 > len(package):
+            return []
+        base = package[:len(package) - (level - 1)]
+        target = "/".join(base + [part for part in name.lstrip(".").split(".") if part])
+        candidates = [f"{target}.py", f"{target}/__init__.py" if target else "__init__.py"]
+        return [c for c in candidates if c in self._paths][:1]
+
+    # --- Queries ---
+
+    def imports_of(self, path: str) -> List[str]:
+        """Project files that `path` imports directly."""
+        return sorted(self.edges.get(path, ()))
+
+    def importers_of(self, path: str) -> List[str]:
+        """Project files that import `path` directly."""
+        return sorted(self.reverse.get(path, ()))
+
+    def dependents(self, path: str, transitive: bool = True) -> List[str]:
+        """Files affected by a change to `path`: direct importers, or everything that reaches it."""
+        if not transitive:
+            return self.importers_of(path)
+        seen, queue = set(), deque([path])
+        while queue:
+            for importer in self.reverse.get(queue.popleft(), ()):
+                if importer not in seen and importer != path:
+                    seen.add(importer)
+                    queue.append(importer)
+        return sorted(seen)
+
+    def strongly_connected_components(self, min_size: int = 2) -> List[List[str]]:
+        """Import cycles as Tarjan SCCs (iterative, so deep graphs cannot overflow the stack)."""
+        index_of: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        on_stack: Set[str] = set()
+        stack: List[str] = []
+        components: List[List[str]] = []
+        counter = 0
+
+        for root in sorted(self.edges):
+            if root in index_of:
+                continue
+            work = [(root, iter(sorted(self.edges.get(root, ()))))]
+            index_of[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, children = work[-1]
+                child = next(children, None)
+                if child is not None:
+                    if child not in index_of:
+                        index_of[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(sorted(self.edges.get(child, ())))))
+                    elif child in on_stack:
+                        lowlink[node] = min(lowlink[node], index_of[child])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) >= min_size:
+                        components.append(sorted(component))
+        return sorted(components)
+
+    def relative_path(self, path: str) -> str:
+        """Normalizes a user- or model-supplied path to the index's root-relative form."""
+        candidate = Path(path)
+        if candidate.is_absolute():
+            try:
+                return candidate.resolve().relative_to(self.index.root_path.resolve()).as_posix()
+            except ValueError:
+                return path
+        return posixpath.normpath(path)
+
+    def describe_dependents(self, path: str, transitive: bool = True) -> str:
+        """Tool-friendly summary of what depends on `path`."""
+        path = self.relative_path(path)
+        if path not in self.edges:
+            return f"[red]Error:[/] '{path}' is not an indexed project file."
+        direct = self.importers_of(path)
+        lines = [f"Direct importers of {path} ({len(direct)}):"] + [f"- {p}" for p in direct]
+        if transitive:
+            indirect = [p for p in self.dependents(path) if p not in direct]
+            lines += [f"Indirect dependents ({len(indirect)}):"] + [f"- {p}" for p in indirect]
+        cycle = next((c for c in self.strongly_connected_components() if path in c), None)
+        if cycle:
+            lines.append(f"Import cycle: {', '.join(cycle)}")
+        return "\n".join(lines)
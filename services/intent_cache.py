@@ -0,0 +1,146 @@
+# services/intent_cache.py
+
+import re
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import config
+
+class IntentCache:
+    """
+    LRU cache of NLU results keyed by a normalized command template.
+
+    Entity values that appear in the command are replaced by placeholders, so
+    "read foo.py" and "read bar.py" share the template "read <path>". Only
+    confident, non-clarify results are stored. The cache is persisted as JSON
+    under .deepcoderx/.
+    """
+    FILE_NAME = "nlu_cache.json"
+    TEMPLATE_ENTITIES = ("path", "command", "content")
+    CONFIDENCE_THRESHOLD = 0.8
+    MIN_ENTITY_LENGTH = 3
+    _QUOTES = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "`": "'"})
+    _instances: Dict[Path, "IntentCache"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path, max_entries: Optional[int] = None):
+        self.path = Path(path)
+        self.max_entries = max_entries or config.NLU_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._patterns: Dict[str, re.Pattern] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def for_root(cls, root_path: Path) -> "IntentCache":
+        """Returns the shared cache for a project, loading it on first use."""
+        path = Path(root_path) / ".deepcoderx" / cls.FILE_NAME
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(path)
+            return cls._instances[path]
+
+    @classmethod
+    def normalize(cls, text: str) -> str:
+        """Unifies quote characters, collapses whitespace and trims trailing punctuation."""
+        text = text.translate(cls._QUOTES)
+        text = re.sub(r"\s+", " ", text).strip()
+        return re.sub(r"[\s.!?]+$", "", text)
+
+    def template_for(self, text: str, result: Dict[str, Any]) -> Optional[str]:
+        """Builds the cache key for a parsed command, or None if it would be too generic."""
+        template = self.normalize(text).lower()
+        for name in self.TEMPLATE_ENTITIES:
+            value = result.get("entities", {}).get(name)
+            if not isinstance(value, str) or not value.strip():
+                continue
+            needle = self.normalize(value).lower()
+            # Too short to tell apart from ordinary words ("a", "ls")
+            if len(needle) < self.MIN_ENTITY_LENGTH:
+                return None
+            # Whole tokens only, so "a.py" is not found inside "data.py"
+            pattern = re.compile(r"(?<!\w)(['\"]?)" + re.escape(needle) + r"\1(?!\w)")
+            if pattern.search(template):
+                template = pattern.sub(f"<{name}>", template, count=1)
+        # A template made only of placeholders would match every command
+        if not re.search(r"[a-z]", re.sub(r"<\w+>", "", template)):
+            return None
+        return template
+
+    def _pattern(self, template: str) -> re.Pattern:
+        if template not in self._patterns:
+            parts = re.split(r"<(\w+)>", template)
+            regex = ""
+            for i, part in enumerate(parts):
+                if i % 2:
+                    regex += rf"(?P<q_{part}>['\"]?)(?P<{part}>.+?)(?P=q_{part})"
+                else:
+                    regex += re.escape(part)
+            self._patterns[template] = re.compile(regex, re.I)
+        return self._patterns[template]
+
+    def get(self, text: str) -> Optional[Dict[str, Any]]:
+        cleaned = self.normalize(text)
+        with self._lock:
+            # Exact phrasings first, then templates from most recently used
+            for template in [cleaned.lower()] + list(reversed(self._entries)):
+                entry = self._entries.get(template)
+                if entry is None:
+                    continue
+                match = self._pattern(template).fullmatch(cleaned)
+                if not match:
+                    continue
+                self._entries.move_to_end(template)
+                entities = dict(entry["entities"])
+                for name in self.TEMPLATE_ENTITIES:
+                    if f"<{name}>" in template:
+                        entities[name] = match.group(name)
+                return {"intent": entry["intent"], "entities": entities, "confidence": entry["confidence"]}
+        return None
+
+    def put(self, text: str, result: Dict[str, Any]):
+        """Stores a confident result; clarifications and low-confidence results are ignored."""
+        try:
+            confidence = float(result.get("confidence", 0.0))
+        except (TypeError, ValueError):
+            return
+        if result.get("intent") in (None, "clarify") or confidence < self.CONFIDENCE_THRESHOLD:
+            return
+        template = self.template_for(text, result)
+        if template is None:
+            return
+        entities = {
+            name: (f"<{name}>" if f"<{name}>" in template else value)
+            for name, value in result.get("entities", {}).items()
+        }
+        with self._lock:
+            self._entries[template] = {"intent": result["intent"], "entities": entities, "confidence": confidence}
+            self._entries.move_to_end(template)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._patterns.pop(evicted, None)
+            self._save()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self._entries.update(data.get("entries", []))
+        except (OSError, json.JSONDecodeError, ValueError):
+            self._entries.clear()
+
+    def _save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                # Stored as a list to keep LRU order explicit
+                json.dump({"entries": list(self._entries.items())}, f)
+            tmp_path.replace(self.path)
+        except OSError:
+            pass
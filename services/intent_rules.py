@@ -0,0 +1,117 @@
+# services/intent_rules.py
+
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# A path or argument: quoted string or a single whitespace-free token
+_ARG = r'(?P<path>"[^"]+"|\'[^\']+\'|`[^`]+`|\S+)'
+_CONTENT = r'(?P<content>"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')'
+_DIR_NOUN = r'(?:the\s+)?(?:current\s+)?(?:directory|folder|dir)'
+_FILE_NOUN = r'(?:the\s+)?(?:file\s+)?'
+
+class RuleBasedIntentParser:
+    """
+    Deterministic fast path for common filesystem commands.
+
+    Covers the usual phrasings of every NLU intent plus shell-like forms
+    (cat/ls/rm/rmdir/mkdir/cd/echo > file). Patterns are anchored to the whole
+    command, so anything with extra clauses falls through to the LLM parser.
+    Reading, listing and deleting also need a path-like argument (a separator,
+    an extension, a leading dot) or one that exists, so "delete everything" or
+    "show status" are left to the LLM as well.
+    """
+    CONFIDENCE = 0.95
+    PATH_INTENTS = ("read_file", "list_dir", "delete_path")
+    _PATH_LIKE = re.compile(r'[/\\]|^~|^\.|\.\w{1,10}$')
+    _LEADING_NOISE = re.compile(r'^(?:to\s+|:\s*|please\s+|can\s+you\s+|could\s+you\s+)+', re.I)
+    # A single full stop is only stripped after a word, so "ls ." and "cd .." survive
+    _TRAILING_NOISE = re.compile(r'(?:\s+please)?(?:(?<=[\w"\'`])\.)?[\s!?]*$', re.I)
+
+    def __init__(self):
+        self.rules: List[Tuple[str, re.Pattern, Callable[[re.Match], Dict[str, Any]]]] = []
+        path = lambda m: {"path": self._unquote(m.group("path"))}
+        cwd = lambda m: {"path": self._unquote(m.group("path")) if m.group("path") else "."}
+        command = lambda m: {"command": m.group("command").strip()}
+
+        # --- Shell-like forms ---
+        self._add("read_file", rf'cat\s+{_ARG}', path)
+        self._add("list_dir", rf'(?:ls|dir)(?:\s+-\w+)*(?:\s+{_ARG})?', cwd)
+        self._add("delete_path", rf'(?:rm|rmdir|del)(?:\s+-\w+)*\s+{_ARG}', path)
+        self._add("change_directory", rf'cd\s+{_ARG}', path)
+        self._add("run_bash", r'(?P<command>mkdir\s+(?:-p\s+)?\S+)', command)
+        self._add("write_file", rf'echo\s+{_CONTENT}\s*>\s*{_ARG}',
+                  lambda m: {"path": self._unquote(m.group("path")), "content": self._unquote(m.group("content"))})
+
+        # --- Natural language forms ---
+        self._add("list_dir",
+                  rf'(?:list|show(?:\s+me)?|display)\s+(?:all\s+)?(?:the\s+)?(?:files|entries|items)'
+                  rf'(?:\s+(?:in|of|inside|under)\s+{_DIR_NOUN}?\s*{_ARG})?', cwd)
+        self._add("list_dir", rf'(?:list|show(?:\s+me)?|display)\s+(?:the\s+)?contents?\s+of\s+{_DIR_NOUN}\s*{_ARG}?', cwd)
+        self._add("list_dir", rf'(?:list|what\'?s\s+in|what\s+is\s+in)\s+{_DIR_NOUN}\s*{_ARG}?', cwd)
+        self._add("list_dir", rf'list\s+{_ARG}', path)
+        self._add("read_file",
+                  rf'(?:read|open|show(?:\s+me)?|display|print|view|cat)\s+(?:the\s+)?(?:contents?\s+of\s+)?{_FILE_NOUN}{_ARG}', path)
+        self._add("read_file", rf'(?:(?:show|tell)\s+me\s+)?what(?:\'s|\s+is)\s+in\s+(?:the\s+)?file\s+{_ARG}', path)
+        self._add("write_file",
+                  rf'(?:write|put|save)\s+{_CONTENT}\s+(?:to|in|into)\s+{_FILE_NOUN}{_ARG}',
+                  lambda m: {"path": self._unquote(m.group("path")), "content": self._unquote(m.group("content"))})
+        self._add("write_file",
+                  rf'(?:create|make|touch)\s+(?:a\s+)?(?:new\s+)?(?:empty\s+)?file\s+(?:called\s+|named\s+)?{_ARG}'
+                  rf'(?:\s+(?:with|containing)\s+(?:the\s+)?(?:content\s+|text\s+)?{_CONTENT})?',
+                  lambda m: {"path": self._unquote(m.group("path")),
+                             "content": self._unquote(m.group("content")) if m.group("content") else ""})
+        self._add("delete_path", rf'(?:delete|remove|erase)\s+(?:the\s+)?(?:file\s+|directory\s+|folder\s+)?{_ARG}', path)
+        self._add("change_directory",
+                  rf'(?:go\s+(?:in)?to|change\s+{_DIR_NOUN}\s+to|switch\s+to|enter|cd\s+into|move\s+into)\s+{_DIR_NOUN}?\s*{_ARG}', path)
+        self._add("change_directory", r'(?:go\s+up|go\s+back|cd\s+\.\.)(?P<path>)', lambda m: {"path": ".."})
+        # Free-form "run X" is too ambiguous ("run the tests"); require quoting or the word "command"
+        self._add("run_bash", r'(?:run|execute|exec)\s+(?:the\s+)?(?:shell\s+|bash\s+)?command\s+(?P<command>.+)',
+                  lambda m: {"command": self._unquote(m.group("command").strip())})
+        self._add("run_bash", r'(?:run|execute|exec)\s+(?P<command>"[^"]+"|\'[^\']+\'|`[^`]+`)',
+                  lambda m: {"command": self._unquote(m.group("command"))})
+
+    def _add(self, intent: str, pattern: str, entities: Callable[[re.Match], Dict[str, Any]]):
+        self.rules.append((intent, re.compile(pattern + r'$', re.I | re.S), entities))
+
+    @staticmethod
+    def _unquote(value: str) -> str:
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'`":
+            value = value[1:-1]
+        return value
+
+    def normalize(self, command_text: str) -> str:
+        text = self._LEADING_NOISE.sub("", command_text.strip())
+        return self._TRAILING_NOISE.sub("", text)
+
+    def _existing(self, path: str, cwd: Optional[Path]) -> Optional[Path]:
+        if cwd is None:
+            return None
+        try:
+            target = Path(cwd) / Path(path).expanduser()
+            return target if target.exists() else None
+        except (OSError, ValueError):
+            return None
+
+    def parse(self, command_text: str, cwd: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns an NLU-shaped result for a confident match, otherwise None.
+        `cwd` is the directory bare names are looked up in.
+        """
+        text = self.normalize(command_text)
+        if not text:
+            return None
+        for intent, pattern, entities in self.rules:
+            match = pattern.match(text)
+            if match:
+                found = entities(match)
+                if intent in self.PATH_INTENTS:
+                    existing = self._existing(found["path"], cwd)
+                    if existing is None and not self._PATH_LIKE.search(found["path"]):
+                        return None
+                    # "show me src/" or "show me tests" names a directory, not a file
+                    if intent == "read_file" and (found["path"].endswith("/") or (existing and existing.is_dir())):
+                        intent = "list_dir"
+                return {"intent": intent, "entities": found, "confidence": self.CONFIDENCE}
+        return None
@@ -1,23 +1,37 @@
-import sys
 import os
 import re
 import json
-import shutil
+import threading
 import subprocess
-import traceback
+import time
+import itertools
+import sqlite3
 import contextlib
 import requests
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
-from llama_cpp import Llama
+from llama_cpp import Llama, LlamaGrammar
 
 from config import config
 from utils.logging import console, log_api_usage
-from services.context_builder import CodeContextBuilder
+from utils.json_stream import JsonObjectExtractor, extract_tool_calls, parse_tool_call
+from utils.telemetry import UsageRecorder
+from utils.cancellation import cancel_event, check_cancelled, is_cancelled, run_cancellable, run_subprocess
 from models.session import CommandContext
 from models.router import CommandHandler
-from services.nlu_parser import NLUParser
+from services.nlu_parser import NLUParser, share_coding_model
+from services.tool_results import ToolResultStore
+from services.blob_store import BlobStore
+from services.tool_grammar import build_tool_call_gbnf
+from services.response_cache import ResponseCache
+from services.backend_router import BackendRouter
+from services.budget import RequestBudget
+from services.session_db import open_session
+from services.import_graph import ImportGraph
+from services.repo_map import RepoMap
+from services.code_search import CodeSearchIndex, fit_to_budget, format_chunks
+from services.embedding_index import EmbeddingIndex, fuse_rankings
 
 class SecurityMiddleware(CommandHandler):
     UNSAFE_PATTERNS = [
@@ -163,14 +177,8 @@ No command specified for execution."""
 
             try:
                 # Execute the command within the current directory
-                process = subprocess.run(
-                    command, 
-                    shell=True, 
-                    capture_output=True, 
-                    text=True, 
-                    timeout=30, # 30-second timeout
-                    cwd=self.ctx.current_dir
-                )
+                # 30-second timeout; Ctrl-C kills the command's process group
+                process = run_subprocess(self.ctx, command, timeout=30, cwd=self.ctx.current_dir)
                 stdout = process.stdout.strip()
                 stderr = process.stderr.strip()
                 if process.returncode == 0:
@@ -196,23 +204,44 @@ class DeepSeekAnalysisHandler(CommandHandler):
         r'\bcross-file\b', r'\bcodebase\b', r'\bpattern\b', r'\banalyze\b',
         r'\bexplain\b', r'\bimprove\b', r'\boptimize\b', r'\bdesign\b'
     }
+    accepts_failover = True
 
     def __init__(self, context: CommandContext):
         super().__init__(context)
-        self.session_file = self.ctx.root_path / ".deepcoderx" / "deepseek_session.json"
+        self.session = open_session(self.ctx.root_path, "deepseek", getattr(self.ctx, "session_name", None))
+        self.blobs = BlobStore.for_root(self.ctx.root_path)
+        self.result_store = ToolResultStore(blobs=self.blobs)
+        self.response_cache = None
+        if config.DEEPSEEK_CACHE_ENABLED:
+            self.response_cache = ResponseCache(self.ctx.root_path / ".deepcoderx" / "response_cache.db")
+        self.bypass_cache = False
+        self.sent_chunks = set()  # Code search chunk ids already included in this session
+        self.last_call_failed = False
+        self.tool_iteration = 0
+        self.last_call_tokens = 0
+        self.budget: Optional[RequestBudget] = None
+        self.usage_recorder = UsageRecorder(self.ctx.root_path)
         self._load_history()
 
     def _load_history(self):
-        if self.session_file.exists():
-            with open(self.session_file, "r") as f:
-                self.message_history = json.load(f)
-        else:
-            self.message_history = []
+        self.message_history = self.session.load()
 
     def _save_history(self):
-        self.session_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.session_file, "w") as f:
-            json.dump(self.message_history, f, indent=2)
+        """Logs any unsaved messages and fsyncs the session log."""
+        self.session.sync(self.message_history, durable=True)
+
+    def switch_session(self, name: str):
+        """Saves the current conversation and resumes (or starts) the named one."""
+        self._save_history()
+        self.session.close()
+        self.session = open_session(self.ctx.root_path, "deepseek", name)
+        self._load_history()
+
+    def checkpoint(self):
+        return list(self.message_history), set(self.sent_chunks)
+
+    def rollback(self, state):
+        self.message_history, self.sent_chunks = list(state[0]), set(state[1])
 
     def can_handle(self) -> bool:
         if not config.DEEPSEEK_ENABLED:
@@ -224,17 +253,22 @@ class DeepSeekAnalysisHandler(CommandHandler):
         if "--build-context" in query:
             return True
             
-        if any(re.search(pattern, query) for pattern in self.ANALYSIS_KEYWORDS):
-            return True
-            
-        return False
+        keyword_match = any(re.search(pattern, query) for pattern in self.ANALYSIS_KEYWORDS)
+        router = getattr(self.ctx, "backend_router", None)
+        if router is None:
+            return keyword_match
+        return router.choose(self.ctx.user_input, analysis_hint=keyword_match) == BackendRouter.CLOUD
 
     def handle(self) -> None:
         self.ctx.model_name = "DeepSeek (Cloud)"
         if "--build-context" in self.ctx.user_input:
             context_manager = ContextManager(self.ctx)
-            context_manager.build_and_save_context()
-            self.ctx.response = f"[green]Successfully built and saved project context to {context_manager.CONTEXT_FILE_NAME}[/]."
+            context_manager.refresh_context(force=True)
+            if context_manager.refreshed:
+                sections = ", ".join(context_manager.refreshed)
+                self.ctx.response = f"[green]Successfully refreshed project context in {context_manager.CONTEXT_FILE_NAME} ({sections})[/]."
+            else:
+                self.ctx.response = f"[green]Project context in {context_manager.CONTEXT_FILE_NAME} is already up to date[/]."
             return
 
         self.ctx.status = "Analyzing with DeepSeek..."
@@ -245,58 +279,67 @@ class DeepSeekAnalysisHandler(CommandHandler):
             self.ctx.response = "DeepSeek API key not configured"
             return
 
-        context_manager = ContextManager(self.ctx)
-        if context_manager.context_file_exists():
-            initial_context = context_manager.read_context_file()
-        else:
-            initial_context = context_manager.build_and_save_context()
+        # Cheap when nothing changed: stats the key files and reuses the throttled index refresh
+        initial_context = ContextManager(self.ctx).refresh_context()
 
         system_prompt = config.DEEPSEEK_SYSTEM_PROMPT + f"\n\n**Project Context File:**\n{initial_context}\n\n**Current Configuration**:\n{config.CURRENT_CONFIG}"
 
-        user_prompt = self.ctx.user_input.replace("@deepseek", "", 1).strip()
+        self.bypass_cache = "--no-cache" in self.ctx.user_input
+        user_prompt = self.ctx.user_input.replace("@deepseek", "", 1).replace("--no-cache", "").strip()
 
+        user_content = user_prompt
+        if not self.message_history:
+            user_content += self._repo_map(user_prompt)
+        user_content += self._retrieve_context(user_prompt)
         if not self.message_history:
             self.message_history = [
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
+                {"role": "user", "content": user_content}
             ]
         else:
-            self.message_history.append({"role": "user", "content": user_prompt})
-
-        max_tool_calls = 50
-        for i in range(max_tool_calls):
-            # Check if we are about to exceed the limit and prompt the user
-            if i == max_tool_calls - 1:
-                # Do not prompt for input if running in a test environment
-                if "PYTEST_CURRENT_TEST" in os.environ:
-                    self.ctx.response = "[red]Operation canceled by test environment to prevent infinite loop.[/]"
-                    return
-
-                self.ctx.status_message = "Tool call limit reached. Asking for user confirmation."
-                console.print("\n[bold yellow]Warning:[/] The AI has used its tools 49 times and may be in a loop.")
-                if input("Do you want to allow it to continue for another 50 calls? (y/N) ").lower() != 'y':
-                    self.ctx.response = "[red]Operation canceled by user.[/]"
-                    return
-                # If the user says yes, we can extend the loop. For now, we'll just let it run one more time.
+            self.message_history.append({"role": "user", "content": user_content})
+
+        # Bounded by the request budget (wall time, tokens, tool calls) instead of
+        # a fixed iteration count, so headless runs never block on input().
+        self.budget = RequestBudget.from_context(self.ctx)
+        for i in itertools.count():
+            check_cancelled(self.ctx)
+            exhausted = self.budget.exhausted()
+            if exhausted:
+                self._finish_within_budget(exhausted)
+                break
 
             self.ctx.status_message = "Thinking with DeepSeek..."
             self.ctx.status = "Thinking with DeepSeek..."
+            self.tool_iteration = i
             model_response_text = self._get_model_response(self.message_history)
+            self.budget.charge_tokens(self.last_call_tokens)
+            if i == 0 and self.last_call_failed and self._can_fail_over():
+                # Let the local model take the request; drop the unanswered prompt.
+                # The error stays the response in case no other handler takes it.
+                self.message_history.pop()
+                self.ctx.response = model_response_text
+                self.ctx.failover = True
+                return
 
-            # Use findall to capture all tool calls in the response
-            tool_call_matches = re.findall(r'\{.*?\}', model_response_text, re.DOTALL)
+            # Capture all tool calls in the response, including ones with nested braces
+            tool_calls = extract_tool_calls(model_response_text)
             
-            if tool_call_matches:
+            if tool_calls:
                 tool_results = []
-                for tool_call_json in tool_call_matches:
-                    try:
-                        response_json = json.loads(tool_call_json)
-                        if "tool" in response_json:
-                            self.ctx.status = f"Using tool: {response_json['tool']}..."
-                            tool_results.append(self._execute_tool(response_json))
-                    except json.JSONDecodeError:
-                        # Ignore invalid JSON, treat as text
+                self.result_store.new_turn()
+                for tool_call_json, response_json in tool_calls:
+                    if response_json is None:
                         tool_results.append(f"Invalid JSON in tool call: {tool_call_json}")
+                        continue
+                    # Checked per call: one response may hold more calls than the budget allows
+                    if not self.budget.take_tool_call():
+                        tool_results.append(self.budget.skipped_tool_call(response_json["tool"]))
+                        continue
+                    check_cancelled(self.ctx)
+                    self.ctx.status = f"Using tool: {response_json['tool']}..."
+                    result = self._execute_tool(response_json)
+                    tool_results.append(self.blobs.pack(self.result_store.cap(response_json["tool"], result)))
                 
                 # If any tools were executed, feed all results back to the model
                 if tool_results:
@@ -304,42 +347,143 @@ class DeepSeekAnalysisHandler(CommandHandler):
                         console.print("\n[bold blue]-- Model Tool Call --[/]")
                         console.print(model_response_text)
                         console.print("\n[bold blue]-- Tool Results --[/]")
-                        console.print("\n".join(tool_results))
+                        console.print(self.blobs.expand("\n".join(tool_results)))
                         console.print("\n[bold blue]---------------------[/]")
 
                     self.message_history.append({"role": "assistant", "content": model_response_text})
-                    self.message_history.append({"role": "user", "content": f"Tool Results: \n" + "\n".join(tool_results)})
+                    self.message_history.append({"role": "user", "content": f"Tool Results: \n" + "\n".join(tool_results) + "\n\n" + self.budget.hint()})
                     continue
 
             # If no valid tool call is found, this is the final answer
             self.ctx.response = model_response_text
             self.message_history.append({"role": "assistant", "content": self.ctx.response})
             break
-        else:
-            self.ctx.response = "[red]Error:[/] Exceeded maximum tool calls (10)."
 
         # Maintain a reasonable history size
         if len(self.message_history) > 10:
             self.message_history = [self.message_history[0]] + self.message_history[-8:]
+        # Log the turn now rather than on exit, so a crash cannot lose it
+        self.session.sync(self.message_history)
+
+    def _retrieve_context(self, query: str) -> str:
+        """Code chunks relevant to the question that were not already sent in this session."""
+        root_path = getattr(self.ctx, "root_path", None)
+        if not config.CONTEXT_SEARCH_ENABLED or not isinstance(root_path, (str, Path)):
+            return ""
+        try:
+            chunks = self._select_chunks(Path(root_path), query)
+        except (OSError, sqlite3.Error) as e:
+            if self.ctx.debug_mode:
+                console.print(f"[bold red]DEBUG:[/] Code search unavailable: {e}", style="dim")
+            return ""
+        if not chunks:
+            return ""
+        self.sent_chunks.update(chunk["id"] for chunk in chunks)
+        return "\n\n**Relevant code (retrieved for this question):**\n" + format_chunks(chunks)
+
+    def _repo_map(self, prompt: str) -> str:
+        """The repository's most central definitions, ranked toward what the prompt mentions."""
+        root_path = getattr(self.ctx, "root_path", None)
+        if config.REPO_MAP_MAX_TOKENS <= 0 or not isinstance(root_path, (str, Path)):
+            return ""
+        try:
+            repo_map = RepoMap.for_root(Path(root_path)).render(prompt)
+        except (OSError, sqlite3.Error) as e:
+            if self.ctx.debug_mode:
+                console.print(f"[bold red]DEBUG:[/] Repository map unavailable: {e}", style="dim")
+            return ""
+        return f"\n\n**Repository map (most central definitions):**\n```\n{repo_map}\n```" if repo_map else ""
+
+    def _select_chunks(self, root_path: Path, query: str) -> List[Dict[str, Any]]:
+        """Ranks chunks by CONTEXT_STRATEGY; embedding ranking falls back to BM25 until its index is built."""
+        search = CodeSearchIndex.for_root(root_path)
+        search.update()
+        strategy = config.CONTEXT_STRATEGY
+        if strategy in ("embedding", "hybrid"):
+            embeddings = EmbeddingIndex.for_root(root_path)
+            embeddings.start_background_update()
+            if embeddings.ready.is_set():
+                if strategy == "embedding":
+                    return embeddings.select_context(query, exclude=self.sent_chunks)
+                limit = config.CONTEXT_SEARCH_MAX_CHUNKS * 3
+                ranked = fuse_rankings([search.search(query, limit=limit), embeddings.search(query, limit=limit)])
+                return fit_to_budget(ranked, search.chunk_text, exclude=self.sent_chunks)
+            if self.ctx.debug_mode:
+                console.print("[bold red]DEBUG:[/] Embedding index still building; using keyword search", style="dim")
+        return search.select_context(query, exclude=self.sent_chunks)
+
+    def _finish_within_budget(self, reason: str):
+        """Asks the model for a best-effort final answer once the request budget is spent."""
+        self.ctx.status = "Budget exhausted, finalizing answer..."
+        self.budget.finalizing = True
+        self.message_history.append({"role": "user", "content": self.budget.exhausted_prompt(reason)})
+        answer = self._get_model_response(self.message_history)
+        self.message_history.append({"role": "assistant", "content": answer})
+        self.ctx.response = f"[yellow]Note:[/] Stopped early ({reason}).\n\n{answer}"
+
+    def _can_fail_over(self) -> bool:
+        """Routed requests may fall back to a usable local model; explicit @deepseek ones may not."""
+        router = getattr(self.ctx, "backend_router", None)
+        return (router is not None and router.is_available(BackendRouter.LOCAL)
+                and not self.ctx.user_input.lower().startswith("@deepseek"))
 
     def _get_model_response(self, message_history: List[Dict[str, str]]) -> str:
+        router = getattr(self.ctx, "backend_router", None)
+        self.last_call_failed = False
+        self.last_call_tokens = 0
+        started = time.monotonic()
         try:
             headers = {"Authorization": f"Bearer {config.DEEPSEEK_API_KEY}"}
+            max_tokens, timeout = config.DEEPSEEK_MAX_TOKENS, 90
+            if self.budget is not None:
+                max_tokens = self.budget.call_max_tokens(max_tokens)
+                timeout = self.budget.call_timeout(timeout)
             payload = {
                 "model": "deepseek-coder",
-                "messages": message_history,
+                "messages": self.blobs.expand_messages(message_history),
                 "temperature": 0.1,
+                "max_tokens": max_tokens,
             }
-            response = requests.post(
+            use_cache = self.response_cache is not None and not self.bypass_cache
+            if use_cache:
+                cached = self.response_cache.get(payload)
+                if cached is not None:
+                    if self.ctx.debug_mode:
+                        console.print(f"[bold red]DEBUG:[/] Response cache hit {self.response_cache.stats()}", style="dim")
+                    return cached
+            # Abandoned (not awaited) if the request is cancelled mid-call
+            response = run_cancellable(
+                self.ctx, requests.post,
                 config.DEEPSEEK_API_URL, 
                 headers=headers, 
                 json=payload, 
-                timeout=90
+                timeout=timeout
             )
             response.raise_for_status()
-            log_api_usage("deepseek", response.json().get("usage", {}).get("total_tokens", 0))
-            return response.json()["choices"][0]["message"]["content"]
+            latency = time.monotonic() - started
+            usage = response.json().get("usage", {})
+            log_api_usage("deepseek", usage.get("total_tokens", 0))
+            self.last_call_tokens = usage.get("total_tokens", 0)
+            content = response.json()["choices"][0]["message"]["content"]
+            self.usage_recorder.record(
+                BackendRouter.CLOUD, latency,
+                prompt_tokens=usage.get("prompt_tokens"),
+                completion_tokens=usage.get("completion_tokens"),
+                iteration=self.tool_iteration,
+                ttft_upper_bound=True,
+            )
+            if router is not None:
+                router.record_success(BackendRouter.CLOUD, latency, usage.get("completion_tokens", 0))
+            if use_cache:
+                self.response_cache.put(payload, content)
+            return content
         except Exception as e:
+            self.last_call_failed = True
+            self.usage_recorder.record(
+                BackendRouter.CLOUD, time.monotonic() - started, iteration=self.tool_iteration, error=str(e)
+            )
+            if router is not None:
+                router.record_failure(BackendRouter.CLOUD)
             return f"[red]API Error:[/] {str(e)}"
 
     def _execute_tool(self, tool_call: Dict[str, Any]) -> str:
@@ -348,14 +492,55 @@ class DeepSeekAnalysisHandler(CommandHandler):
         if tool_name == "delete_path":
             return "[red]Error:[/] The 'delete_path' tool is disabled."
 
+        if tool_name == "read_result":
+            return self.result_store.read_page(tool_call.get("handle", ""), tool_call.get("page", 1))
+
+        if tool_name == "search_code":
+            if not tool_call.get("query"):
+                return "[red]Error:[/] Query is required for search_code."
+            search = CodeSearchIndex.for_root(self.ctx.root_path)
+            search.update()
+            results = search.search(tool_call["query"], limit=10)
+            if not results:
+                return f"No code matches '{tool_call['query']}'."
+            return "\n".join(
+                f"{r['path']}:{r['start_line']}-{r['end_line']} {r['name'] or ''} (score {r['score']})" for r in results
+            )
+
+        if tool_name == "semantic_search":
+            if not tool_call.get("query"):
+                return "[red]Error:[/] Query is required for semantic_search."
+            # Indexing runs in the background; search what is already embedded rather than block the request
+            embeddings = EmbeddingIndex.for_root(self.ctx.root_path)
+            embeddings.start_background_update()
+            deadline = time.monotonic() + config.SEMANTIC_SEARCH_WAIT_SECONDS
+            while not embeddings.ready.wait(timeout=0.1) and time.monotonic() < deadline:
+                check_cancelled(self.ctx)
+                if embeddings.last_error:
+                    break
+            if not embeddings.ready.is_set():
+                if embeddings.last_error:
+                    return f"[red]Error:[/] Semantic search unavailable: {embeddings.last_error}. Use search_code instead."
+                return "The semantic index is still being built in the background. Use search_code for now."
+            results = embeddings.search(tool_call["query"], limit=10)
+            if not results:
+                return f"No code found for '{tool_call['query']}'."
+            return "\n".join(
+                f"{r['path']}:{r['start_line']}-{r['end_line']} {r['name'] or ''} (similarity {r['score']})" for r in results
+            )
+
+        if tool_name == "find_dependents":
+            if not tool_call.get("path"):
+                return "[red]Error:[/] Path is required for find_dependents."
+            graph = ImportGraph.for_root(self.ctx.root_path).update()
+            return graph.describe_dependents(tool_call["path"], bool(tool_call.get("transitive", True)))
+
         if tool_name == "run_bash":
             command = tool_call.get("command")
             if not command:
                 return "[red]Error:[/] Command is required for run_bash."
             try:
-                process = subprocess.run(
-                    command, shell=True, capture_output=True, text=True, timeout=120, cwd=self.ctx.current_dir
-                )
+                process = run_subprocess(self.ctx, command, timeout=120, cwd=self.ctx.current_dir)
                 return f"STDOUT:\n{process.stdout}\nSTDERR:\n{process.stderr}"
             except Exception as e:
                 return f"[red]Error:[/] Failed to execute command: {e}"
@@ -384,8 +569,7 @@ class DeepSeekAnalysisHandler(CommandHandler):
     def clear_history(self):
         """Resets the conversation history and deletes the session file."""
         self.message_history = []
-        if self.session_file.exists():
-            self.session_file.unlink()
+        self.session.clear()
         if self.ctx.debug_mode:
             console.print("[bold red]DEBUG:[/] DeepSeek conversation history cleared.", style="dim")
 
@@ -406,11 +590,9 @@ class AutoImplementHandler(CommandHandler):
             return
             
         # Safety confirmation prompt
-        if not self.ctx.dry_run and not self.ctx.auto_confirm:
-            console.print("[bold yellow]WARNING:[/] This will modify files. Continue? (y/N)", end=" ")
-            if input().strip().lower() != 'y':
-                self.ctx.response = "Implementation canceled"
-                return
+        if not self.ctx.dry_run and not self._confirmed():
+            self.ctx.response = "Implementation canceled"
+            return
                 
         changes = self._parse_response(self.ctx.metadata['deepseek_response'])
         self.ctx.response = "Implementation Report:\n"
@@ -419,6 +601,14 @@ class AutoImplementHandler(CommandHandler):
             self.ctx.response += f"- {result}\n"
         self.ctx.response += "\n✅ Operation completed"
         
+    def _confirmed(self) -> bool:
+        """Asks on stdin only under the "ask" policy; headless runs approve or deny without blocking."""
+        policy = "approve" if self.ctx.auto_confirm else getattr(self.ctx, "confirm_policy", "ask")
+        if policy == "ask":
+            console.print("[bold yellow]WARNING:[/] This will modify files. Continue? (y/N)", end=" ")
+            return input().strip().lower() == 'y'
+        return policy == "approve"
+
     def _parse_response(self, response: str) -> Dict[Path, str]:
         changes = {}
         pattern = r'```(\w+)?:([^\n]+)\n(.*?)```'
@@ -451,20 +641,49 @@ class AutoImplementHandler(CommandHandler):
         return f"✅ Updated {target_path}"
 
 class LocalCodingHandler(CommandHandler):
-    def __init__(self, context: CommandContext):
+    accepts_failover = True
+
+    def __init__(self, context: CommandContext, llm: Optional[Llama] = None, llm_lock: Optional[threading.Lock] = None):
+        """
+        `llm` and `llm_lock` let several handlers (one per batch prompt) share
+        one loaded model; llama.cpp contexts are not thread-safe, so every
+        completion holds the lock.
+        """
         super().__init__(context)
-        self.session_file = self.ctx.root_path / ".deepcoderx" / "local_session.json"
+        self.session = open_session(self.ctx.root_path, "local", getattr(self.ctx, "session_name", None))
+        self.blobs = BlobStore.for_root(self.ctx.root_path)
+        self.result_store = ToolResultStore(blobs=self.blobs)
+        self.last_call_failed = False
+        self.tool_iteration = 0
+        self.last_call_tokens = 0
+        self.budget: Optional[RequestBudget] = None
+        self.usage_recorder = UsageRecorder(self.ctx.root_path)
         self._load_history()
 
         # Initialize the model, suppressing the noisy startup logs
-        with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
-            self.llm = Llama(model_path=config.LOCAL_MODEL_PATH, n_ctx=8192, verbose=False)
+        self.llm_lock = llm_lock or threading.Lock()
+        if llm is not None:
+            self.llm = llm
+        else:
+            with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
+                self.llm = Llama(model_path=config.LOCAL_MODEL_PATH, n_ctx=8192, verbose=False)
+        # The NLU parser uses this model too unless it has a dedicated LANGUAGE_MODEL_PATH
+        share_coding_model(self.llm, self.llm_lock)
+        self.grammar = self._load_grammar() if config.LOCAL_CONSTRAINED_DECODING else None
+
+    def _load_grammar(self) -> Optional[LlamaGrammar]:
+        """Compiles the tool-call grammar, falling back to free-form decoding on failure."""
+        try:
+            with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
+                return LlamaGrammar.from_string(build_tool_call_gbnf(), verbose=False)
+        except Exception as e:
+            if self.ctx.debug_mode:
+                console.print(f"[bold red]DEBUG:[/] Tool grammar disabled: {e}", style="dim")
+            return None
 
     def _load_history(self):
-        if self.session_file.exists():
-            with open(self.session_file, "r") as f:
-                self.message_history = json.load(f)
-        else:
+        self.message_history = self.session.load()
+        if not self.message_history:
             # Start with a clean system prompt without pre-loading the entire project context.
             # This creates the 'new buffer' you requested and prevents exceeding the token limit on startup.
             system_prompt = config.LOCAL_SYSTEM_PROMPT + f"\n\n**Current Configuration**:\n{config.CURRENT_CONFIG}"
@@ -473,10 +692,22 @@ class LocalCodingHandler(CommandHandler):
             ]
 
     def _save_history(self):
-        self.session_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.session_file, "w") as f:
-            json.dump(self.message_history, f, indent=2)
+        """Logs any unsaved messages and fsyncs the session log."""
+        self.session.sync(self.message_history, durable=True)
+
+    def switch_session(self, name: str):
+        """Saves the current conversation and resumes (or starts) the named one."""
+        self._save_history()
+        self.session.close()
+        self.session = open_session(self.ctx.root_path, "local", name)
+        self._load_history()
+
+
+    def checkpoint(self):
+        return list(self.message_history)
 
+    def rollback(self, state):
+        self.message_history = list(state)
 
     def can_handle(self) -> bool:
         return True
@@ -513,68 +744,173 @@ class LocalCodingHandler(CommandHandler):
         self.message_history.append({"role": "user", "content": user_prompt})
 
         # --- Tool-Use Loop ---
-        max_tool_calls = 50
-        for i in range(max_tool_calls):
-            # Check if we are about to exceed the limit and prompt the user
-            if i == max_tool_calls - 1:
-                # Do not prompt for input if running in a test environment
-                if "PYTEST_CURRENT_TEST" in os.environ:
-                    self.ctx.response = "[red]Operation canceled by test environment to prevent infinite loop.[/]"
-                    return
-
-                self.ctx.status_message = "Tool call limit reached. Asking for user confirmation."
-                console.print("\n[bold yellow]Warning:[/] The AI has used its tools 49 times and may be in a loop.")
-                if input("Do you want to allow it to continue for another 50 calls? (y/N) ").lower() != 'y':
-                    self.ctx.response = "[red]Operation canceled by user.[/]"
-                    return
+        # Bounded by the request budget (wall time, tokens, tool calls) instead of
+        # a fixed iteration count, so headless runs never block on input().
+        self.budget = RequestBudget.from_context(self.ctx)
+        for i in itertools.count():
+            check_cancelled(self.ctx)
+            exhausted = self.budget.exhausted()
+            if exhausted:
+                self._finish_within_budget(exhausted)
+                break
 
             self.ctx.status_message = "Thinking..."
+            self.tool_iteration = i
             model_response_text = self._generate_response()
+            self.budget.charge_tokens(self.last_call_tokens)
+            if i == 0 and self.last_call_failed and self._can_fail_over():
+                # Let DeepSeek take the request; drop the unanswered prompt.
+                # The error stays the response in case no other handler takes it.
+                self.message_history.pop()
+                self.ctx.response = model_response_text
+                self.ctx.failover = True
+                return
 
-            # Use findall to capture all tool calls in the response
-            tool_call_matches = re.findall(r'\{.*?\}', model_response_text, re.DOTALL)
+            # Capture all tool calls in the response, including ones with nested braces
+            tool_calls = extract_tool_calls(model_response_text)
             
-            if tool_call_matches:
+            if tool_calls:
                 tool_results = []
-                for tool_call_json in tool_call_matches:
-                    try:
-                        response_json = json.loads(tool_call_json)
-                        if "tool" in response_json:
-                            self.ctx.status = f"Using tool: {response_json['tool']}..."
-                            tool_results.append(self._execute_tool(response_json))
-                    except json.JSONDecodeError:
-                        # Ignore invalid JSON, treat as text
+                self.result_store.new_turn()
+                for tool_call_json, response_json in tool_calls:
+                    if response_json is None:
                         tool_results.append(f"Invalid JSON in tool call: {tool_call_json}")
+                        continue
+                    # Checked per call: one response may hold more calls than the budget allows
+                    if not self.budget.take_tool_call():
+                        tool_results.append(self.budget.skipped_tool_call(response_json["tool"]))
+                        continue
+                    check_cancelled(self.ctx)
+                    self.ctx.status = f"Using tool: {response_json['tool']}..."
+                    result = self._execute_tool(response_json)
+                    tool_results.append(self.blobs.pack(self.result_store.cap(response_json["tool"], result)))
                 
                 # If any tools were executed, feed all results back to the model
                 if tool_results:
                     self.message_history.append({"role": "assistant", "content": model_response_text})
-                    self.message_history.append({"role": "user", "content": f"Tool Results: \n" + "\n".join(tool_results)})
+                    self.message_history.append({"role": "user", "content": f"Tool Results: \n" + "\n".join(tool_results) + "\n\n" + self.budget.hint()})
                     continue
 
             # If no valid tool call is found, this is the final answer
             self.ctx.response = model_response_text
             self.message_history.append({"role": "assistant", "content": self.ctx.response})
             break
-        else:
-            self.ctx.response = "[red]Error:[/] Exceeded maximum tool calls (5)."
 
         # Maintain a reasonable history size
         if len(self.message_history) > 10:
             self.message_history = [self.message_history[0]] + self.message_history[-8:]
+        # Log the turn now rather than on exit, so a crash cannot lose it
+        self.session.sync(self.message_history)
+
+    def _finish_within_budget(self, reason: str):
+        """Asks the model for a best-effort final answer once the request budget is spent."""
+        self.ctx.status = "Budget exhausted, finalizing answer..."
+        self.budget.finalizing = True
+        self.message_history.append({"role": "user", "content": self.budget.exhausted_prompt(reason)})
+        answer = self._generate_response()
+        self.message_history.append({"role": "assistant", "content": answer})
+        self.ctx.response = f"[yellow]Note:[/] Stopped early ({reason}).\n\n{answer}"
+
+    def _can_fail_over(self) -> bool:
+        """Routed requests may fall back to a usable DeepSeek; explicit @qwen ones may not."""
+        router = getattr(self.ctx, "backend_router", None)
+        return (router is not None and router.is_available(BackendRouter.CLOUD)
+                and "@qwen" not in self.ctx.user_input.lower())
+
+    def _call_max_tokens(self) -> int:
+        if self.budget is None:
+            return config.LOCAL_MAX_TOKENS
+        return self.budget.call_max_tokens(config.LOCAL_MAX_TOKENS)
 
     def _generate_response(self) -> str:
+        router = getattr(self.ctx, "backend_router", None)
+        self.last_call_failed = False
+        self.last_call_tokens = 0
+        started = time.monotonic()
         try:
-            output = self.llm.create_chat_completion(messages=self.message_history)
-            return output['choices'][0]['message']['content']
+            ttft = None
+            if self.grammar is not None:
+                text, usage, ttft = self._generate_constrained_response()
+            else:
+                with self.llm_lock:
+                    output = self.llm.create_chat_completion(
+                        messages=self.blobs.expand_messages(self.message_history), max_tokens=self._call_max_tokens(),
+                        stopping_criteria=self._stopping_criteria()
+                    )
+                check_cancelled(self.ctx)
+                text = output['choices'][0]['message']['content']
+                usage = output.get('usage', {})
+            latency = time.monotonic() - started
+            self.last_call_tokens = (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0)
+            self.usage_recorder.record(
+                BackendRouter.LOCAL, latency,
+                prompt_tokens=usage.get("prompt_tokens"),
+                completion_tokens=usage.get("completion_tokens"),
+                ttft=ttft,
+                iteration=self.tool_iteration,
+                ttft_upper_bound=ttft is None,
+            )
+            if router is not None:
+                router.record_success(BackendRouter.LOCAL, latency, usage.get("completion_tokens", 0))
+            return text
         except Exception as e:
+            self.last_call_failed = True
+            self.usage_recorder.record(
+                BackendRouter.LOCAL, time.monotonic() - started, iteration=self.tool_iteration, error=str(e)
+            )
+            if router is not None:
+                router.record_failure(BackendRouter.LOCAL)
             return f"[red]Model Generation Error:[/] {str(e)}"
 
+    def _stopping_criteria(self):
+        """Ends llama.cpp generation at the next token once the request is cancelled."""
+        event = cancel_event(self.ctx)
+        if event is None:
+            return None
+        return lambda input_ids, logits: event.is_set()
+
+    def _generate_constrained_response(self):
+        """
+        Streams a grammar-constrained completion and stops as soon as a
+        complete tool call has been emitted.
+
+        Returns (text, usage, time_to_first_token).
+        """
+        started = time.monotonic()
+        # The stream generates lazily, so the lock is held until it is consumed
+        with self.llm_lock:
+            stream = self.llm.create_chat_completion(
+                messages=self.blobs.expand_messages(self.message_history), grammar=self.grammar, stream=True,
+                max_tokens=self._call_max_tokens(), stopping_criteria=self._stopping_criteria()
+            )
+            extractor = JsonObjectExtractor()
+            parts = []
+            ttft = None
+            for chunk in stream:
+                if is_cancelled(self.ctx):
+                    stream.close()
+                    check_cancelled(self.ctx)
+                delta = chunk['choices'][0].get('delta', {}).get('content')
+                if not delta:
+                    continue
+                if ttft is None:
+                    ttft = time.monotonic() - started
+                parts.append(delta)
+                if any(parse_tool_call(obj)[0] for obj in extractor.feed(delta)):
+                    # Closing the generator ends generation; anything after the call is noise
+                    stream.close()
+                    break
+        # Streamed chunks carry one token each
+        return "".join(parts), {"completion_tokens": len(parts)}, ttft
+
     def _execute_tool(self, tool_call: Dict[str, Any]) -> str:
         tool_name = tool_call.get("tool")
         path = tool_call.get("path")
         content = tool_call.get("content")
 
+        if tool_name == "read_result":
+            return self.result_store.read_page(tool_call.get("handle", ""), tool_call.get("page", 1))
+
         if not path and tool_name != "run_bash":
             return "[red]Error:[/] Path is required for file operations."
 
@@ -599,8 +935,7 @@ class LocalCodingHandler(CommandHandler):
         if self.message_history:
             system_prompt = self.message_history[0]
             self.message_history = [system_prompt]
-        if self.session_file.exists():
-            self.session_file.unlink()
+        self.session.clear()
         if self.ctx.debug_mode:
             console.print("[bold red]DEBUG:[/] Conversation history cleared.", style="dim")
 
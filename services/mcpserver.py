@@ -141,10 +141,13 @@ def create_mcp_request_handler(sandbox_path):
 
     return MCPRequestHandler
 
+def create_mcp_server(host="localhost", port=8080, sandbox_path=None) -> HTTPServer:
+    """An MCP server confined to `sandbox_path`; port 0 picks a free port (see server_address)."""
+    handler = create_mcp_request_handler(Path(sandbox_path).resolve())
+    return HTTPServer((host, port), handler)
+
 def start_mcp_server(host="localhost", port=8080, sandbox_path=None):
-    handler = create_mcp_request_handler(Path(sandbox_path))
-    server_address = (host, port)
-    httpd = HTTPServer(server_address, handler)
+    httpd = create_mcp_server(host, port, sandbox_path)
     logger.info(f"MCP Server running on {host}:{port}")
     logger.info(f"Sandbox directory: {sandbox_path}")
     httpd.serve_forever()
\ No newline at end of file
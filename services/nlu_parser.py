@@ -3,18 +3,106 @@ import json
 import re
 import time
 import requests
-from typing import Dict, Any
+from pathlib import Path
+import os
+import random
+import threading
+import contextlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed, wait
+from typing import Dict, Any, List, Optional, Tuple
+
+from llama_cpp import Llama
 
 from config import config
 from models.session import CommandContext
 from utils.logging import console
+from services.intent_rules import RuleBasedIntentParser
+from services.intent_cache import IntentCache
+from utils.telemetry import UsageRecorder, percentile
+
+NLU_INTENTS = ["run_bash", "change_directory", "list_dir", "read_file", "write_file", "delete_path", "clarify"]
+
+# JSON schema for constrained local decoding; mirrors the contract in the system prompt
+NLU_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "enum": NLU_INTENTS},
+        "entities": {
+            "type": "object",
+            "properties": {
+                "command": {"type": "string"},
+                "path": {"type": "string"},
+                "content": {"type": "string"},
+                "reason": {"type": "string"},
+            },
+        },
+        "confidence": {"type": "number", "minimum": 0, "maximum": 1},
+    },
+    "required": ["intent", "entities", "confidence"],
+}
+
+_local_llm = None
+_local_llm_failed = False
+_local_llm_lock = threading.Lock()
+# The coding model LocalCodingHandler loaded, and the lock its completions hold
+_coding_llm: Optional[Llama] = None
+_coding_llm_lock: Optional[threading.Lock] = None
+_hedge_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="nlu-hedge")
+
+def share_coding_model(llm: Llama, lock: threading.Lock):
+    """Registers the resident coding model, so NLU without its own model reuses it instead of loading a copy."""
+    global _coding_llm, _coding_llm_lock
+    _coding_llm, _coding_llm_lock = llm, lock
+
+def dedicated_nlu_model_path() -> Optional[str]:
+    """LANGUAGE_MODEL_PATH if that model file exists."""
+    path = config.LANGUAGE_MODEL_PATH
+    return str(path) if path and Path(path).is_file() else None
+
+def local_nlu_model() -> Tuple[Optional[Llama], threading.Lock]:
+    """
+    The local NLU model and the lock its calls must hold: a dedicated
+    LANGUAGE_MODEL_PATH model, loaded once per process, or else the coding
+    model that is already resident. LOCAL_MODEL_PATH is never loaded twice.
+    """
+    global _local_llm, _local_llm_failed
+    model_path = dedicated_nlu_model_path()
+    if model_path is None:
+        return _coding_llm, _coding_llm_lock or _local_llm_lock
+    with _local_llm_lock:
+        if _local_llm is None and not _local_llm_failed:
+            try:
+                with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
+                    _local_llm = Llama(model_path=model_path, n_ctx=2048, verbose=False)
+            except Exception as e:
+                _local_llm_failed = True
+                console.print(f"[bold yellow]NLU Parser Warning:[/] Local model unavailable: {e}", style="dim")
+        return _local_llm, _local_llm_lock
+
+def get_local_nlu_model() -> Optional[Llama]:
+    """The local NLU model, or None if neither a dedicated nor a resident coding model is available."""
+    return local_nlu_model()[0]
 
 class NLUParser:
     """
     Parses natural language commands into structured MCP commands using an LLM.
+
+    The model call goes to the local Llama (schema-constrained JSON) or to
+    DeepSeek, selected by NLU_BACKEND.
     """
+    LOCAL = "local"
+    CLOUD = "deepseek"
+    REQUEST_TIMEOUT = 20
+    HEDGE_MIN_SAMPLES = 10
+    # Recent successful call latencies per backend, shared across parser instances
+    _latencies: Dict[str, deque] = {LOCAL: deque(maxlen=200), CLOUD: deque(maxlen=200)}
+
     def __init__(self, context: CommandContext):
         self.ctx = context
+        self.rules = RuleBasedIntentParser()
+        self.retries = 0
+        self.hedges = 0
         self.system_prompt = """
 You are a precise and efficient command-line NLU (Natural Language Understanding) parser.
 Your single task is to convert the user's request into a structured JSON object.
@@ -46,6 +134,115 @@ Your Response:
 {"intent": "clarify", "entities": {"reason": "The filename is missing."}, "confidence": 0.4}
 """
 
+    def _select_backend(self) -> Optional[str]:
+        """Picks the NLU backend from NLU_BACKEND; "auto" prefers a local model when one is available."""
+        choice = str(config.NLU_BACKEND).lower()
+        has_key = bool(config.DEEPSEEK_API_KEY)
+        if choice == self.LOCAL:
+            return self.LOCAL
+        if choice == self.CLOUD:
+            return self.CLOUD if has_key else None
+        if get_local_nlu_model() is not None:
+            return self.LOCAL
+        return self.CLOUD if has_key else None
+
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(config.NLU_BACKOFF_MAX_SECONDS, config.NLU_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    def _hedge_delay(self, backend: str) -> Optional[float]:
+        """Latency after which a second request is sent, or None when hedging does not apply."""
+        # The local model serves one request at a time, so a hedge would only queue behind the first
+        if not config.NLU_HEDGE_ENABLED or backend != self.CLOUD:
+            return None
+        samples = list(self._latencies[backend])
+        if len(samples) < self.HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(samples, config.NLU_HEDGE_PERCENTILE)
+
+    def _complete(self, backend: str, messages: List[Dict[str, str]], timeout: float) -> str:
+        """Runs one model call, hedging it with a duplicate if it is slower than usual."""
+        if backend == self.LOCAL:
+            call = self._complete_local
+        else:
+            call = lambda m: self._complete_deepseek(m, timeout=timeout)
+        hedge_after = self._hedge_delay(backend)
+        if hedge_after is None or hedge_after >= timeout:
+            return call(messages)
+
+        started = time.monotonic()
+        futures = [_hedge_executor.submit(call, messages)]
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            self.hedges += 1
+            futures.append(_hedge_executor.submit(call, messages))
+        # The slower request is left to finish in the background and its result discarded
+        error: Optional[Exception] = None
+        for future in as_completed(futures, timeout=max(0.0, timeout - (time.monotonic() - started))):
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+        raise error
+
+    def _complete_local(self, messages: List[Dict[str, str]]) -> str:
+        llm, lock = local_nlu_model()
+        if llm is None:
+            raise RuntimeError("No local NLU model could be loaded")
+        start = time.monotonic()
+        with lock:
+            response = llm.create_chat_completion(
+                messages=messages,
+                temperature=0.1,
+                max_tokens=256,
+                response_format={"type": "json_object", "schema": NLU_RESPONSE_SCHEMA},
+            )
+        self._record_usage(self.LOCAL, start, response.get("usage", {}))
+        return response["choices"][0]["message"]["content"]
+
+    def _complete_deepseek(self, messages: List[Dict[str, str]], timeout: float = REQUEST_TIMEOUT) -> str:
+        payload = {
+            "model": "deepseek-coder",
+            "messages": messages,
+            "temperature": 0.1,
+            "max_tokens": 256,
+        }
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {config.DEEPSEEK_API_KEY}"
+        }
+        start = time.monotonic()
+        response = requests.post(
+            config.DEEPSEEK_API_URL,
+            headers=headers,
+            json=payload,
+            timeout=timeout
+        )
+        response.raise_for_status()
+        body = response.json()
+        self._record_usage(self.CLOUD, start, body.get("usage", {}))
+        return body["choices"][0]["message"]["content"]
+
+    def _record_usage(self, backend: str, start: float, usage: Dict[str, Any]):
+        latency = time.monotonic() - start
+        self._latencies[backend].append(latency)
+        root_path = getattr(self.ctx, "root_path", None)
+        if not isinstance(root_path, (str, Path)):
+            return
+        usage = usage if isinstance(usage, dict) else {}
+        UsageRecorder(root_path).record(
+            f"nlu-{backend}", latency,
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+        )
+
+    def _intent_cache(self):
+        root_path = getattr(self.ctx, "root_path", None)
+        if not config.NLU_CACHE_ENABLED or not isinstance(root_path, (str, Path)):
+            return None
+        return IntentCache.for_root(root_path)
+
     def parse_intent(self, command_text: str) -> Dict[str, Any]:
         """
         Sends the command to an LLM to get a structured intent and entities.
@@ -54,39 +251,55 @@ Your Response:
         if self.ctx.debug_mode:
             console.print(f"[bold red]DEBUG:[/] NLU Parsing: '{command_text}'", style="dim")
 
+        # Deterministic fast path: common phrasings never need a model round trip
+        cwd = getattr(self.ctx, "current_dir", None)
+        fast_result = self.rules.parse(command_text, cwd if isinstance(cwd, Path) else None)
+        if fast_result is not None:
+            if self.ctx.debug_mode:
+                console.print(f"[bold red]DEBUG:[/] NLU fast path: {fast_result}", style="dim")
+            return fast_result
+
+        cache = self._intent_cache()
+        if cache is not None:
+            cached = cache.get(command_text)
+            if cached is not None:
+                if self.ctx.debug_mode:
+                    console.print(f"[bold red]DEBUG:[/] NLU cache hit: {cached}", style="dim")
+                return cached
+
         messages = [
             {"role": "system", "content": self.system_prompt},
             {"role": "user", "content": command_text}
         ]
         
-        max_retries = 3
+        backend = self._select_backend()
+        if backend is None:
+            return {"intent": "clarify", "entities": {"reason": "NLU parsing requires API configuration or a local model"}}
+
+        result = self._parse_with_retries(backend, messages, command_text, cache)
+        if self.ctx.debug_mode:
+            console.print(f"[bold red]DEBUG:[/] NLU {backend}: {self.retries} retries, {self.hedges} hedged requests", style="dim")
+        return result
+
+    def _parse_with_retries(self, backend: str, messages: List[Dict[str, str]], command_text: str,
+                            cache: Optional[IntentCache]) -> Dict[str, Any]:
+        """
+        Calls the model until it returns a valid result or the overall deadline
+        (NLU_DEADLINE_SECONDS) passes, backing off exponentially with full jitter.
+        """
+        max_retries = max(1, config.NLU_MAX_RETRIES)
+        deadline = time.monotonic() + config.NLU_DEADLINE_SECONDS
+        self.retries = 0
+        self.hedges = 0
+        error: Optional[Exception] = None
         for attempt in range(max_retries):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
             self.ctx.status = f"Parsing command (attempt {attempt + 1}/{max_retries})..."
             try:
-                # Using DeepSeek API instead since LMSTUDIO_URL is not configured
-                if not config.DEEPSEEK_API_KEY:
-                    return {"intent": "clarify", "entities": {"reason": "NLU parsing requires API configuration"}}
-                
-                payload = {
-                    "model": "deepseek-coder",
-                    "messages": messages,
-                    "temperature": 0.1,
-                    "max_tokens": 256,
-                }
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {config.DEEPSEEK_API_KEY}"
-                }
-                response = requests.post(
-                    config.DEEPSEEK_API_URL,
-                    headers=headers,
-                    json=payload,
-                    timeout=20
-                )
-                response.raise_for_status()
-                
-                raw_response = response.json()["choices"][0]["message"]["content"]
-                
+                raw_response = self._complete(backend, messages, timeout=min(self.REQUEST_TIMEOUT, remaining))
+
                 # Clean up the response to extract only the JSON object
                 json_match = re.search(r'\{.*\}', raw_response, re.DOTALL)
                 if not json_match:
@@ -106,16 +319,22 @@ Your Response:
                 if confidence < 0.8:
                     return {"intent": "clarify", "entities": {"reason": f"Model confidence ({confidence:.2f}) was below the 0.8 threshold. Please rephrase your command."}}
 
+                if cache is not None:
+                    cache.put(command_text, parsed_json)
                 return parsed_json
 
-            except (requests.exceptions.RequestException, json.JSONDecodeError, KeyError, ValueError) as e:
+            except (requests.exceptions.RequestException, json.JSONDecodeError, KeyError, ValueError,
+                    RuntimeError, FuturesTimeoutError) as e:
+                error = e
                 console.print(f"[bold yellow]NLU Parser Warning:[/] Attempt {attempt + 1} failed: {e}", style="dim")
-                if attempt < max_retries - 1:
-                    time.sleep(1) # Wait 1 second before retrying
-                else:
-                    console.print(f"[bold red]NLU Parser Error:[/] All {max_retries} attempts failed.", style="dim")
-                    return {"intent": "clarify", "entities": {"reason": f"Failed to parse command after {max_retries} attempts: {e}"}}
-        
-        # This part should be unreachable but is here as a fallback
-        return {"intent": "clarify", "entities": {"reason": "An unexpected error occurred in the NLU parser."}}
+                delay = self._backoff_delay(attempt)
+                if attempt == max_retries - 1 or time.monotonic() + delay >= deadline:
+                    break
+                self.retries += 1
+                time.sleep(delay)
 
+        attempts = self.retries + 1 if error is not None else self.retries
+        console.print(f"[bold red]NLU Parser Error:[/] Giving up after {attempts} attempt(s).", style="dim")
+        reason = f"Failed to parse command after {attempts} attempt(s): {error}" if error else \
+            f"Command parsing exceeded the {config.NLU_DEADLINE_SECONDS:g}s deadline."
+        return {"intent": "clarify", "entities": {"reason": reason}}
@@ -0,0 +1,152 @@
+# services/project_index.py
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import contextlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import config
+from utils.fs_walk import FileWalker
+from services.symbol_extractor import LANGUAGES, SymbolExtractor
+
+class ProjectIndex:
+    """
+    Incremental per-project file index stored in .deepcoderx/project_index.db.
+
+    Each file's size, mtime, content hash, language, imports and symbols
+    (see services.symbol_extractor) are recorded. `refresh()` only stats the
+    tree and re-reads files whose size or mtime changed, so repeated context
+    builds cost time in proportion to what changed rather than to the size of
+    the repository.
+    """
+    FILE_NAME = "project_index.db"
+    _instances: Dict[Path, "ProjectIndex"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, root_path: Path, db_path: Optional[Path] = None):
+        self.root_path = Path(root_path)
+        self.db_path = Path(db_path) if db_path else self.root_path / ".deepcoderx" / self.FILE_NAME
+        self.last_refresh = 0.0
+        self.truncated = False
+        self._refresh_lock = threading.Lock()
+        self.extractor = SymbolExtractor()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, hash TEXT, "
+                "language TEXT, imports TEXT NOT NULL, symbols TEXT NOT NULL, indexed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS files_language ON files(language)")
+
+    @classmethod
+    def for_root(cls, root_path: Path) -> "ProjectIndex":
+        """Returns the shared index for a project."""
+        key = Path(root_path).resolve()
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(root_path)
+            return cls._instances[key]
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def refresh(self, force: bool = False) -> Dict[str, int]:
+        """
+        Brings the index up to date with the filesystem. Calls within
+        PROJECT_INDEX_REFRESH_SECONDS of the previous refresh are skipped
+        unless `force` is set.
+        """
+        with self._refresh_lock:
+            counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+            if not force and time.monotonic() - self.last_refresh < config.PROJECT_INDEX_REFRESH_SECONDS:
+                return counts
+
+            walker = FileWalker(self.root_path)
+            found = {}
+            for file in walker.walk():
+                try:
+                    stat = file.stat()
+                except OSError:
+                    continue
+                found[file.relative_to(self.root_path).as_posix()] = (file, stat.st_size, stat.st_mtime)
+            self.truncated = walker.truncated
+
+            with self._connect() as conn:
+                known = {row["path"]: (row["size"], row["mtime"])
+                         for row in conn.execute("SELECT path, size, mtime FROM files")}
+                changed = []
+                for rel_path, (file, size, mtime) in found.items():
+                    if known.get(rel_path) == (size, mtime):
+                        counts["unchanged"] += 1
+                    else:
+                        counts["updated" if rel_path in known else "added"] += 1
+                        changed.append(rel_path)
+
+                analyzable = [found[p][0] for p in changed if found[p][1] <= config.MAX_FILE_SIZE]
+                analyzed = self.extractor.extract_many(analyzable)
+                for rel_path in changed:
+                    file, size, mtime = found[rel_path]
+                    result = analyzed.get(str(file), {})
+                    conn.execute(
+                        "INSERT OR REPLACE INTO files (path, size, mtime, hash, language, imports, symbols, indexed) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (rel_path, size, mtime, result.get("hash"), LANGUAGES.get(file.suffix.lower()),
+                         json.dumps(result.get("imports", [])), json.dumps(result.get("symbols", [])), time.time())
+                    )
+                # A truncated walk did not see every file, so absence is not proof of deletion
+                if not walker.truncated:
+                    removed = [(p,) for p in known if p not in found]
+                    conn.executemany("DELETE FROM files WHERE path = ?", removed)
+                    counts["removed"] = len(removed)
+
+            self.last_refresh = time.monotonic()
+            return counts
+
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        record["imports"] = json.loads(record["imports"])
+        record["symbols"] = json.loads(record["symbols"])
+        return record
+
+    def files(self, extensions: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Indexed file records sorted by path, optionally limited to some extensions."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM files ORDER BY path").fetchall()
+        records = [self._to_record(row) for row in rows]
+        if extensions is not None:
+            wanted = {ext.lower() for ext in extensions}
+            records = [r for r in records if os.path.splitext(r["path"])[1].lower() in wanted]
+        return records
+
+    def get(self, rel_path: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM files WHERE path = ?", (rel_path,)).fetchone()
+        return self._to_record(row) if row else None
+
+    def paths(self) -> List[str]:
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT path FROM files ORDER BY path")]
+
+    def find_symbol(self, name: str) -> List[Dict[str, Any]]:
+        """Definitions whose name matches exactly, as records with a "path" key added."""
+        matches = []
+        with self._connect() as conn:
+            rows = conn.execute("SELECT path, symbols FROM files WHERE symbols LIKE ?", (f'%"{name}"%',)).fetchall()
+        for row in rows:
+            for symbol in json.loads(row["symbols"]):
+                if symbol["name"] == name:
+                    matches.append(dict(symbol, path=row["path"]))
+        return matches
@@ -0,0 +1,183 @@
+# services/repo_map.py
+
+import re
+import posixpath
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from config import config
+from services.import_graph import ImportGraph
+
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_./-]*')
+
+class RepoMap:
+    """
+    Ranked outline of the repository's most important definitions.
+
+    Files are ranked by PageRank over the import graph, personalized toward
+    files the prompt names (by path, file name or a symbol they define), so
+    the map leans toward the code the question is about. Each definition's
+    score is its file's rank, raised when other files import it by name or
+    the prompt mentions it, and the best signatures are emitted, grouped by
+    file, until the token budget is spent. Ranks and rendered maps are
+    cached per graph version, and a recomputation after a change starts from
+    the previous ranks, so it converges in a few iterations.
+    """
+    DAMPING = 0.85
+    TOLERANCE = 1e-6
+    MAX_ITERATIONS = 100
+    MENTION_BOOST = 10.0
+    CACHE_SIZE = 32
+    _instances: Dict[Path, "RepoMap"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, graph: ImportGraph):
+        self.graph = graph
+        self.iterations = 0
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._records_version = -1
+        self._definitions: Dict[str, List[str]] = {}
+        self._references: Dict[str, int] = {}
+        self._last_ranks: Dict[str, float] = {}
+        self._ranks: "OrderedDict[Tuple[int, FrozenSet[str]], Dict[str, float]]" = OrderedDict()
+        self._maps: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_root(cls, root_path: Path) -> "RepoMap":
+        """Returns the shared repository map for a project."""
+        key = Path(root_path).resolve()
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(ImportGraph.for_root(root_path))
+            return cls._instances[key]
+
+    def _load_records(self):
+        if self._records_version == self.graph.version:
+            return
+        records = self.graph.index.files()
+        self._records = {r["path"]: r for r in records if r["symbols"]}
+        self._definitions = {}
+        for path, record in self._records.items():
+            for symbol in record["symbols"]:
+                self._definitions.setdefault(symbol["name"], []).append(path)
+        # "from pkg.mod import name" is recorded as "pkg.mod.name": count imports of each name
+        self._references = {}
+        for record in records:
+            for name in record["imports"]:
+                leaf = name.rsplit(".", 1)[-1]
+                if leaf in self._definitions:
+                    self._references[leaf] = self._references.get(leaf, 0) + 1
+        self._records_version = self.graph.version
+
+    def mentions(self, prompt: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        """Project files and symbol names the prompt refers to."""
+        files, symbols = set(), set()
+        by_name: Dict[str, List[str]] = {}
+        for path in self.graph.edges:
+            by_name.setdefault(posixpath.basename(path), []).append(path)
+            by_name.setdefault(posixpath.splitext(posixpath.basename(path))[0], []).append(path)
+        for word in _IDENTIFIER.findall(prompt or ""):
+            word = word.strip("./-")
+            if word in self.graph.edges:
+                files.add(word)
+            elif len(word) >= 3 and word in by_name:
+                files.update(by_name[word])
+            if word in self._definitions:
+                symbols.add(word)
+                files.update(self._definitions[word])
+        return frozenset(files), frozenset(symbols)
+
+    # --- Ranking ---
+
+    def pagerank(self, personal: FrozenSet[str] = frozenset()) -> Dict[str, float]:
+        """PageRank of every file over import edges, teleporting to `personal` files when given."""
+        key = (self.graph.version, personal)
+        if key in self._ranks:
+            self._ranks.move_to_end(key)
+            return self._ranks[key]
+
+        nodes = list(self.graph.edges)
+        if not nodes:
+            return {}
+        targets = [p for p in personal if p in self.graph.edges] or nodes
+        teleport = {p: 1.0 / len(targets) for p in targets}
+        # Warm start from the last result; unchanged parts of the graph are already converged
+        total = sum(self._last_ranks.get(p, 0.0) for p in nodes)
+        ranks = ({p: self._last_ranks.get(p, 0.0) / total for p in nodes} if total > 0
+                 else {p: 1.0 / len(nodes) for p in nodes})
+
+        for iteration in range(1, self.MAX_ITERATIONS + 1):
+            self.iterations = iteration
+            dangling = sum(ranks[p] for p in nodes if not self.graph.edges[p])
+            new_ranks = {p: (1 - self.DAMPING + self.DAMPING * dangling) * teleport.get(p, 0.0) for p in nodes}
+            for source in nodes:
+                imports = self.graph.edges[source]
+                if imports:
+                    share = self.DAMPING * ranks[source] / len(imports)
+                    for target in imports:
+                        new_ranks[target] += share
+            delta = sum(abs(new_ranks[p] - ranks[p]) for p in nodes)
+            ranks = new_ranks
+            if delta < self.TOLERANCE:
+                break
+
+        self._last_ranks = ranks
+        self._ranks[key] = ranks
+        if len(self._ranks) > self.CACHE_SIZE:
+            self._ranks.popitem(last=False)
+        return ranks
+
+    # --- Rendering ---
+
+    def render(self, prompt: str = "", max_tokens: Optional[int] = None) -> str:
+        """The ranked map for a prompt, within `max_tokens` (REPO_MAP_MAX_TOKENS by default)."""
+        max_tokens = max_tokens if max_tokens is not None else config.REPO_MAP_MAX_TOKENS
+        with self._lock:
+            self.graph.update()
+            self._load_records()
+            files, symbols = self.mentions(prompt)
+            key = (self.graph.version, files, symbols, max_tokens)
+            if key in self._maps:
+                self._maps.move_to_end(key)
+                return self._maps[key]
+
+            text = self._render(self.pagerank(files), symbols, max_tokens)
+            self._maps[key] = text
+            if len(self._maps) > self.CACHE_SIZE:
+                self._maps.popitem(last=False)
+            return text
+
+    def _render(self, ranks: Dict[str, float], mentioned: FrozenSet[str], max_tokens: int) -> str:
+        candidates = []
+        for path, record in self._records.items():
+            for symbol in record["symbols"]:
+                score = ranks.get(path, 0.0) * (1 + self._references.get(symbol["name"], 0))
+                if symbol["name"] in mentioned:
+                    score *= self.MENTION_BOOST
+                if symbol.get("parent"):
+                    score *= 0.5
+                candidates.append((score, path, symbol))
+        candidates.sort(key=lambda c: (-c[0], c[1], c[2]["line"]))
+
+        chosen: Dict[str, List[Dict[str, Any]]] = {}
+        used = 0
+        for score, path, symbol in candidates:
+            cost = len(self._line(symbol)) // 4 + 1 + (0 if path in chosen else len(path) // 4 + 1)
+            if used + cost > max_tokens:
+                continue
+            chosen.setdefault(path, []).append(symbol)
+            used += cost
+
+        blocks = []
+        for path in sorted(chosen, key=lambda p: (-ranks.get(p, 0.0), p)):
+            lines = [f"{path}:"] + [self._line(s) for s in sorted(chosen[path], key=lambda s: s["line"])]
+            blocks.append("\n".join(lines))
+        return "\n".join(blocks)
+
+    @staticmethod
+    def _line(symbol: Dict[str, Any]) -> str:
+        indent = "        " if symbol.get("parent") else "    "
+        return f"{indent}{symbol.get('signature') or symbol['kind'] + ' ' + symbol['name']}"
@@ -0,0 +1,99 @@
+# services/response_cache.py
+
+import json
+import time
+import sqlite3
+import hashlib
+import contextlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import config
+
+class ResponseCache:
+    """
+    Persistent cache of model responses keyed by a hash of the request payload.
+
+    Entries expire after `ttl` seconds and the store is capped at `max_entries`,
+    evicting the least recently used entries first. Hit/miss/eviction counters
+    are persisted alongside the entries.
+    """
+    def __init__(self, db_path: Path, ttl: Optional[int] = None, max_entries: Optional[int] = None):
+        self.db_path = Path(db_path)
+        self.ttl = ttl if ttl is not None else config.DEEPSEEK_CACHE_TTL
+        self.max_entries = max_entries if max_entries is not None else config.DEEPSEEK_CACHE_MAX_ENTRIES
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def key_for(payload: Dict[str, Any]) -> str:
+        """Hashes model, messages and sampling parameters into a cache key."""
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, payload: Dict[str, Any]) -> Optional[str]:
+        key = self.key_for(payload)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT response, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] <= self.ttl:
+                conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                self._bump(conn, "hits")
+                return row[0]
+            if row:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._bump(conn, "expired")
+            self._bump(conn, "misses")
+        return None
+
+    def put(self, payload: Dict[str, Any], response: str):
+        key = self.key_for(payload)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, response, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed ASC LIMIT ?)",
+                    (excess,)
+                )
+                self._bump(conn, "evictions", excess)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM stats")
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            result = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+            result.update(dict(conn.execute("SELECT name, value FROM stats").fetchall()))
+            result["entries"] = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return result
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, name: str, amount: int = 1):
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
@@ -0,0 +1,287 @@
+# services/session_db.py
+
+import time
+import sqlite3
+import threading
+import contextlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import config
+from services.session_store import SessionLog, diff_history
+
+class SessionDatabase:
+    """
+    Named conversation sessions for a project in .deepcoderx/sessions.db.
+
+    Every message is a row. Messages trimmed out of a handler's window or
+    cleared are only marked inactive, so they stay searchable (through an
+    FTS5 index when SQLite has it, LIKE otherwise) while resuming a session
+    reads just its active rows. `apply_retention()` keeps the store bounded:
+    sessions idle longer than SESSION_RETENTION_DAYS go, each handler keeps
+    its SESSION_MAX_SESSIONS most recent sessions, and each session keeps
+    at most SESSION_MAX_ARCHIVED_MESSAGES inactive messages.
+    """
+    FILE_NAME = "sessions.db"
+    DEFAULT_SESSION = "default"
+    _instances: Dict[Path, "SessionDatabase"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.fts_enabled = True
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id INTEGER PRIMARY KEY, handler TEXT NOT NULL, "
+                "name TEXT NOT NULL, created REAL NOT NULL, updated REAL NOT NULL, UNIQUE(handler, name))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY, session_id INTEGER NOT NULL, "
+                "position INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, "
+                "created REAL NOT NULL, active INTEGER NOT NULL DEFAULT 1)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_window ON messages(session_id, active, position)")
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+                    "content, content='messages', content_rowid='id')"
+                )
+                conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN "
+                    "INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END"
+                )
+                conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN "
+                    "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END"
+                )
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5
+                self.fts_enabled = False
+
+    @classmethod
+    def for_root(cls, root_path: Path) -> "SessionDatabase":
+        """Returns the shared session database for a project."""
+        key = Path(root_path).resolve()
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(key / ".deepcoderx" / cls.FILE_NAME)
+            return cls._instances[key]
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def session(self, handler: str, name: str = DEFAULT_SESSION) -> "DatabaseSession":
+        """The named session of a handler, created if it does not exist yet."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO sessions (handler, name, created, updated) VALUES (?, ?, ?, ?)",
+                (handler, name, now, now)
+            )
+            session_id = conn.execute(
+                "SELECT id FROM sessions WHERE handler = ? AND name = ?", (handler, name)
+            ).fetchone()[0]
+        return DatabaseSession(self, session_id, handler, name)
+
+    def list_sessions(self, handler: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Sessions with their active message count, most recently used first."""
+        query = (
+            "SELECT s.handler, s.name, s.updated, "
+            "(SELECT COUNT(*) FROM messages m WHERE m.session_id = s.id AND m.active = 1) AS messages "
+            "FROM sessions s"
+        )
+        params: tuple = ()
+        if handler:
+            query += " WHERE s.handler = ?"
+            params = (handler,)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(query + " ORDER BY s.updated DESC", params)]
+
+    def search(self, query: str, handler: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Messages from any session (including cleared or trimmed ones) that match the query, best first."""
+        terms = [term for term in query.replace('"', " ").split() if term]
+        if not terms:
+            return []
+        with self._connect() as conn:
+            if self.fts_enabled:
+                rows = conn.execute(
+                    "SELECT s.handler, s.name AS session, m.role, m.created, "
+                    "snippet(messages_fts, 0, '[', ']', '...', 12) AS snippet "
+                    "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                    "JOIN sessions s ON s.id = m.session_id "
+                    "WHERE messages_fts MATCH ? AND (? IS NULL OR s.handler = ?) ORDER BY rank LIMIT ?",
+                    (" ".join(f'"{term}"' for term in terms), handler, handler, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT s.handler, s.name AS session, m.role, m.created, substr(m.content, 1, 120) AS snippet "
+                    "FROM messages m JOIN sessions s ON s.id = m.session_id "
+                    "WHERE " + " AND ".join("m.content LIKE ?" for _ in terms) +
+                    " AND (? IS NULL OR s.handler = ?) ORDER BY m.created DESC LIMIT ?",
+                    tuple(f"%{term}%" for term in terms) + (handler, handler, limit)
+                ).fetchall()
+        return [dict(row) for row in rows]
+
+    def contents_containing(self, fragment: str) -> List[str]:
+        """Contents of every stored message (active or archived) that contain `fragment`."""
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(
+                "SELECT content FROM messages WHERE instr(content, ?) > 0", (fragment,)
+            )]
+
+    def delete_session(self, handler: str, name: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT id FROM sessions WHERE handler = ? AND name = ?", (handler, name)).fetchone()
+            if row is None:
+                return False
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (row[0],))
+            conn.execute("DELETE FROM sessions WHERE id = ?", (row[0],))
+        return True
+
+    def apply_retention(self) -> Dict[str, int]:
+        """Deletes expired sessions, sessions beyond the per-handler cap, and the oldest archived messages."""
+        counts = {"sessions": 0, "messages": 0}
+        with self._connect() as conn:
+            expired = []
+            if config.SESSION_RETENTION_DAYS > 0:
+                cutoff = time.time() - config.SESSION_RETENTION_DAYS * 86400
+                expired += [row[0] for row in conn.execute("SELECT id FROM sessions WHERE updated < ?", (cutoff,))]
+            if config.SESSION_MAX_SESSIONS > 0:
+                expired += [row[0] for row in conn.execute(
+                    "SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY handler ORDER BY updated DESC) AS n "
+                    "FROM sessions) WHERE n > ?", (config.SESSION_MAX_SESSIONS,)
+                )]
+            for session_id in set(expired):
+                counts["messages"] += conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,)).rowcount
+                counts["sessions"] += conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount
+            if config.SESSION_MAX_ARCHIVED_MESSAGES > 0:
+                counts["messages"] += conn.execute(
+                    "DELETE FROM messages WHERE id IN (SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+                    "(PARTITION BY session_id ORDER BY position DESC) AS n FROM messages WHERE active = 0) WHERE n > ?)",
+                    (config.SESSION_MAX_ARCHIVED_MESSAGES,)
+                ).rowcount
+        return counts
+
+class DatabaseSession:
+    """
+    One session's window in a SessionDatabase, with the same load/sync/clear
+    interface as SessionLog so the handlers can use either.
+    """
+    def __init__(self, database: SessionDatabase, session_id: int, handler: str, name: str):
+        self.database = database
+        self.session_id = session_id
+        self.handler = handler
+        self.name = name
+        self._persisted: List[Dict[str, Any]] = []
+        self._row_ids: List[int] = []
+        self._next_position = 0
+        self._lock = threading.Lock()
+
+    def load(self) -> List[Dict[str, Any]]:
+        """The session's active messages, in order."""
+        with self._lock, self.database._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, role, content FROM messages WHERE session_id = ? AND active = 1 ORDER BY position",
+                (self.session_id,)
+            ).fetchall()
+            last = conn.execute("SELECT MAX(position) FROM messages WHERE session_id = ?", (self.session_id,)).fetchone()[0]
+        self._row_ids = [row["id"] for row in rows]
+        self._persisted = [{"role": row["role"], "content": row["content"]} for row in rows]
+        self._next_position = (last if last is not None else -1) + 1
+        return list(self._persisted)
+
+    def sync(self, history: List[Dict[str, Any]], durable: bool = False):
+        """Stores new messages and archives the ones that left the window. Every sync is a committed transaction."""
+        with self._lock:
+            start, dropped, added = diff_history(self._persisted, history)
+            if not dropped and not added:
+                return
+            archived = self._row_ids[start:start + dropped]
+            now = time.time()
+            with self.database._connect() as conn:
+                conn.executemany("UPDATE messages SET active = 0 WHERE id = ?", [(row_id,) for row_id in archived])
+                new_ids = []
+                for message in added:
+                    cursor = conn.execute(
+                        "INSERT INTO messages (session_id, position, role, content, created) VALUES (?, ?, ?, ?, ?)",
+                        (self.session_id, self._next_position, message.get("role", ""), message.get("content") or "", now)
+                    )
+                    new_ids.append(cursor.lastrowid)
+                    self._next_position += 1
+                conn.execute("UPDATE sessions SET updated = ? WHERE id = ?", (now, self.session_id))
+            self._row_ids = self._row_ids[:start] + self._row_ids[start + dropped:] + new_ids
+            self._persisted = list(history)
+
+    def clear(self):
+        """Empties the window; the messages stay in the archive for search."""
+        with self._lock, self.database._connect() as conn:
+            conn.execute("UPDATE messages SET active = 0 WHERE session_id = ?", (self.session_id,))
+            self._persisted, self._row_ids = [], []
+
+    def close(self):
+        pass
+
+def format_session_list(sessions: List[Dict[str, Any]], current: Optional[str] = None) -> str:
+    """Renders stored sessions as a markdown table, marking the current one."""
+    if not sessions:
+        return "No saved sessions yet."
+    lines = ["| Session | Handler | Messages | Last used |", "|---|---|---|---|"]
+    for session in sessions:
+        name = f"**{session['name']}** (current)" if session["name"] == current else session["name"]
+        used = time.strftime("%Y-%m-%d %H:%M", time.localtime(session["updated"]))
+        lines.append(f"| {name} | {session['handler']} | {session['messages']} | {used} |")
+    return "\n".join(lines)
+
+def format_search_results(results: List[Dict[str, Any]]) -> str:
+    """Renders message search hits as a markdown list."""
+    if not results:
+        return "No matching messages."
+    return "\n".join(
+        f"- **{r['session']}** ({r['handler']}, {r['role']}, "
+        f"{time.strftime('%Y-%m-%d', time.localtime(r['created']))}): {' '.join(r['snippet'].split())}"
+        for r in results
+    )
+
+def open_session(root_path: Path, handler: str, name: Optional[str] = None):
+    """
+    The session store configured by SESSION_STORE for a handler: a named
+    session in the project's session database ("sqlite") or the handler's
+    JSONL log for that name ("jsonl"). A JSONL or legacy JSON session found
+    when the default database session is still empty is imported into it.
+    """
+    session_dir = Path(root_path) / ".deepcoderx"
+    log = SessionLog(session_dir / f"{handler}_session.jsonl", legacy_path=session_dir / f"{handler}_session.json")
+    name = name or SessionDatabase.DEFAULT_SESSION
+    if config.SESSION_STORE != "sqlite":
+        # Other named sessions get their own log beside the default one
+        return log if name == SessionDatabase.DEFAULT_SESSION else SessionLog(session_dir / f"{handler}_{name}_session.jsonl")
+    session = SessionDatabase.for_root(root_path).session(handler, name)
+    if (name == SessionDatabase.DEFAULT_SESSION and not session.load()
+            and (log.path.exists() or log.legacy_path.exists())):
+        session.sync(log.load())
+        log.clear()
+    return session
+
+def stored_contents_containing(root_path: Path, fragment: str) -> List[str]:
+    """
+    Contents of every stored message that contain `fragment`, from the store
+    SESSION_STORE selects: the session database, or every handler's JSONL logs.
+    """
+    if config.SESSION_STORE == "sqlite":
+        return SessionDatabase.for_root(root_path).contents_containing(fragment)
+    contents = []
+    for path in sorted((Path(root_path) / ".deepcoderx").glob("*_session.jsonl")):
+        for message in SessionLog(path).load():
+            content = message.get("content")
+            if isinstance(content, str) and fragment in content:
+                contents.append(content)
+    return contents
@@ -0,0 +1,194 @@
+# services/session_store.py
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import config
+
+def diff_history(persisted: List[Dict[str, Any]], history: List[Dict[str, Any]]):
+    """
+    How `history` differs from `persisted` as (start, dropped, added): drop
+    `dropped` messages at index `start`, then append `added`. Covers appends,
+    window trims and popped messages without rewriting what was kept.
+    """
+    prefix = 0
+    while (prefix < len(persisted) and prefix < len(history)
+           and (persisted[prefix] is history[prefix] or persisted[prefix] == history[prefix])):
+        prefix += 1
+    # Smallest run of persisted messages to drop so the rest lines up with the new history
+    for end in range(prefix, len(persisted) + 1):
+        rest = persisted[end:]
+        if history[prefix:prefix + len(rest)] == rest:
+            break
+    return prefix, end - prefix, history[prefix + len(persisted) - end:]
+
+class SessionLog:
+    """
+    Append-only JSONL log of a conversation's message history.
+
+    Each line is one record: {"op": "append", "message": ...} for a new
+    message, {"op": "drop", "start": i, "count": n} for messages trimmed out
+    of the window, or {"op": "snapshot", "messages": [...]} with the whole
+    history. `sync()` diffs the history against what is already logged and
+    appends only the difference, so saving costs O(new messages). Lines are
+    flushed on every sync and fsynced at most every SESSION_FSYNC_SECONDS.
+    A snapshot is appended every SESSION_SNAPSHOT_EVERY records, so loading
+    only replays the tail after the last one, and the file is rewritten as a
+    single snapshot once it outgrows SESSION_COMPACT_BYTES.
+    """
+    SNAPSHOT_PREFIX = b'{"op": "snapshot"'
+    READ_BLOCK = 64 * 1024
+
+    def __init__(self, path: Path, legacy_path: Optional[Path] = None):
+        self.path = Path(path)
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+        self._persisted: List[Dict[str, Any]] = []
+        self._records_since_snapshot = 0
+        self._snapshot_bytes = 0
+        self._file = None
+        self._last_fsync = time.monotonic()
+        self._lock = threading.Lock()
+
+    # --- Loading ---
+
+    def load(self) -> List[Dict[str, Any]]:
+        """The logged history, migrating a legacy whole-file JSON session on first use."""
+        with self._lock:
+            if not self.path.exists() and self.legacy_path and self.legacy_path.exists():
+                try:
+                    messages = json.loads(self.legacy_path.read_text())
+                except (OSError, ValueError):
+                    messages = []
+                self._persisted = list(messages)
+                self._rewrite()
+                self.legacy_path.unlink()
+                return list(messages)
+
+            messages: List[Dict[str, Any]] = []
+            records = 0
+            for line in self._tail_lines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write; everything before it is intact
+                    continue
+                records += 1
+                if record["op"] == "snapshot":
+                    messages = list(record["messages"])
+                    records = 0
+                    self._snapshot_bytes = len(line)
+                elif record["op"] == "append":
+                    messages.append(record["message"])
+                elif record["op"] == "drop":
+                    del messages[record["start"]:record["start"] + record["count"]]
+            self._persisted = list(messages)
+            self._records_since_snapshot = records
+            return messages
+
+    def _tail_lines(self) -> List[bytes]:
+        """Lines from the last snapshot to the end, read backwards in blocks so older records are skipped."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                position, buffer = f.tell(), b""
+                while position > 0:
+                    step = min(self.READ_BLOCK, position)
+                    position -= step
+                    f.seek(position)
+                    buffer = f.read(step) + buffer
+                    found = buffer.rfind(b"\n" + self.SNAPSHOT_PREFIX)
+                    if found != -1:
+                        return buffer[found + 1:].splitlines()
+                return buffer.splitlines()
+        except OSError:
+            return []
+
+    # --- Writing ---
+
+    def sync(self, history: List[Dict[str, Any]], durable: bool = False):
+        """Logs how `history` differs from the logged history; fsyncs if `durable` or the interval passed."""
+        with self._lock:
+            prefix, dropped, added = diff_history(self._persisted, history)
+            records = []
+            if dropped:
+                records.append({"op": "drop", "start": prefix, "count": dropped})
+            records.extend({"op": "append", "message": message} for message in added)
+            if records:
+                self._persisted = list(history)
+                self._append(records)
+            if durable or time.monotonic() - self._last_fsync >= config.SESSION_FSYNC_SECONDS:
+                self._fsync()
+
+    def _append(self, records: List[Dict[str, Any]]):
+        self._records_since_snapshot += len(records)
+        if self._records_since_snapshot >= config.SESSION_SNAPSHOT_EVERY:
+            size = self.path.stat().st_size if self.path.exists() else 0
+            if size > config.SESSION_COMPACT_BYTES and size > 2 * self._snapshot_bytes:
+                self._rewrite()
+                return
+            records = records + [{"op": "snapshot", "messages": self._persisted}]
+
+        handle = self._open()
+        for record in records:
+            line = json.dumps(record)
+            handle.write(line + "\n")
+            if record["op"] == "snapshot":
+                self._snapshot_bytes = len(line)
+                self._records_since_snapshot = 0
+        handle.flush()
+
+    def _open(self):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a+", encoding="utf-8")
+            # Start on a fresh line if a crash left the last one unterminated
+            if self._file.tell() > 0:
+                self._file.seek(self._file.tell() - 1)
+                if self._file.read(1) != "\n":
+                    self._file.write("\n")
+        return self._file
+
+    def _rewrite(self):
+        """Compacts the log into a single snapshot, swapped in atomically."""
+        self._close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps({"op": "snapshot", "messages": self._persisted})
+        temp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._snapshot_bytes = len(line)
+        self._records_since_snapshot = 0
+        self._last_fsync = time.monotonic()
+
+    def _fsync(self):
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        """Fsyncs and closes the log."""
+        with self._lock:
+            self._fsync()
+            self._close()
+
+    def clear(self):
+        """Deletes the log (and any legacy session file)."""
+        with self._lock:
+            self._close()
+            self._persisted = []
+            self._records_since_snapshot = 0
+            for path in (self.path, self.legacy_path):
+                if path and path.exists():
+                    path.unlink()
@@ -0,0 +1,315 @@
+# services/symbol_extractor.py
+
+import os
+import re
+import sys
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import config
+
+LANGUAGES = {
+    '.py': 'python', '.ts': 'typescript', '.tsx': 'typescript', '.js': 'javascript', '.jsx': 'javascript',
+    '.go': 'go', '.rs': 'rust', '.java': 'java', '.json': 'json', '.yml': 'yaml', '.yaml': 'yaml',
+    '.md': 'markdown',
+}
+
+# Regex fallbacks for languages without a dedicated extractor, and for Python that fails to parse
+_IMPORT_PATTERNS = {
+    'python': re.compile(r'^\s*(?:from\s+([\w.]+)\s+import|import\s+([\w.]+(?:\s*,\s*[\w.]+)*))', re.M),
+    'rust': re.compile(r'^\s*use\s+([\w:]+)', re.M),
+    'java': re.compile(r'^\s*import\s+(?:static\s+)?([\w.]+)', re.M),
+}
+_SYMBOL_PATTERNS = {
+    'python': re.compile(r'^(class|def|async\s+def)\s+(\w+)', re.M),
+    'rust': re.compile(r'^(?:pub(?:\([^)]*\))?\s+)?(fn|struct|enum|trait)\s+(\w+)', re.M),
+    'java': re.compile(r'^(?:public\s+|abstract\s+|final\s+)*(class|interface|enum)\s+(\w+)', re.M),
+}
+
+def _symbol(kind: str, name: str, line: int, end_line: Optional[int] = None, signature: str = "",
+            doc: str = "", parent: Optional[str] = None) -> Dict[str, Any]:
+    return {"kind": kind, "name": name, "line": line, "end_line": end_line or line,
+            "signature": signature, "doc": doc, "parent": parent}
+
+def _first_line(text: Optional[str]) -> str:
+    return text.strip().splitlines()[0].strip() if text and text.strip() else ""
+
+# --- Python ---
+
+def _extract_python(content: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    tree = ast.parse(content)
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = "." * node.level + (node.module or "")
+            imports.append(base)
+            # "from pkg import mod" may name a submodule; non-module names simply never resolve
+            separator = "" if base.endswith(".") else "."
+            imports.extend(base + separator + alias.name for alias in node.names if alias.name != "*")
+
+    symbols = []
+    def visit(body, parent=None):
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                bases = ", ".join(ast.unparse(b) for b in node.bases)
+                signature = f"class {node.name}({bases})" if bases else f"class {node.name}"
+                symbols.append(_symbol("class", node.name, node.lineno, node.end_lineno, signature,
+                                       _first_line(ast.get_docstring(node)), parent))
+                visit(node.body, node.name)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+                signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+                if node.returns is not None:
+                    signature += f" -> {ast.unparse(node.returns)}"
+                symbols.append(_symbol("method" if parent else "function", node.name, node.lineno,
+                                       node.end_lineno, signature, _first_line(ast.get_docstring(node)), parent))
+    visit(tree.body)
+    return imports, symbols
+
+# --- JavaScript / TypeScript / Go ---
+
+_TOKEN = re.compile(
+    r'(?P<comment>//[^\n]*|/\*.*?\*/)'
+    r'|(?P<str>"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|`(?:[^`\\]|\\.)*`)'
+    r'|(?P<id>[A-Za-z_$][\w$]*)'
+    r'|(?P<punct>=>|[{}()\[\];=,.<>:*])',
+    re.S,
+)
+_NOT_METHODS = {"if", "for", "while", "switch", "catch", "return", "function", "new", "typeof", "await"}
+
+def _tokenize(content: str) -> List[Tuple[str, str, int, int]]:
+    """(kind, value, start line, end line) for comments, strings, identifiers and structural punctuation."""
+    tokens, line, pos = [], 1, 0
+    for match in _TOKEN.finditer(content):
+        line += content.count("\n", pos, match.start())
+        value = match.group()
+        end_line = line + value.count("\n")
+        tokens.append((match.lastgroup, value, line, end_line))
+        line, pos = end_line, match.end()
+    return tokens
+
+def _doc_before(tokens, index: int, line: int) -> str:
+    """First line of a comment that ends on the line just above a definition."""
+    j = index - 1
+    while j >= 0 and tokens[j][0] == "id" and tokens[j][1] in ("export", "default", "async", "public", "static"):
+        j -= 1
+    if j >= 0 and tokens[j][0] == "comment" and tokens[j][3] >= line - 1:
+        text = re.sub(r'^/\*+|\*+/$|^//', '', tokens[j][1].strip())
+        lines = [re.sub(r'^\s*\*\s?', '', l).strip() for l in text.splitlines()]
+        return next((l for l in lines if l), "")
+    return ""
+
+def _extract_c_like(content: str, language: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    tokens = _tokenize(content)
+    # Positions of non-comment tokens in `tokens`, so docs can be looked up behind a definition
+    positions = [k for k, t in enumerate(tokens) if t[0] != "comment"]
+    code = [tokens[k] for k in positions]
+    lines = content.splitlines()
+    imports, symbols = [], []
+    depth = 0
+    open_bodies: List[Tuple[Dict[str, Any], int]] = []  # symbol and the depth its body opened at
+    pending: Optional[Dict[str, Any]] = None
+    class_depths: List[Tuple[str, int]] = []
+
+    def signature(line):
+        text = lines[line - 1].strip() if line - 1 < len(lines) else ""
+        return text.rstrip("{").strip()
+
+    def next_value(i, offset=1):
+        return code[i + offset][1] if i + offset < len(code) else None
+
+    for i, (kind, value, line, _) in enumerate(code):
+        full_index = positions[i]
+        # Imports
+        if kind == "id" and value == "import":
+            if language == "go" and next_value(i) == "(":
+                j = i + 2
+                while j < len(code) and code[j][1] != ")":
+                    if code[j][0] == "str":
+                        imports.append(code[j][1][1:-1])
+                    j += 1
+            else:
+                j = i + 1
+                while j < len(code) and code[j][1] != ";" and code[j][2] - line <= 5:
+                    if code[j][0] == "str":
+                        imports.append(code[j][1][1:-1])
+                        break
+                    j += 1
+        elif kind == "id" and value == "require" and next_value(i) == "(" and i + 2 < len(code) and code[i + 2][0] == "str":
+            imports.append(code[i + 2][1][1:-1])
+
+        # Definitions
+        elif kind == "id":
+            in_class = class_depths and class_depths[-1][1] == depth - 1
+            parent = class_depths[-1][0] if in_class else None
+            if language == "go":
+                if value == "func" and depth == 0:
+                    receiver = None
+                    j = i + 1
+                    if next_value(i) == "(":
+                        ids = []
+                        while j < len(code) and code[j][1] != ")":
+                            if code[j][0] == "id":
+                                ids.append(code[j][1])
+                            j += 1
+                        receiver = ids[-1] if ids else None
+                        j += 1
+                    if j < len(code) and code[j][0] == "id":
+                        pending = _symbol("method" if receiver else "function", code[j][1], line,
+                                          signature=signature(line), doc=_doc_before(tokens, full_index, line),
+                                          parent=receiver)
+                        symbols.append(pending)
+                elif value == "type" and depth == 0 and next_value(i) not in (None, "("):
+                    type_kind = next_value(i, 2)
+                    pending = _symbol(type_kind if type_kind in ("struct", "interface") else "type", next_value(i),
+                                      line, signature=signature(line), doc=_doc_before(tokens, full_index, line))
+                    symbols.append(pending)
+                    if type_kind not in ("struct", "interface"):
+                        pending = None
+            elif value in ("function", "class") and i + 1 < len(code) and code[i + 1][0] == "id":
+                pending = _symbol("class" if value == "class" else ("method" if parent else "function"),
+                                  code[i + 1][1], line, signature=signature(line),
+                                  doc=_doc_before(tokens, full_index, line), parent=parent)
+                symbols.append(pending)
+                if value == "class":
+                    pending["_class"] = True
+            elif value in ("const", "let", "var") and depth == 0 and next_value(i, 2) == "=":
+                # Only arrow functions and function expressions are definitions worth listing
+                j = i + 3
+                while j < len(code) and code[j][1] not in (";", "=>", "{") and code[j][1] != "function":
+                    j += 1
+                if j < len(code) and code[j][1] in ("=>", "function"):
+                    pending = _symbol("function", code[i + 1][1], line, signature=signature(line),
+                                      doc=_doc_before(tokens, full_index, line))
+                    symbols.append(pending)
+            elif in_class and value not in _NOT_METHODS and next_value(i) == "(" and \
+                    (i == 0 or code[i - 1][1] in ("{", "}", ";", "async", "static", "get", "set", "public", "private")):
+                pending = _symbol("method", value, line, signature=signature(line),
+                                  doc=_doc_before(tokens, full_index, line), parent=parent)
+                symbols.append(pending)
+
+        # Body tracking
+        elif kind == "punct" and value == "{":
+            if pending is not None:
+                open_bodies.append((pending, depth))
+                if pending.pop("_class", False):
+                    class_depths.append((pending["name"], depth))
+                pending = None
+            depth += 1
+        elif kind == "punct" and value == "}":
+            depth = max(0, depth - 1)
+            while open_bodies and open_bodies[-1][1] >= depth:
+                symbol, _ = open_bodies.pop()
+                symbol["end_line"] = line
+            while class_depths and class_depths[-1][1] >= depth:
+                class_depths.pop()
+        elif kind == "punct" and value == ";":
+            pending = None
+
+    for symbol in symbols:
+        symbol.pop("_class", None)
+    return list(dict.fromkeys(imports)), symbols
+
+def _extract_regex(content: str, language: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    imports = []
+    pattern = _IMPORT_PATTERNS.get(language)
+    if pattern is not None:
+        for match in pattern.finditer(content):
+            for group in match.groups():
+                if group:
+                    imports.extend(name.strip() for name in group.split(","))
+    symbols = []
+    pattern = _SYMBOL_PATTERNS.get(language)
+    if pattern is not None:
+        for match in pattern.finditer(content):
+            line = content.count("\n", 0, match.start()) + 1
+            symbols.append(_symbol(match.group(1).split()[-1], match.group(2), line,
+                                   signature=content.splitlines()[line - 1].strip().rstrip("{:").strip()))
+    return list(dict.fromkeys(imports)), symbols
+
+def extract(content: str, language: Optional[str]) -> Dict[str, Any]:
+    """Imports and definitions (with signatures, docstring first lines and line ranges) for source text."""
+    try:
+        if language == "python":
+            imports, symbols = _extract_python(content)
+        elif language in ("javascript", "typescript", "go"):
+            imports, symbols = _extract_c_like(content, language)
+        else:
+            imports, symbols = _extract_regex(content, language)
+    except (SyntaxError, ValueError, RecursionError):
+        imports, symbols = _extract_regex(content, language)
+    return {"imports": imports, "symbols": symbols}
+
+def extract_file(path: str) -> Optional[Dict[str, Any]]:
+    """Reads and analyzes one file; also returns its content hash. None if unreadable."""
+    try:
+        data = Path(path).read_bytes()
+    except OSError:
+        return None
+    language = LANGUAGES.get(os.path.splitext(path)[1].lower())
+    result = extract(data.decode("utf-8", errors="ignore"), language) if language else {"imports": [], "symbols": []}
+    result["hash"] = hashlib.sha256(data).hexdigest()
+    result["language"] = language
+    return result
+
+class SymbolExtractor:
+    """
+    Extracts symbols for many files at once, caching results by (path, mtime, size).
+
+    Batches of at least SYMBOL_PARALLEL_MIN_FILES uncached files are analyzed in
+    a process pool; smaller batches, or environments where a pool cannot be
+    started, are handled in-process.
+    """
+    MAX_CACHED = 10000
+    _cache: "OrderedDict[str, Tuple[Tuple[float, int], Dict[str, Any]]]" = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    def __init__(self, workers: Optional[int] = None, parallel_min_files: Optional[int] = None):
+        self.workers = workers or config.SYMBOL_EXTRACT_WORKERS or os.cpu_count() or 1
+        self.parallel_min_files = parallel_min_files if parallel_min_files is not None else config.SYMBOL_PARALLEL_MIN_FILES
+
+    def extract_many(self, paths: List[Path]) -> Dict[str, Dict[str, Any]]:
+        results, todo = {}, []
+        for path in paths:
+            key = str(path)
+            try:
+                stat = os.stat(key)
+            except OSError:
+                continue
+            stamp = (stat.st_mtime, stat.st_size)
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] == stamp:
+                    self._cache.move_to_end(key)
+                    results[key] = cached[1]
+                    continue
+            todo.append((key, stamp))
+
+        for (key, stamp), result in zip(todo, self._run([key for key, _ in todo])):
+            if result is None:
+                continue
+            results[key] = result
+            with self._cache_lock:
+                self._cache[key] = (stamp, result)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.MAX_CACHED:
+                    self._cache.popitem(last=False)
+        return results
+
+    def _run(self, paths: List[str]) -> List[Optional[Dict[str, Any]]]:
+        # Frozen builds cannot re-launch themselves as pool workers
+        if self.workers > 1 and len(paths) >= self.parallel_min_files and not getattr(sys, "frozen", False):
+            try:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    return list(pool.map(extract_file, paths, chunksize=max(1, len(paths) // (self.workers * 4))))
+            except (OSError, RuntimeError, ImportError):
+                # e.g. no multiprocessing support in a frozen or sandboxed build
+                pass
+        return [extract_file(path) for path in paths]
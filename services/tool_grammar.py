@@ -0,0 +1,48 @@
+# services/tool_grammar.py
+
+from typing import Dict, List, Tuple
+
+# Tools the local model may call: name -> [(argument, type)]
+LOCAL_TOOLS: Dict[str, List[Tuple[str, str]]] = {
+    "read_file": [("path", "string")],
+    "write_file": [("path", "string"), ("content", "string")],
+    "list_dir": [("path", "string")],
+    "read_result": [("handle", "string"), ("page", "integer")],
+}
+
+_PRIMITIVES = r'''
+ws ::= [ \t\n]*
+string ::= "\"" ( [^"\\\x00-\x1f] | "\\" ( ["\\/bfnrt] | "u" [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] ) )* "\""
+integer ::= "-"? [0-9]+
+'''
+
+def _rule_name(tool_name: str) -> str:
+    return "call-" + tool_name.replace("_", "-")
+
+def build_tool_call_gbnf(tools: Dict[str, List[Tuple[str, str]]] = None, allow_text: bool = True) -> str:
+    """
+    Builds a GBNF grammar that only accepts well-formed calls to `tools`.
+
+    With `allow_text`, a response that does not start with "{" is free text,
+    so the model can still give a plain final answer. A response that starts
+    with "{" must be exactly one valid tool call, after which the grammar is
+    complete and generation stops.
+    """
+    tools = tools or LOCAL_TOOLS
+    rules = []
+    for name, args in tools.items():
+        body = f'"\\"{name}\\""'
+        for arg, arg_type in args:
+            body += f' ws "," ws "\\"{arg}\\"" ws ":" ws {arg_type}'
+        rules.append(f"{_rule_name(name)} ::= {body}")
+
+    alternatives = " | ".join(_rule_name(name) for name in tools)
+    root = 'root ::= ws tool-call'
+    if allow_text:
+        root = 'root ::= ws ( tool-call | text )\ntext ::= [^{ \\t\\n] [^\\x00]*'
+
+    return "\n".join([
+        root,
+        f'tool-call ::= "{{" ws "\\"tool\\"" ws ":" ws ( {alternatives} ) ws "}}"',
+        *rules,
+    ]) + _PRIMITIVES
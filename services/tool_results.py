@@ -0,0 +1,118 @@
+# services/tool_results.py
+
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from config import config
+
+class ToolResultStore:
+    """
+    Keeps oversized tool outputs out of the message history.
+
+    Results larger than the per-call cap (or the space left in the current
+    turn) are replaced by a head/tail excerpt plus a handle, and the model can
+    page through the full text with the `read_result` tool. Pages count
+    toward the turn's budget like any other result. With a BlobStore the full
+    text is saved as a blob named by the handle, so handles in a resumed
+    session still work; without one it is only kept in memory.
+    """
+    MIN_EXCERPT_CHARS = 200
+    HANDLE_DIGITS = 16
+
+    def __init__(self, max_chars: Optional[int] = None, turn_max_chars: Optional[int] = None,
+                 page_chars: Optional[int] = None, max_stored: int = 50, blobs: Optional[Any] = None):
+        self.max_chars = max_chars or config.TOOL_RESULT_MAX_CHARS
+        self.turn_max_chars = turn_max_chars or config.TOOL_RESULTS_TURN_MAX_CHARS
+        self.page_chars = page_chars or config.TOOL_RESULT_PAGE_CHARS
+        self.max_stored = max_stored
+        self.blobs = blobs
+        self._results: "OrderedDict[str, str]" = OrderedDict()
+        self._counter = 0
+        self._turn_used = 0
+
+    def new_turn(self):
+        """Resets the per-turn budget. Call once per batch of tool calls."""
+        self._turn_used = 0
+
+    def cap(self, tool_name: str, text: str) -> str:
+        """Returns `text` unchanged if it fits, otherwise an excerpt with a paging handle."""
+        text = text if isinstance(text, str) else str(text)
+        remaining = max(self.turn_max_chars - self._turn_used, self.MIN_EXCERPT_CHARS)
+        allowance = min(self.max_chars, remaining)
+
+        # Pages are already sized by us; never re-store them, but the first
+        # page of a turn is always let through so paging can make progress
+        if tool_name == "read_result":
+            if self._turn_used and len(text) > self.turn_max_chars - self._turn_used:
+                text = ("[Turn output limit reached: page not shown. "
+                        "Request it again in the next turn.]")
+            self._turn_used += len(text)
+            return text
+
+        if len(text) <= allowance:
+            self._turn_used += len(text)
+            return text
+
+        handle, persisted = self._store(text)
+        half = max(allowance // 2, self.MIN_EXCERPT_CHARS // 2)
+        head, tail = text[:half], text[-half:]
+        omitted = len(text) - len(head) - len(tail)
+        body = f"{head}\n... [{omitted} chars omitted] ...\n{tail}"
+        if persisted:
+            # Packed here so the handle itself stays in the history, where GC sees it
+            body = self.blobs.pack(body)
+        scope = "" if persisted else " This handle only works in the current session."
+        excerpt = (
+            f"[Output truncated: {len(text)} chars total. Handle: {handle} ({self.page_count(handle)} pages). "
+            f"Use {{\"tool\": \"read_result\", \"handle\": \"{handle}\", \"page\": N}} to read more.{scope}]\n"
+            f"{body}"
+        )
+        self._turn_used += len(excerpt)
+        return excerpt
+
+    def _text(self, handle: str) -> Optional[str]:
+        if handle in self._results:
+            self._results.move_to_end(handle)
+            return self._results[handle]
+        prefix = handle[len("res-"):]
+        if self.blobs is None or not handle.startswith("res-") or len(prefix) != self.HANDLE_DIGITS:
+            return None
+        digest = self.blobs.find(prefix)
+        return self.blobs.get(digest) if digest else None
+
+    def page_count(self, handle: str) -> int:
+        text = self._text(handle) or ""
+        return max(1, -(-len(text) // self.page_chars))
+
+    def read_page(self, handle: str, page: int = 1) -> str:
+        """Returns one page (1-based) of a stored result."""
+        text = self._text(handle)
+        if text is None:
+            return f"[red]Error:[/] Unknown result handle: {handle}"
+        total = self.page_count(handle)
+        try:
+            page = int(page)
+        except (TypeError, ValueError):
+            return f"[red]Error:[/] Invalid page: {page}"
+        if page < 1 or page > total:
+            return f"[red]Error:[/] Page {page} out of range (1-{total}) for {handle}"
+        start = (page - 1) * self.page_chars
+        chunk = text[start:start + self.page_chars]
+        return f"[{handle} page {page}/{total}]\n{chunk}"
+
+    def _store(self, text: str) -> Tuple[str, bool]:
+        """Keeps `text` and returns its handle and whether it outlives this session."""
+        handle, persisted = None, False
+        if self.blobs is not None:
+            try:
+                handle, persisted = "res-" + self.blobs.put(text)[:self.HANDLE_DIGITS], True
+            except OSError:
+                pass
+        if handle is None:
+            self._counter += 1
+            handle = f"res-{self._counter}"
+        self._results[handle] = text
+        self._results.move_to_end(handle)
+        while len(self._results) > self.max_stored:
+            self._results.popitem(last=False)
+        return handle, persisted
@@ -63,3 +63,20 @@ def test_apply_change(command_context):
     handler.ctx.mcp_client.write_file.assert_called_once_with(
         "a/b.py", "some new content"
     )
+
+def test_confirmation_follows_policy_without_stdin(command_context, monkeypatch):
+    """Tests that headless confirmation policies never read stdin."""
+    monkeypatch.setattr("builtins.input", lambda *a: pytest.fail("read stdin"))
+    command_context.auto_confirm = False
+    command_context.metadata = {"deepseek_response": SAMPLE_MODEL_RESPONSE}
+    command_context.root_path = Path("/test/root")
+    command_context.mcp_client.write_file.return_value = {"status": "ok"}
+
+    command_context.confirm_policy = "deny"
+    AutoImplementHandler(command_context).handle()
+    assert command_context.response == "Implementation canceled"
+    command_context.mcp_client.write_file.assert_not_called()
+
+    command_context.confirm_policy = "approve"
+    AutoImplementHandler(command_context).handle()
+    assert command_context.mcp_client.write_file.call_count == 2
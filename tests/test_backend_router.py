@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import patch
+from services.backend_router import BackendRouter
+
+@pytest.fixture
+def router():
+    return BackendRouter(cloud_enabled=True)
+
+def test_short_question_stays_local(router):
+    """Tests that a short, self-contained question is routed to the local model."""
+    assert router.choose("explain what a python decorator is", analysis_hint=True) == BackendRouter.LOCAL
+
+def test_cross_file_analysis_goes_to_cloud(router):
+    """Tests that prompts needing project-wide context are routed to DeepSeek."""
+    prompt = "review the architecture of the codebase and its dependencies"
+    assert router.choose(prompt, analysis_hint=True) == BackendRouter.CLOUD
+
+def test_multiple_files_raise_context_need(router):
+    """Tests that referencing several files counts towards context need."""
+    assert router.estimate_context_need("fix app.py") == 0
+    assert router.estimate_context_need("compare app.py, config.py and run.py") == 2
+
+def test_large_prompt_goes_to_cloud(router):
+    """Tests that prompts too large for the local context window go to DeepSeek."""
+    assert router.choose("x " * 10000) == BackendRouter.CLOUD
+
+def test_cloud_disabled_keeps_everything_local():
+    """Tests that heavy prompts stay local when DeepSeek is not configured."""
+    router = BackendRouter(cloud_enabled=False)
+    assert router.choose("review the whole codebase architecture", analysis_hint=True) == BackendRouter.LOCAL
+
+def test_failure_opens_circuit_until_cooldown(router):
+    """Tests that a failed backend is skipped until its cooldown expires."""
+    with patch('services.backend_router.time.time', return_value=100.0):
+        router.record_failure(BackendRouter.LOCAL)
+        assert router.choose("hello") == BackendRouter.CLOUD
+    with patch('services.backend_router.time.time', return_value=100.0 + 10**6):
+        assert router.choose("hello") == BackendRouter.LOCAL
+
+def test_success_resets_failures(router):
+    """Tests that a successful call closes the circuit immediately."""
+    router.record_failure(BackendRouter.LOCAL)
+    router.record_success(BackendRouter.LOCAL, 0.5, 20)
+    assert router.is_available(BackendRouter.LOCAL)
+    assert router.stats[BackendRouter.LOCAL].tokens_per_sec == pytest.approx(40.0)
+
+def test_slow_backend_loses_to_faster_one(router):
+    """Tests that a consistently slow preferred backend is bypassed."""
+    with patch('services.backend_router.config.ROUTER_SLOW_SECONDS', 5.0):
+        router.record_success(BackendRouter.LOCAL, 60.0)
+        router.record_success(BackendRouter.CLOUD, 2.0)
+        assert router.choose("hello") == BackendRouter.CLOUD
+
+@patch('services.llm_handler.Llama')
+def test_local_error_is_reported_when_cloud_is_unusable(mock_llama, tmp_path):
+    """Tests that a failing local model does not fail over to a DeepSeek without an API key."""
+    from unittest.mock import MagicMock
+    from models.router import CommandProcessor, CommandHandler
+    from models.session import CommandContext
+    from services.llm_handler import DeepSeekAnalysisHandler, LocalCodingHandler
+
+    class NotFoundHandler(CommandHandler):
+        def can_handle(self):
+            return True
+        def handle(self):
+            self.ctx.response = "Command not found"
+
+    mock_llama.return_value.create_chat_completion.side_effect = RuntimeError("model crashed")
+    ctx = CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+    ctx.backend_router = BackendRouter(cloud_enabled=False)
+    processor = CommandProcessor(ctx)
+    local = LocalCodingHandler(ctx)
+    for handler in (DeepSeekAnalysisHandler(ctx), local, NotFoundHandler(ctx)):
+        processor.add_handler(handler)
+
+    response = processor.execute("hello there")
+    assert "model crashed" in response
+    assert local.message_history[-2]["content"].endswith("hello there")
@@ -0,0 +1,135 @@
+import json
+import time
+import asyncio
+import threading
+import pytest
+from unittest.mock import MagicMock
+from models.session import CommandContext
+from models.router import CommandHandler, CommandProcessor
+from services.batch import BatchRunner, load_prompts, session_name, summarize_results
+from services.budget import RequestBudget
+from utils.cancellation import check_cancelled
+
+class EchoHandler(CommandHandler):
+    """Answers with its own history length, so shared history would show."""
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def __init__(self, context, delay=0.05):
+        super().__init__(context)
+        self.message_history = []
+        self.delay = delay
+        self.budget = None
+
+    def can_handle(self):
+        return True
+
+    def handle(self):
+        with EchoHandler.lock:
+            EchoHandler.running += 1
+            EchoHandler.peak = max(EchoHandler.peak, EchoHandler.running)
+        try:
+            deadline = time.monotonic() + self.delay
+            while time.monotonic() < deadline:
+                check_cancelled(self.ctx)
+                time.sleep(0.01)
+            self.message_history.append(self.ctx.user_input)
+            self.budget = RequestBudget()
+            self.budget.charge_tokens(10 * len(self.message_history))
+            self.budget.charge_tool_calls(1)
+            self.ctx.response = f"{self.ctx.user_input} ({len(self.message_history)} messages)"
+        finally:
+            with EchoHandler.lock:
+                EchoHandler.running -= 1
+
+@pytest.fixture(autouse=True)
+def reset_counters():
+    EchoHandler.running = EchoHandler.peak = 0
+
+def _factory(contexts, delay=0.05):
+    def make_processor(root_path, name):
+        ctx = CommandContext(root_path=root_path, mcp_client=MagicMock(), sandbox_path=root_path)
+        ctx.session_name = name
+        contexts.append(ctx)
+        processor = CommandProcessor(ctx)
+        processor.add_handler(EchoHandler(ctx, delay))
+        return processor
+    return make_processor
+
+def test_load_prompts_keeps_bad_lines_as_errors(tmp_path):
+    """Tests that ids default to line numbers and unusable lines still produce an item."""
+    path = tmp_path / "prompts.jsonl"
+    path.write_text('{"prompt": "review", "id": "a", "dir": "repo"}\n"bare prompt"\n\nnot json\n{"id": 5}\n')
+    items = load_prompts(path)
+    assert [item["id"] for item in items] == ["a", "2", "4", "5"]
+    assert items[1]["prompt"] == "bare prompt"
+    assert "Invalid JSON" in items[2]["error"] and "no prompt" in items[3]["error"]
+    assert session_name("team/repo 1") == "batch-team_repo_1"
+
+def test_repeated_ids_get_separate_sessions(tmp_path):
+    """Tests that items sharing an id, or a session name, are given distinct ids."""
+    path = tmp_path / "prompts.jsonl"
+    path.write_text('{"prompt": "one", "id": "a"}\n{"prompt": "two", "id": "a"}\n'
+                    '{"prompt": "three", "id": "team/repo"}\n{"prompt": "four", "id": "team_repo"}\n')
+    items = load_prompts(path)
+    assert [item["id"] for item in items] == ["a", "a-line2", "team/repo", "team_repo-line4"]
+    assert len({session_name(item["id"]) for item in items}) == 4
+
+def test_runs_isolated_prompts_within_concurrency(tmp_path):
+    """Tests that prompts run concurrently up to the limit, each in its own context."""
+    contexts = []
+    items = [{"id": str(i), "prompt": f"review {i}"} for i in range(6)]
+    output = tmp_path / "results.jsonl"
+    results = asyncio.run(BatchRunner(_factory(contexts), tmp_path, concurrency=2).run(items, output))
+
+    assert EchoHandler.peak == 2
+    assert len({id(ctx) for ctx in contexts}) == 6
+    assert {ctx.session_name for ctx in contexts} == {f"batch-{i}" for i in range(6)}
+    assert [r["response"] for r in results] == [f"review {i} (1 messages)" for i in range(6)]
+    assert all(r["status"] == "ok" and r["tokens"] == 10 and r["tool_calls"] == 1 for r in results)
+    written = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(r["id"] for r in written) == [str(i) for i in range(6)]
+    assert all(r["seconds"] > 0 and r["started_at"] for r in written)
+
+def test_bad_items_and_directories_become_error_results(tmp_path):
+    """Tests that a broken item is reported without stopping the batch."""
+    items = [{"id": "1", "error": "Line 1 has no prompt"},
+             {"id": "2", "prompt": "review", "dir": "missing"},
+             {"id": "3", "prompt": "review"}]
+    results = asyncio.run(BatchRunner(_factory([]), tmp_path).run(items, tmp_path / "out.jsonl"))
+    assert [r["status"] for r in results] == ["error", "error", "ok"]
+    assert "does not exist" in results[1]["error"]
+    assert summarize_results(results) == {"error": 2, "ok": 1}
+
+def test_cancel_stops_running_and_skips_pending(tmp_path):
+    """Tests that cancelling ends the prompts in flight and marks the rest cancelled."""
+    items = [{"id": str(i), "prompt": "slow"} for i in range(4)]
+    runner = BatchRunner(_factory([], delay=30), tmp_path, concurrency=2)
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.3, runner.cancel)
+        return await runner.run(items, tmp_path / "out.jsonl")
+
+    started = time.monotonic()
+    results = asyncio.run(run())
+    assert time.monotonic() - started < 10
+    assert [r["status"] for r in results] == ["cancelled"] * 4
+
+def test_sandboxed_mcp_serves_its_own_directory(tmp_path, monkeypatch):
+    """Tests that a batch prompt's MCP server reads and writes in that prompt's directory."""
+    from app import start_sandboxed_mcp
+    from config import config
+    monkeypatch.setattr(config, "MCP_SERVER_HOST", "127.0.0.1")
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "notes.txt").write_text("from repo")
+    server, client = start_sandboxed_mcp(repo)
+    try:
+        assert client.read_file("notes.txt")["content"] == "from repo"
+        client.write_file("out.txt", "written")
+        assert (repo / "out.txt").read_text() == "written"
+        assert "error" in client.read_file("../outside.txt")
+    finally:
+        server.shutdown()
+        server.server_close()
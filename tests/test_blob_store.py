@@ -0,0 +1,90 @@
+import os
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from services.blob_store import BlobStore
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(tmp_path / "blobs", min_bytes=100)
+
+def test_large_text_is_stored_once_compressed(store, tmp_path):
+    """Tests that identical large outputs share one compressed blob and small ones stay inline."""
+    listing = "\n".join(f"file_{i}.py" for i in range(200))
+    first, second = store.pack(listing), store.pack(listing)
+    assert first == second and first.startswith("<<blob:")
+    blobs = [p for p in (tmp_path / "blobs").rglob("*") if p.is_file()]
+    assert len(blobs) == 1
+    assert blobs[0].stat().st_size < len(listing) // 4
+    assert store.pack("short") == "short"
+
+def test_expand_messages_restores_content(store, tmp_path):
+    """Tests that references are expanded in a copy while the history keeps the references."""
+    text = "x = 1\n" * 50
+    history = [{"role": "system", "content": "prompt"},
+               {"role": "user", "content": "Tool Results: \n" + store.pack(text) + "\n\nhint"}]
+    expanded = store.expand_messages(history)
+    assert expanded[1]["content"] == "Tool Results: \n" + text + "\n\nhint"
+    assert expanded[0] is history[0]
+    assert "<<blob:" in history[1]["content"]
+
+    # A fresh store (new process) reads the blob back from disk
+    assert BlobStore(tmp_path / "blobs").expand(history[1]["content"]) == expanded[1]["content"]
+
+def test_missing_blob_expands_to_placeholder(store):
+    """Tests that a deleted blob does not break prompt building."""
+    assert store.expand("<<blob:" + "0" * 64 + ">>") == "[Tool result no longer available]"
+
+def test_garbage_collection_keeps_live_and_recent_blobs(store):
+    """Tests that only old, unreferenced blobs are removed."""
+    live = store.pack("a" * 200)
+    dead = store.pack("b" * 200)
+    recent = store.pack("c" * 200)
+    old = time.time() - 3 * 86400
+    for ref in (live, dead):
+        digest = ref[len("<<blob:"):-2]
+        os.utime(store._path(digest), (old, old))
+
+    assert store.collect_garbage(["history with " + live]) == 1
+    assert store.expand(live) == "a" * 200
+    store._cache.clear()
+    assert store.expand(dead) == "[Tool result no longer available]"
+    assert store.expand(recent) == "c" * 200
+
+def test_reusing_an_old_blob_protects_it_from_collection(store, tmp_path):
+    """Tests that packing existing content refreshes its age, so GC spares the unpersisted reference."""
+    ref = store.pack("d" * 200)
+    path = store._path(ref[len("<<blob:"):-2])
+    old = time.time() - 3 * 86400
+    os.utime(path, (old, old))
+
+    assert store.pack("d" * 200) == ref
+    assert BlobStore(tmp_path / "blobs").collect_garbage([]) == 0
+    assert path.exists()
+
+@patch('services.llm_handler.Llama')
+def test_local_handler_persists_references_and_sends_content(mock_llama, tmp_path):
+    """Tests that repeated tool output is stored as a reference and expanded for the model."""
+    from models.session import CommandContext
+    from services.llm_handler import LocalCodingHandler
+    big = "line of file content\n" * 200
+    ctx = CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+    ctx.mcp_client.read_file.return_value = {"content": big}
+    responses = iter(['{"tool": "read_file", "path": "a.py"}', "Done"])
+    sent = []
+
+    def complete(messages, **kwargs):
+        sent.append(messages)
+        return {"choices": [{"message": {"content": next(responses)}}]}
+
+    with patch('services.llm_handler.config.LOCAL_CONSTRAINED_DECODING', False), \
+         patch('services.llm_handler.config.TOOL_RESULT_MAX_CHARS', 10 ** 6), \
+         patch('services.llm_handler.config.TOOL_RESULTS_TURN_MAX_CHARS', 10 ** 6):
+        handler = LocalCodingHandler(ctx)
+        handler.llm.create_chat_completion.side_effect = complete
+        ctx.user_input = "read a.py"
+        handler.handle()
+
+    tool_message = handler.message_history[-2]["content"]
+    assert "<<blob:" in tool_message and big not in tool_message
+    assert big in sent[-1][-1]["content"]
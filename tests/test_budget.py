@@ -0,0 +1,87 @@
+from unittest.mock import MagicMock, patch
+from services.budget import RequestBudget
+from models.session import CommandContext
+
+def test_tool_call_budget_is_exhausted():
+    """Tests that the tool-call limit is reported once used up."""
+    budget = RequestBudget(max_tool_calls=2)
+    budget.charge_tool_calls(1)
+    assert budget.exhausted() is None
+    budget.charge_tool_calls(1)
+    assert "tool call limit" in budget.exhausted()
+
+def test_token_budget_caps_next_call():
+    """Tests that the completion cap never exceeds the remaining tokens."""
+    budget = RequestBudget(max_tokens=1000)
+    budget.charge_tokens(800)
+    assert budget.call_max_tokens(4096) == 200
+    budget.charge_tokens(500)
+    assert "token limit" in budget.exhausted()
+
+def test_wall_time_budget_limits_timeout():
+    """Tests that call timeouts shrink with the remaining wall time."""
+    with patch('services.budget.time.monotonic', return_value=0.0):
+        budget = RequestBudget(max_seconds=60)
+    with patch('services.budget.time.monotonic', return_value=40.0):
+        assert budget.call_timeout(90) == 20.0
+        assert budget.exhausted() is None
+    with patch('services.budget.time.monotonic', return_value=61.0):
+        assert "wall time" in budget.exhausted()
+        budget.finalizing = True
+        assert budget.call_timeout(90) == RequestBudget.FINAL_CALL_SECONDS
+
+def test_unlimited_budget_has_no_hint():
+    """Tests that disabled limits are left out of the hint."""
+    assert RequestBudget().hint() == ""
+    assert RequestBudget(max_tool_calls=5).hint() == "[Remaining budget: 5 tool calls]"
+
+def test_from_context_prefers_context_values(tmp_path):
+    """Tests that limits set on the context override the configured defaults."""
+    ctx = CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+    ctx.budget_tool_calls = 3
+    budget = RequestBudget.from_context(ctx)
+    assert budget.max_tool_calls == 3
+
+@patch('services.llm_handler.Llama')
+def test_tool_loop_finishes_when_budget_runs_out(mock_llama, tmp_path):
+    """Tests that the agent loop asks for a final answer instead of prompting the user."""
+    from services.llm_handler import LocalCodingHandler
+    tool_call = {'choices': [{'message': {'content': '{"tool": "list_dir", "path": "."}'}}]}
+    final = {'choices': [{'message': {'content': 'Best effort answer'}}]}
+    mock_llama.return_value.create_chat_completion.side_effect = [tool_call, tool_call, final]
+
+    ctx = CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+    ctx.mcp_client.list_dir.return_value = {"result": {"files": [], "directories": []}}
+    ctx.budget_tool_calls = 2
+    ctx.user_input = "explore"
+
+    handler = LocalCodingHandler(ctx)
+    with patch('builtins.input', side_effect=AssertionError("must not prompt")):
+        handler.handle()
+
+    assert "tool call limit of 2 reached" in ctx.response
+    assert ctx.response.endswith("Best effort answer")
+    assert "[Remaining budget: 1 tool calls" in handler.message_history[3]['content']
+    assert "Budget exhausted" in handler.message_history[-2]['content']
+
+@patch('services.llm_handler.Llama')
+def test_multi_call_turn_stops_at_tool_call_limit(mock_llama, tmp_path):
+    """Tests that a response with more tool calls than the budget allows only runs up to the limit."""
+    from services.llm_handler import LocalCodingHandler
+    calls = "\n".join('{"tool": "list_dir", "path": "."}' for _ in range(5))
+    many_calls = {'choices': [{'message': {'content': calls}}]}
+    final = {'choices': [{'message': {'content': 'Best effort answer'}}]}
+    mock_llama.return_value.create_chat_completion.side_effect = [many_calls, final]
+
+    ctx = CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+    ctx.mcp_client.list_dir.return_value = {"result": {"files": [], "directories": []}}
+    ctx.budget_tool_calls = 3
+    ctx.user_input = "explore"
+
+    handler = LocalCodingHandler(ctx)
+    handler.handle()
+
+    assert ctx.mcp_client.list_dir.call_count == 3
+    assert handler.budget.tool_calls_used == 3
+    assert handler.message_history[3]['content'].count("'list_dir' was not run") == 2
+    assert ctx.response.endswith("Best effort answer")
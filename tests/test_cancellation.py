@@ -0,0 +1,96 @@
+import time
+import threading
+import subprocess
+import pytest
+from unittest.mock import MagicMock
+from models.session import CommandContext
+from models.router import CommandHandler, CommandProcessor
+from utils.cancellation import CANCELLED_MESSAGE, RequestCancelled, check_cancelled, run_cancellable, run_subprocess
+
+@pytest.fixture
+def ctx(tmp_path):
+    return CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+
+def _cancel_after(ctx, seconds):
+    timer = threading.Timer(seconds, ctx.cancel_event.set)
+    timer.start()
+    return timer
+
+class HistoryHandler(CommandHandler):
+    """Appends to its history, then optionally gets cancelled mid-request."""
+    def __init__(self, context, cancel=False):
+        super().__init__(context)
+        self.message_history = [{"role": "system", "content": "prompt"}]
+        self.cancel = cancel
+
+    def checkpoint(self):
+        return list(self.message_history)
+
+    def rollback(self, state):
+        self.message_history = list(state)
+
+    def can_handle(self):
+        return True
+
+    def handle(self):
+        self.message_history.append({"role": "user", "content": self.ctx.user_input})
+        if self.cancel:
+            self.ctx.cancel_event.set()
+        check_cancelled(self.ctx)
+        self.message_history.append({"role": "assistant", "content": "done"})
+        self.ctx.response = "done"
+
+def test_run_subprocess_matches_subprocess_run(ctx, tmp_path):
+    """Tests that a command that finishes returns its exit code and output."""
+    process = run_subprocess(ctx, "echo out; echo err >&2; exit 3", timeout=10, cwd=tmp_path)
+    assert (process.returncode, process.stdout, process.stderr) == (3, "out\n", "err\n")
+
+def test_cancel_kills_the_whole_process_group(ctx, tmp_path):
+    """Tests that cancelling a shell command also kills the processes it started."""
+    marker = tmp_path / "survived"
+    _cancel_after(ctx, 0.3)
+    started = time.monotonic()
+    with pytest.raises(RequestCancelled):
+        run_subprocess(ctx, f"(sleep 1 && touch {marker}) & sleep 30", timeout=60, cwd=tmp_path)
+    assert time.monotonic() - started < 5
+    time.sleep(1.5)
+    assert not marker.exists()
+
+def test_run_subprocess_times_out(ctx, tmp_path):
+    """Tests that the timeout still raises TimeoutExpired, like subprocess.run."""
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_subprocess(ctx, "sleep 30", timeout=0.3, cwd=tmp_path)
+
+def test_run_cancellable_stops_waiting_on_cancel(ctx):
+    """Tests that a blocking call is abandoned as soon as the request is cancelled."""
+    release = threading.Event()
+    _cancel_after(ctx, 0.2)
+    started = time.monotonic()
+    with pytest.raises(RequestCancelled):
+        run_cancellable(ctx, release.wait, 30)
+    assert time.monotonic() - started < 5
+    release.set()
+    assert run_cancellable(MagicMock(spec=[]), lambda x: x * 2, 21) == 42
+
+def test_cancelled_request_rolls_back_history(ctx):
+    """Tests that a cancelled request leaves the conversation as it was and the next request runs."""
+    handler = HistoryHandler(ctx, cancel=True)
+    processor = CommandProcessor(ctx)
+    processor.add_handler(handler)
+
+    assert processor.execute("first question") == CANCELLED_MESSAGE
+    assert handler.message_history == [{"role": "system", "content": "prompt"}]
+
+    handler.cancel = False
+    ctx.cancel_event.clear()
+    assert processor.execute("second question") == "done"
+    assert [m["content"] for m in handler.message_history] == ["prompt", "second question", "done"]
+
+def test_cancellation_passes_through_broad_exception_handlers(ctx):
+    """Tests that `except Exception` around model and tool calls does not swallow a cancellation."""
+    ctx.cancel_event.set()
+    with pytest.raises(RequestCancelled):
+        try:
+            check_cancelled(ctx)
+        except Exception:
+            pytest.fail("RequestCancelled was caught as an Exception")
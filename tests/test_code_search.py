@@ -0,0 +1,97 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from services.project_index import ProjectIndex
+from services.code_search import CodeSearchIndex, tokenize
+from models.session import CommandContext
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "billing.py").write_text(
+        "TAX_RATE = 0.2\n\n"
+        "def compute_invoice_total(items):\n"
+        "    \"\"\"Sum line items and apply tax.\"\"\"\n"
+        "    return sum(items) * (1 + TAX_RATE)\n\n"
+        "class PaymentGateway:\n"
+        "    retries = 3\n\n"
+        "    def charge_card(self, amount):\n"
+        "        return amount\n"
+    )
+    (tmp_path / "users.py").write_text(
+        "def create_user(name):\n"
+        "    return {'name': name}\n"
+    )
+    return tmp_path
+
+def _search(root):
+    return CodeSearchIndex(ProjectIndex(root))
+
+def test_tokenize_splits_identifiers():
+    """Tests that snake_case and camelCase identifiers are indexed whole and by part."""
+    assert tokenize("compute_invoice_total") == ["compute_invoice_total", "compute", "invoice", "total"]
+    assert tokenize("PaymentGateway.chargeCard") == ["paymentgateway", "payment", "gateway", "chargecard", "charge", "card"]
+    assert tokenize("return self") == []
+
+def test_search_ranks_function_chunks(project):
+    """Tests that queries hit the matching function and report its line range."""
+    search = _search(project)
+    search.update()
+    results = search.search("how is the invoice total computed with tax?")
+    assert results[0]["path"] == "billing.py"
+    assert results[0]["name"] == "compute_invoice_total"
+    assert (results[0]["start_line"], results[0]["end_line"]) == (3, 5)
+
+    methods = search.search("charge card")
+    assert methods[0]["name"] == "charge_card"
+
+def test_module_level_code_is_chunked(project):
+    """Tests that code outside any definition is still searchable."""
+    search = _search(project)
+    search.update()
+    assert search.search("TAX_RATE")[0]["start_line"] == 1
+
+def test_update_is_incremental(project):
+    """Tests that only changed files are re-indexed and deleted files are dropped."""
+    search = _search(project)
+    assert search.update()["indexed"] == 2
+    search.index.last_refresh = 0
+    assert search.update() == {"indexed": 0, "removed": 0}
+
+    users = project / "users.py"
+    users.write_text("def delete_account(user):\n    pass\n")
+    os.utime(users, (users.stat().st_atime, users.stat().st_mtime + 10))
+    (project / "billing.py").unlink()
+    search.index.last_refresh = 0
+    assert search.update() == {"indexed": 1, "removed": 1}
+    assert search.search("invoice") == []
+    assert search.search("delete account")[0]["name"] == "delete_account"
+
+def test_select_context_respects_budget_and_exclusions(project):
+    """Tests that selected chunks fit the token budget and skip already sent chunks."""
+    search = _search(project)
+    search.update()
+    chunks = search.select_context("invoice payment card user", max_tokens=40, max_chunks=5)
+    assert sum(len(c["text"]) // 4 + 10 for c in chunks) <= 40
+    assert chunks
+
+    first = search.select_context("invoice total tax", max_tokens=1000, max_chunks=1)
+    again = search.select_context("invoice total tax", max_tokens=1000, max_chunks=1, exclude={first[0]["id"]})
+    assert again[0]["id"] != first[0]["id"]
+
+@patch('services.llm_handler.requests.post')
+def test_deepseek_question_includes_relevant_code(mock_post, project):
+    """Tests that a DeepSeek question carries the matching chunks once per session."""
+    from services.llm_handler import DeepSeekAnalysisHandler
+    mock_post.return_value = MagicMock(status_code=200, json=lambda: {'choices': [{'message': {'content': 'Answer'}}]})
+    ctx = CommandContext(root_path=project, mcp_client=MagicMock(), sandbox_path=project)
+    with patch('services.llm_handler.config.DEEPSEEK_API_KEY', 'sk-' + 'a' * 24), \
+         patch('services.llm_handler.ContextManager', return_value=MagicMock()):
+        handler = DeepSeekAnalysisHandler(ctx)
+        handler.message_history = []
+        ctx.user_input = "@deepseek explain compute_invoice_total"
+        handler.handle()
+        ctx.user_input = "@deepseek explain compute_invoice_total again"
+        handler.handle()
+
+    assert "### billing.py:3-5" in handler.message_history[1]["content"]
+    assert "### billing.py:3-5" not in handler.message_history[3]["content"]
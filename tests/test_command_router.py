@@ -84,3 +84,34 @@ def test_middleware_execution(command_processor):
     # Check that middleware ran and handler executed
     assert command_processor.ctx.middleware_ran == True
     assert response == "Handled by A"
+
+def test_failover_to_other_handler(command_processor):
+    """Tests that a handler setting ctx.failover hands the request to another handler."""
+    class UnreachableHandler(CommandHandler):
+        def can_handle(self) -> bool:
+            return True
+        def handle(self) -> None:
+            self.ctx.response = "backend down"
+            self.ctx.failover = True
+
+    class BackupHandler(FallbackHandler):
+        accepts_failover = True
+
+    command_processor.add_handler(BackupHandler(command_processor.ctx))
+    command_processor.handlers.insert(0, UnreachableHandler(command_processor.ctx))
+
+    response = command_processor.execute("anything")
+    assert response == "Handled by Fallback"
+
+def test_failed_response_kept_when_no_handler_takes_over(command_processor):
+    """Tests that a failover no backend accepts returns the failed handler's response, not the catch-all."""
+    class UnreachableHandler(CommandHandler):
+        def can_handle(self) -> bool:
+            return True
+        def handle(self) -> None:
+            self.ctx.response = "backend down"
+            self.ctx.failover = True
+
+    command_processor.add_handler(UnreachableHandler(command_processor.ctx))
+    command_processor.add_handler(FallbackHandler(command_processor.ctx))
+    assert command_processor.execute("anything") == "backend down"
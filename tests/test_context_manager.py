@@ -0,0 +1,83 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from models.session import CommandContext
+from services.context_manager import ContextManager
+
+def _bump(path):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+@pytest.fixture
+def project(tmp_path):
+    for i in range(20):
+        (tmp_path / f"mod{i}.py").write_text("x = 1\n")
+    (tmp_path / "requirements.txt").write_text("requests\n")
+    (tmp_path / "DeepCoderX.md").write_text("## Core Concept: A tool\n")
+    return tmp_path
+
+def _manager(root):
+    ctx = CommandContext(root_path=root, mcp_client=MagicMock(), sandbox_path=root)
+    return ContextManager(ctx)
+
+def _refresh(manager, **kwargs):
+    # Bypass the index refresh throttle so every call sees the filesystem
+    with patch("services.project_index.config.PROJECT_INDEX_REFRESH_SECONDS", 0):
+        return manager.refresh_context(**kwargs)
+
+def test_first_refresh_builds_file(project):
+    """Tests that a missing context file is built with every section delimited."""
+    manager = _manager(project)
+    content = _refresh(manager)
+    assert manager.refreshed == ["tree", "key_files", "description"]
+    assert "<!-- deepcoderx:tree -->\nDeepCoderX.md\nmod0.py" in content
+    assert "### requirements.txt" in content
+    assert (project / ".deepcoderx" / "context_state.json").exists()
+
+def test_unchanged_inputs_leave_file_alone(project):
+    """Tests that a refresh with no input changes does not rewrite the file."""
+    manager = _manager(project)
+    _refresh(manager)
+    mtime = manager.context_file_path.stat().st_mtime_ns
+    assert _refresh(manager) == manager.read_context_file()
+    assert manager.refreshed == []
+    assert manager.context_file_path.stat().st_mtime_ns == mtime
+
+def test_only_changed_section_is_regenerated_and_log_is_kept(project):
+    """Tests that a key file change re-renders that section only and keeps appended entries."""
+    manager = _manager(project)
+    _refresh(manager)
+    with open(manager.context_file_path, "a") as f:
+        f.write("\n**Oct 19, 2026**: Refactored the parser\n")
+    (project / "requirements.txt").write_text("requests\nrich\n")
+    _bump(project / "requirements.txt")
+
+    content = _refresh(manager)
+    assert manager.refreshed == ["key_files"]
+    assert "requests\nrich" in content
+    assert content.endswith("Refactored the parser\n")
+
+def test_tree_waits_for_staleness_threshold(project):
+    """Tests that small tree drift accumulates until it crosses the threshold."""
+    manager = _manager(project)
+    _refresh(manager)
+    with patch("services.context_manager.config.CONTEXT_REFRESH_THRESHOLD", 0.08):
+        (project / "new_a.py").write_text("y = 2\n")
+        assert "new_a.py" not in _refresh(manager)
+        assert manager.refreshed == []
+        (project / "new_b.py").write_text("y = 2\n")
+        content = _refresh(manager)
+    assert manager.refreshed == ["tree"]
+    assert "new_a.py" in content and "new_b.py" in content
+
+def test_force_refreshes_tree_and_rebuilds_legacy_files(project):
+    """Tests that a forced refresh ignores the threshold and rebuilds files without section markers."""
+    manager = _manager(project)
+    manager.context_file_path.write_text("old context without markers")
+    assert _refresh(manager) == "old context without markers"
+    content = _refresh(manager, force=True)
+    assert "<!-- deepcoderx:description -->" in content
+
+    (project / "new_a.py").write_text("y = 2\n")
+    assert "new_a.py" in _refresh(manager, force=True)
+    assert manager.refreshed == ["tree"]
@@ -0,0 +1,124 @@
+import threading
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from services.project_index import ProjectIndex
+from services.code_search import CodeSearchIndex
+from services.embedding_index import EmbeddingIndex, fuse_rankings, normalize
+
+# Stand-in for the GGUF model: words map onto a few "concepts", so related
+# words land close together without sharing any spelling.
+CONCEPTS = [
+    {"invoice", "payment", "charge", "billing", "money", "card"},
+    {"user", "account", "signup", "person", "profile"},
+    {"file", "disk", "path", "directory"},
+]
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        vectors = np.zeros((len(texts), len(CONCEPTS) + 1), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = text.lower().replace("_", " ").replace("(", " ").split()
+            for word in words:
+                hits = [i for i, concept in enumerate(CONCEPTS) if word in concept]
+                for i in hits:
+                    vectors[row, i] += 1
+            vectors[row, -1] = 0.1
+        return normalize(vectors)
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "billing.py").write_text(
+        "def settle(invoice):\n"
+        "    return charge(invoice.card, invoice.money)\n"
+    )
+    (tmp_path / "accounts.py").write_text(
+        "def register(person):\n"
+        "    return create_profile(person, account=True)\n"
+    )
+    return tmp_path
+
+def _index(root, embedder):
+    return EmbeddingIndex(CodeSearchIndex(ProjectIndex(root)), embed_fn=embedder)
+
+def test_search_matches_by_meaning(project):
+    """Tests that a query with no shared keywords finds the related chunk."""
+    index = _index(project, FakeEmbedder())
+    assert index.update() == {"embedded": 2, "removed": 0}
+    results = index.search("where do we handle payment")
+    assert results[0]["path"] == "billing.py"
+    assert index.search("new user signup")[0]["path"] == "accounts.py"
+
+def test_vectors_persist_and_only_changed_chunks_are_embedded(project):
+    """Tests that stored vectors are memory-mapped on reload and unchanged chunks are not re-embedded."""
+    embedder = FakeEmbedder()
+    _index(project, embedder).update()
+    assert (project / ".deepcoderx" / "embeddings.npy").exists()
+
+    (project / "billing.py").write_text("def refund(payment):\n    return payment\n\n\n")
+    reloaded = _index(project, embedder)
+    reloaded.search_index.index.last_refresh = 0
+    embedder.calls.clear()
+    assert reloaded.update() == {"embedded": 1, "removed": 1}
+    assert len(embedder.calls[0]) == 1 and embedder.calls[0][0].startswith("billing.py")
+    assert isinstance(reloaded.matrix, np.memmap)
+    assert reloaded.search("money")[0]["name"] == "refund"
+
+def test_background_update_marks_ready(project):
+    """Tests that the background worker builds the index and sets the ready flag."""
+    index = _index(project, FakeEmbedder())
+    index.start_background_update().join(timeout=10)
+    assert index.ready.is_set()
+    assert len(index.rows) == 2
+
+def test_missing_model_is_reported(project):
+    """Tests that an unavailable model surfaces as an error instead of an empty index."""
+    index = _index(project, lambda texts: None)
+    with pytest.raises(RuntimeError):
+        index.update()
+    index.start_background_update().join(timeout=10)
+    assert not index.ready.is_set()
+    assert "no local embedding model" in index.last_error
+
+def test_fuse_rankings_rewards_agreement():
+    """Tests that reciprocal rank fusion puts chunks ranked well by both lists first."""
+    keyword = [{"id": 1}, {"id": 2}, {"id": 3}]
+    semantic = [{"id": 2}, {"id": 3}, {"id": 4}]
+    assert [r["id"] for r in fuse_rankings([keyword, semantic])] == [2, 3, 1, 4]
+
+def test_semantic_search_tool(project):
+    """Tests the semantic_search tool of the DeepSeek handler."""
+    from models.session import CommandContext
+    from services.llm_handler import DeepSeekAnalysisHandler
+    ctx = CommandContext(root_path=project, mcp_client=MagicMock(), sandbox_path=project)
+    with patch('services.llm_handler.config.DEEPSEEK_API_KEY', 'sk-' + 'a' * 24), \
+         patch('services.llm_handler.ContextManager', return_value=MagicMock()), \
+         patch('services.llm_handler.EmbeddingIndex.for_root', return_value=_index(project, FakeEmbedder())):
+        handler = DeepSeekAnalysisHandler(ctx)
+        output = handler._execute_tool({"tool": "semantic_search", "query": "billing"})
+    assert output.splitlines()[0].startswith("billing.py:1-2 settle")
+
+def test_semantic_search_tool_does_not_block_on_a_cold_index(project):
+    """Tests that the tool answers promptly while the first embedding pass is still running."""
+    from models.session import CommandContext
+    from services.llm_handler import DeepSeekAnalysisHandler
+    release = threading.Event()
+    embedder = FakeEmbedder()
+    slow = lambda texts: release.wait(10) and embedder(texts)
+    ctx = CommandContext(root_path=project, mcp_client=MagicMock(), sandbox_path=project)
+    index = _index(project, slow)
+    with patch('services.llm_handler.config.DEEPSEEK_API_KEY', 'sk-' + 'a' * 24), \
+         patch('services.llm_handler.config.SEMANTIC_SEARCH_WAIT_SECONDS', 0.2), \
+         patch('services.llm_handler.ContextManager', return_value=MagicMock()), \
+         patch('services.llm_handler.EmbeddingIndex.for_root', return_value=index):
+        handler = DeepSeekAnalysisHandler(ctx)
+        output = handler._execute_tool({"tool": "semantic_search", "query": "billing"})
+        assert "still being built" in output
+        release.set()
+        index.start_background_update().join(timeout=10)
+        output = handler._execute_tool({"tool": "semantic_search", "query": "billing"})
+    assert output.splitlines()[0].startswith("billing.py:1-2 settle")
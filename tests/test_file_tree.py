@@ -0,0 +1,44 @@
+from unittest.mock import patch
+from utils.file_tree import FileTreeRenderer
+
+PATHS = ["README.md", "src/app.py", "src/core/engine.py", "src/core/deep/a.py", "src/core/deep/b.py"]
+
+def test_renders_dirs_before_files():
+    """Tests the basic indented layout with directories first."""
+    tree = FileTreeRenderer(max_depth=0, max_entries=0, max_lines=0).render(PATHS)
+    assert tree.splitlines() == [
+        "src/", "    core/", "        deep/", "            a.py", "            b.py",
+        "        engine.py", "    app.py", "README.md",
+    ]
+
+def test_depth_cap_collapses_directories():
+    """Tests that directories at the depth limit are summarized with their file count."""
+    tree = FileTreeRenderer(max_depth=2, max_entries=0, max_lines=0).render(PATHS)
+    assert "    core/ (3 files)" in tree.splitlines()
+    assert "a.py" not in tree
+
+def test_entry_cap_summarizes_remaining_children():
+    """Tests that large directories list a prefix and count the rest."""
+    paths = [f"data/f{i:03}.csv" for i in range(300)] + ["data/sub/x.csv", "data/sub/y.csv"]
+    tree = FileTreeRenderer(max_depth=0, max_entries=3, max_lines=0).render(paths).splitlines()
+    assert tree == ["data/", "    sub/", "        x.csv", "        y.csv", "    f000.csv", "    f001.csv",
+                    "    ... 298 more files"]
+
+def test_line_cap():
+    """Tests that the total output is bounded."""
+    paths = [f"d{i}/f.py" for i in range(50)]
+    tree = FileTreeRenderer(max_depth=0, max_entries=0, max_lines=10).render(paths).splitlines()
+    assert len(tree) == 11
+    assert tree[-1] == "... tree truncated at 10 lines"
+
+def test_cache_reused_until_paths_change(tmp_path):
+    """Tests that rendering is skipped while the fingerprint is unchanged."""
+    renderer = FileTreeRenderer()
+    cache = tmp_path / "file_tree.json"
+    first = renderer.render_cached(PATHS, cache)
+    with patch.object(renderer, "render", wraps=renderer.render) as render:
+        assert renderer.render_cached(PATHS, cache) == first
+        assert render.call_count == 0
+        updated = renderer.render_cached(PATHS + ["new.py"], cache)
+        assert render.call_count == 1
+    assert "new.py" in updated
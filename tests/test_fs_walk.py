@@ -0,0 +1,50 @@
+from utils.fs_walk import FileWalker, GitIgnore
+from services.context_builder import CodeContextBuilder
+
+def _touch(root, *paths):
+    for rel in paths:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x = 1\n")
+
+def _rel(root, files):
+    return [f.relative_to(root).as_posix() for f in files]
+
+def test_prunes_hidden_and_ignored_dirs(tmp_path):
+    """Tests that hidden, vendored and cache directories are never entered."""
+    _touch(tmp_path, "app.py", "pkg/mod.py", ".git/hooks/x.py", "venv/lib/y.py",
+           "node_modules/z/index.js", "pkg/__pycache__/mod.py")
+    assert _rel(tmp_path, FileWalker(tmp_path).walk()) == ["app.py", "pkg/mod.py"]
+
+def test_honors_gitignore(tmp_path):
+    """Tests root and nested .gitignore rules, including negation and anchoring."""
+    _touch(tmp_path, "keep.py", "secret.log", "important.log", "out/gen.py", "src/out/real.py",
+           "src/tmp_a.py", "src/sub/tmp_b.py", "docs/notes.md")
+    (tmp_path / ".gitignore").write_text("*.log\n!important.log\n/out/\n")
+    (tmp_path / "src" / ".gitignore").write_text("**/tmp_*.py\n")
+    files = sorted(_rel(tmp_path, FileWalker(tmp_path).walk()))
+    assert files == ["docs/notes.md", "important.log", "keep.py", "src/out/real.py"]
+
+def test_extension_filter_and_file_cap(tmp_path):
+    """Tests that only wanted extensions are returned and the file cap truncates the walk."""
+    _touch(tmp_path, "a.py", "b.txt", "c.py", "d.py")
+    walker = FileWalker(tmp_path, extensions={".py"}, max_files=2)
+    assert _rel(tmp_path, walker.walk()) == ["a.py", "c.py"]
+    assert walker.truncated
+
+def test_gitignore_patterns():
+    """Tests translation of common gitignore globs."""
+    rules = GitIgnore()
+    rules.add_patterns(["build/", "docs/**/*.png", "*.py[co]"])
+    assert rules.is_ignored("pkg/build", True)
+    assert not rules.is_ignored("pkg/build", False)
+    assert rules.is_ignored("docs/a/b/c.png", False)
+    assert rules.is_ignored("docs/c.png", False)
+    assert rules.is_ignored("x/mod.pyc", False)
+    assert not rules.is_ignored("mod.py", False)
+
+def test_context_builder_uses_priority_order(tmp_path):
+    """Tests that discovered files are ranked by extension priority."""
+    _touch(tmp_path, "README.md", "src/main.py", "web/app.js", "venv/lib/site.py")
+    files = CodeContextBuilder(tmp_path)._discover_files()
+    assert _rel(tmp_path, files) == ["src/main.py", "web/app.js", "README.md"]
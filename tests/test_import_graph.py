@@ -0,0 +1,101 @@
+import os
+import pytest
+from unittest.mock import MagicMock
+from services.project_index import ProjectIndex
+from services.import_graph import ImportGraph
+from models.session import CommandContext
+
+def _write(root, files):
+    for rel, content in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+@pytest.fixture
+def project(tmp_path):
+    _write(tmp_path, {
+        "app.py": "import config\nfrom services import handler\n",
+        "config.py": "import os\n",
+        "services/__init__.py": "",
+        "services/handler.py": "from .util import helper\nfrom utils.log import log\n",
+        "services/util.py": "def helper(): pass\n",
+        "utils/__init__.py": "",
+        "utils/log.py": "import config\n",
+        "web/main.ts": "import { api } from './api';\nimport React from 'react';\n",
+        "web/api/index.ts": "export const api = 1;\n",
+    })
+    return tmp_path
+
+def _graph(root):
+    return ImportGraph(ProjectIndex(root))
+
+def test_resolves_imports_to_project_paths(project):
+    """Tests absolute, relative, package-submodule and JS index imports."""
+    graph = _graph(project).update()
+    assert graph.imports_of("app.py") == ["config.py", "services/__init__.py", "services/handler.py"]
+    assert graph.imports_of("services/handler.py") == ["services/util.py", "utils/log.py"]
+    assert graph.imports_of("web/main.ts") == ["web/api/index.ts"]
+    assert graph.imports_of("config.py") == []
+
+def test_reverse_and_transitive_dependents(project):
+    """Tests direct importers and the transitive set of affected files."""
+    graph = _graph(project).update()
+    assert graph.importers_of("config.py") == ["app.py", "utils/log.py"]
+    assert graph.dependents("services/util.py", transitive=False) == ["services/handler.py"]
+    assert graph.dependents("services/util.py") == ["app.py", "services/handler.py"]
+
+def test_strongly_connected_components(project):
+    """Tests that import cycles are reported as components."""
+    _write(project, {"a.py": "import b\n", "b.py": "import c\n", "c.py": "import a\n"})
+    graph = _graph(project).update()
+    assert graph.strongly_connected_components() == [["a.py", "b.py", "c.py"]]
+    assert "Import cycle: a.py, b.py, c.py" in graph.describe_dependents("b.py")
+
+def test_incremental_update(project):
+    """Tests that only files whose content changed are re-resolved."""
+    graph = _graph(project).update()
+    log = project / "utils" / "log.py"
+    log.write_text("import os\n")
+    os.utime(log, (log.stat().st_atime, log.stat().st_mtime + 10))
+    graph.index.last_refresh = 0
+    resolved = []
+    original = graph._resolve_all
+    graph._resolve_all = lambda path, record: resolved.append(path) or original(path, record)
+    graph.update()
+    assert resolved == ["utils/log.py"]
+    assert graph.importers_of("config.py") == ["app.py"]
+
+def test_find_dependents_tool(project):
+    """Tests the find_dependents agent tool."""
+    from services.llm_handler import DeepSeekAnalysisHandler
+    ctx = CommandContext(root_path=project, mcp_client=MagicMock(), sandbox_path=project)
+    handler = DeepSeekAnalysisHandler.__new__(DeepSeekAnalysisHandler)
+    handler.ctx = ctx
+    result = handler._execute_tool({"tool": "find_dependents", "path": str(project / "services" / "util.py")})
+    assert "Direct importers of services/util.py (1):\n- services/handler.py" in result
+    assert "- app.py" in result
+
+def test_stdlib_names_do_not_resolve_to_same_named_project_files(project):
+    """Tests that `import json` / `import os` never link to utils/json.py or lib/os.py."""
+    _write(project, {
+        "utils/json.py": "",
+        "lib/os.py": "",
+        "lib/a.py": "import os\nimport json\nfrom . import os as local_os\n",
+        "tool.py": "import json\nimport log\nimport utils.json\n",
+    })
+    graph = _graph(project).update()
+    assert graph.imports_of("config.py") == []
+    assert graph.imports_of("lib/a.py") == ["lib/os.py"]
+    assert graph.imports_of("tool.py") == ["utils/json.py"]
+
+def test_package_roots_and_relative_imports(tmp_path):
+    """Tests that src/ layouts resolve by full name and relative imports stay in their package."""
+    _write(tmp_path, {
+        "src/pkg/__init__.py": "",
+        "src/pkg/core.py": "from .util import helper\nfrom .. import setup\n",
+        "src/pkg/util.py": "",
+        "tests/test_core.py": "import pkg.core\nimport core\n",
+    })
+    graph = _graph(tmp_path).update()
+    assert graph.imports_of("src/pkg/core.py") == ["src/pkg/util.py"]
+    assert graph.imports_of("tests/test_core.py") == ["src/pkg/core.py"]
@@ -0,0 +1,76 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from services.intent_cache import IntentCache
+from services.nlu_parser import NLUParser
+from models.session import CommandContext
+
+@pytest.fixture
+def cache(tmp_path):
+    return IntentCache(tmp_path / "nlu_cache.json", max_entries=3)
+
+def test_template_shared_across_entity_values(cache):
+    """Tests that commands differing only in an entity value share one entry."""
+    cache.put("open up foo.py for me", {"intent": "read_file", "entities": {"path": "foo.py"}, "confidence": 0.9})
+    result = cache.get("open up Bar.py for me")
+    assert result == {"intent": "read_file", "entities": {"path": "Bar.py"}, "confidence": 0.9}
+
+def test_normalizes_case_whitespace_and_quotes(cache):
+    """Tests that case, whitespace, quote style and trailing punctuation are ignored."""
+    cache.put("open up 'notes.txt' for me", {"intent": "read_file", "entities": {"path": "notes.txt"}, "confidence": 0.9})
+    result = cache.get("OPEN  up “todo list.md” for me!")
+    assert result["entities"]["path"] == "todo list.md"
+
+def test_ignores_low_confidence_and_clarify(cache):
+    """Tests that only confident, non-clarify results are stored."""
+    cache.put("peek at a.py", {"intent": "read_file", "entities": {"path": "a.py"}, "confidence": 0.5})
+    cache.put("make something", {"intent": "clarify", "entities": {"reason": "?"}, "confidence": 0.9})
+    assert cache.get("peek at a.py") is None
+    assert cache.get("make something") is None
+
+def test_placeholder_only_template_is_not_stored(cache):
+    """Tests that a command consisting only of an entity is not cached."""
+    cache.put("ls -la", {"intent": "run_bash", "entities": {"command": "ls -la"}, "confidence": 0.9})
+    assert cache.get("pwd") is None
+
+def test_entities_are_replaced_as_whole_tokens_only(cache):
+    """Tests that an entity value inside a longer word is left alone and short values are not cached."""
+    cache.put("diff data.py against a.py", {"intent": "read_file", "entities": {"path": "a.py"}, "confidence": 0.9})
+    assert cache.template_for("diff data.py against a.py", {"entities": {"path": "a.py"}}) == "diff data.py against <path>"
+    assert cache.get("diff data.py against b.py")["entities"]["path"] == "b.py"
+
+    cache.put("add a line to a", {"intent": "write_file", "entities": {"path": "a"}, "confidence": 0.9})
+    assert cache.get("add a line to b") is None
+
+def test_lru_eviction(cache):
+    """Tests that the least recently used template is evicted first."""
+    for verb in ("alpha", "beta", "gamma"):
+        cache.put(f"{verb} x.py", {"intent": "read_file", "entities": {"path": "x.py"}, "confidence": 0.9})
+    assert cache.get("alpha y.py") is not None
+    cache.put("delta x.py", {"intent": "read_file", "entities": {"path": "x.py"}, "confidence": 0.9})
+    assert cache.get("beta y.py") is None
+    assert cache.get("alpha y.py") is not None
+
+def test_persists_across_instances(tmp_path):
+    """Tests that entries are reloaded from disk."""
+    path = tmp_path / "nlu_cache.json"
+    IntentCache(path).put("peek at a.py", {"intent": "read_file", "entities": {"path": "a.py"}, "confidence": 0.9})
+    assert IntentCache(path).get("peek at b.py")["entities"]["path"] == "b.py"
+
+@patch('services.nlu_parser.config')
+@patch('services.nlu_parser.requests.post')
+def test_nlu_parser_uses_cache(mock_post, mock_config, tmp_path):
+    """Tests that a repeated command phrasing is answered without a second API call."""
+    mock_config.DEEPSEEK_API_KEY = "sk-test"
+    mock_config.NLU_CACHE_ENABLED = True
+    mock_config.NLU_BACKEND = "deepseek"
+    mock_config.NLU_DEADLINE_SECONDS = 15
+    mock_config.NLU_MAX_RETRIES = 3
+    mock_post.return_value.json.return_value = {"choices": [{"message": {
+        "content": '{"intent": "read_file", "entities": {"path": "a.py"}, "confidence": 0.9}'}}]}
+    ctx = CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+    parser = NLUParser(ctx)
+
+    assert parser.parse_intent("peek at a.py")["entities"]["path"] == "a.py"
+    assert parser.parse_intent("peek at b.py")["entities"]["path"] == "b.py"
+    assert mock_post.call_count == 1
+    assert (tmp_path / ".deepcoderx" / "nlu_cache.json").exists()
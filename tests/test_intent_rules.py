@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from services.intent_rules import RuleBasedIntentParser
+from services.nlu_parser import NLUParser
+from models.session import CommandContext
+
+@pytest.fixture
+def parser():
+    return RuleBasedIntentParser()
+
+@pytest.mark.parametrize("command, intent, entities", [
+    ("list src", "list_dir", {"path": "src"}),
+    ("to list files in /some/path", "list_dir", {"path": "/some/path"}),
+    ("ls", "list_dir", {"path": "."}),
+    ("ls -la src", "list_dir", {"path": "src"}),
+    ("what's in the folder docs?", "list_dir", {"path": "docs"}),
+    ("read config.py", "read_file", {"path": "config.py"}),
+    ("cat 'my notes.txt'", "read_file", {"path": "my notes.txt"}),
+    ("show me what is in the file 'sunny.txt'", "read_file", {"path": "sunny.txt"}),
+    ("show me the contents of app.py.", "read_file", {"path": "app.py"}),
+    ('echo "hello world" > a.txt', "write_file", {"path": "a.txt", "content": "hello world"}),
+    ('create a new file called x.py with content "print(1)"', "write_file", {"path": "x.py", "content": "print(1)"}),
+    ("rm build", "delete_path", {"path": "build"}),
+    ("delete the file old.log", "delete_path", {"path": "old.log"}),
+    ("cd ..", "change_directory", {"path": ".."}),
+    ("go to src", "change_directory", {"path": "src"}),
+    ("mkdir -p a/b", "run_bash", {"command": "mkdir -p a/b"}),
+    ("run command pytest -q", "run_bash", {"command": "pytest -q"}),
+])
+def test_common_phrasings(parser, command, intent, entities, tmp_path):
+    """Tests that common phrasings of every intent are parsed deterministically."""
+    (tmp_path / "src").mkdir()
+    (tmp_path / "build").mkdir()
+    (tmp_path / "docs").mkdir()
+    result = parser.parse(command, cwd=tmp_path)
+    assert result["intent"] == intent
+    assert result["entities"] == entities
+    assert result["confidence"] >= 0.8
+
+@pytest.mark.parametrize("command", [
+    "create a file",
+    "run the tests",
+    "read config.py and summarize it",
+    "",
+])
+def test_ambiguous_commands_fall_through(parser, command):
+    """Tests that incomplete or compound commands are left to the LLM."""
+    assert parser.parse(command) is None
+
+@pytest.mark.parametrize("command", [
+    "delete everything",
+    "remove it",
+    "show status",
+    "print hello",
+    "display help",
+    "view logs",
+])
+def test_bare_words_are_not_taken_as_paths(parser, command, tmp_path):
+    """Tests that read, list and delete only fire on a path-like or existing argument."""
+    assert parser.parse(command, cwd=tmp_path) is None
+
+def test_existing_directory_is_listed_not_read(parser, tmp_path):
+    """Tests that a bare name is accepted when it exists, and a directory is listed."""
+    (tmp_path / "tests").mkdir()
+    assert parser.parse("show me the tests", cwd=tmp_path)["intent"] == "list_dir"
+    assert parser.parse("delete tests") is None
+
+@patch('services.nlu_parser.requests.post')
+def test_nlu_parser_skips_model_on_fast_path(mock_post):
+    """Tests that NLUParser answers fast-path commands without an API call."""
+    ctx = MagicMock(spec=CommandContext)
+    ctx.debug_mode = False
+    result = NLUParser(ctx).parse_intent("read config.py")
+    assert result["intent"] == "read_file"
+    mock_post.assert_not_called()
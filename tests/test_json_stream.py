@@ -0,0 +1,86 @@
+import json
+import time
+import pytest
+from utils.json_stream import JsonObjectExtractor, extract_json_objects, extract_tool_calls
+
+def test_extracts_nested_objects():
+    """Tests that nested objects are returned whole instead of stopping at the first '}'."""
+    text = 'Let me write it. {"tool": "write_file", "path": "a.json", "content": {"k": {"v": 1}}} done'
+    objects = extract_json_objects(text)
+    assert len(objects) == 1
+    assert json.loads(objects[0])["content"] == {"k": {"v": 1}}
+
+def test_braces_and_quotes_inside_strings():
+    """Tests that braces and escaped quotes inside string values are ignored."""
+    code = 'def f():\n    return {"a": "}\\"{"}\n'
+    call = json.dumps({"tool": "write_file", "path": "f.py", "content": code})
+    calls = extract_tool_calls(f"Writing now:\n{call}\nThat's it.")
+    assert len(calls) == 1
+    assert calls[0][1]["content"] == code
+
+def test_multiple_calls_and_non_tool_objects():
+    """Tests that several calls are found and objects without a tool key are skipped."""
+    text = '{"tool": "read_file", "path": "a"} {"note": 1} {"tool": "list_dir", "path": "."}'
+    calls = extract_tool_calls(text)
+    assert [c[1]["tool"] for c in calls] == ["read_file", "list_dir"]
+
+def test_invalid_tool_json_is_reported():
+    """Tests that a balanced but undecodable tool call is returned with parsed=None."""
+    calls = extract_tool_calls('{"tool": "read_file", path: a.txt}')
+    assert len(calls) == 1
+    assert calls[0][1] is None
+
+def test_unterminated_object_is_not_returned():
+    """Tests that an object which never closes yields nothing."""
+    assert extract_json_objects('Here: {"tool": "read_file", "path": "a.txt" malformed') == []
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7])
+def test_streaming_feed_matches_single_pass(chunk_size):
+    """Tests that feeding text in small chunks gives the same result as one pass."""
+    text = 'pre {"tool": "run_bash", "command": "echo \\"{}\\" \\\\"} mid {"a": {"b": "}"}} post'
+    extractor = JsonObjectExtractor()
+    seen = []
+    for i in range(0, len(text), chunk_size):
+        seen.extend(extractor.feed(text[i:i + chunk_size]))
+    assert seen == extract_json_objects(text)
+    assert len(seen) == 2
+    assert not extractor.in_object
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 1000])
+def test_unbalanced_brace_in_prose_does_not_hide_calls(chunk_size):
+    """Tests that a stray '{' in prose is skipped and the call after it is still found."""
+    text = 'Use a dict like {key: value. Now: {"tool": "read_file", "path": "a.py"}'
+    extractor = JsonObjectExtractor()
+    for i in range(0, len(text), chunk_size):
+        extractor.feed(text[i:i + chunk_size])
+    assert extractor.objects == ['{"tool": "read_file", "path": "a.py"}']
+    assert [c[1]["path"] for c in extract_tool_calls(text)] == ["a.py"]
+
+def test_invalid_candidate_is_rescanned_for_calls():
+    """Tests that a balanced object that fails to parse is searched for the calls inside it."""
+    text = 'Set {"x" then {"tool": "list_dir", "path": "."}}'
+    calls = extract_tool_calls(text)
+    assert [c[1]["tool"] for c in calls] == ["list_dir"]
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1000])
+def test_nested_calls_in_invalid_candidate_found_when_streamed(chunk_size):
+    """Tests that calls inside an invalid candidate are found however the text is chunked."""
+    text = 'Set {"x" then {"tool": "list_dir", "path": "."} and {"tool": "read_file", "path": "a"}} ok'
+    extractor = JsonObjectExtractor()
+    for i in range(0, len(text), chunk_size):
+        extractor.feed(text[i:i + chunk_size])
+    assert extractor.objects[1:] == ['{"tool": "list_dir", "path": "."}', '{"tool": "read_file", "path": "a"}']
+
+def test_deeply_nested_input_does_not_raise():
+    """Tests that nesting deeper than the JSON parser can recurse is treated as not a call."""
+    assert extract_tool_calls('{"a": ' * 3000 + '1' + '}' * 3000) == []
+
+def test_stray_braces_scan_in_linear_time():
+    """Tests that many invalid nested candidates do not make the scan quadratic."""
+    def elapsed(n):
+        text = '{"x": 1 {' * n + '}' * (2 * n)
+        started = time.perf_counter()
+        extract_tool_calls(text)
+        return time.perf_counter() - started
+    elapsed(100)
+    assert elapsed(8000) < 0.5
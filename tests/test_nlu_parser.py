@@ -0,0 +1,169 @@
+import json
+import threading
+import requests
+import pytest
+from unittest.mock import MagicMock, patch
+import services.nlu_parser as nlu_parser
+from services.nlu_parser import NLUParser, NLU_RESPONSE_SCHEMA
+from utils.telemetry import UsageRecorder
+from models.session import CommandContext
+
+@pytest.fixture
+def ctx(tmp_path):
+    return CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+
+@pytest.fixture(autouse=True)
+def reset_local_model():
+    nlu_parser._local_llm = None
+    nlu_parser._local_llm_failed = False
+    nlu_parser.share_coding_model(None, None)
+    yield
+    nlu_parser._local_llm = None
+    nlu_parser._local_llm_failed = False
+    nlu_parser.share_coding_model(None, None)
+
+@pytest.fixture
+def mock_config(tmp_path):
+    model_file = tmp_path / "nlu.gguf"
+    model_file.write_text("")
+    with patch('services.nlu_parser.config') as cfg:
+        cfg.NLU_BACKEND = "auto"
+        cfg.NLU_CACHE_ENABLED = False
+        cfg.NLU_DEADLINE_SECONDS = 15
+        cfg.NLU_MAX_RETRIES = 3
+        cfg.NLU_BACKOFF_BASE_SECONDS = 0.01
+        cfg.NLU_BACKOFF_MAX_SECONDS = 0.02
+        cfg.NLU_HEDGE_ENABLED = False
+        cfg.NLU_HEDGE_PERCENTILE = 95
+        cfg.DEEPSEEK_API_KEY = ""
+        cfg.LANGUAGE_MODEL_PATH = str(model_file)
+        cfg.LOCAL_MODEL_PATH = str(tmp_path / "missing.gguf")
+        yield cfg
+
+@patch('services.nlu_parser.requests.post')
+@patch('services.nlu_parser.Llama')
+def test_local_backend_uses_schema_and_works_offline(mock_llama, mock_post, mock_config, ctx, tmp_path):
+    """Tests that a local model parses intents with constrained JSON and no API key."""
+    mock_llama.return_value.create_chat_completion.return_value = {
+        'choices': [{'message': {'content': json.dumps(
+            {"intent": "read_file", "entities": {"path": "a.py"}, "confidence": 0.9})}}],
+        'usage': {'prompt_tokens': 300, 'completion_tokens': 20},
+    }
+    result = NLUParser(ctx).parse_intent("peek at a.py")
+
+    assert result["entities"]["path"] == "a.py"
+    mock_post.assert_not_called()
+    assert mock_llama.call_args.kwargs["model_path"] == mock_config.LANGUAGE_MODEL_PATH
+    kwargs = mock_llama.return_value.create_chat_completion.call_args.kwargs
+    assert kwargs["response_format"] == {"type": "json_object", "schema": NLU_RESPONSE_SCHEMA}
+    assert UsageRecorder(tmp_path).load()[0]["backend"] == "nlu-local"
+
+@patch('services.nlu_parser.Llama')
+def test_model_is_loaded_once(mock_llama, mock_config, ctx):
+    """Tests that the local NLU model is shared across parser instances."""
+    mock_llama.return_value.create_chat_completion.return_value = {
+        'choices': [{'message': {'content': '{"intent": "list_dir", "entities": {"path": "."}, "confidence": 0.9}'}}],
+    }
+    NLUParser(ctx).parse_intent("what have we got here")
+    NLUParser(ctx).parse_intent("what have we got over there")
+    assert mock_llama.call_count == 1
+
+@patch('services.nlu_parser.requests.post')
+@patch('services.nlu_parser.Llama', side_effect=ValueError("bad model"))
+def test_auto_falls_back_to_deepseek(mock_llama, mock_post, mock_config, ctx, tmp_path):
+    """Tests that auto mode uses DeepSeek when the local model cannot be loaded."""
+    mock_config.DEEPSEEK_API_KEY = "sk-test"
+    mock_post.return_value.json.return_value = {
+        "choices": [{"message": {"content": '{"intent": "read_file", "entities": {"path": "a.py"}, "confidence": 0.9}'}}],
+        "usage": {"prompt_tokens": 300, "completion_tokens": 20},
+    }
+    result = NLUParser(ctx).parse_intent("peek at a.py")
+    assert result["intent"] == "read_file"
+    assert mock_post.call_count == 1
+    assert UsageRecorder(tmp_path).load()[0]["backend"] == "nlu-deepseek"
+
+@patch('services.nlu_parser.Llama')
+def test_reuses_resident_coding_model_without_dedicated_path(mock_llama, mock_config, ctx):
+    """Tests that without LANGUAGE_MODEL_PATH the loaded coding model and its lock are reused, not reloaded."""
+    mock_config.LANGUAGE_MODEL_PATH = "/nonexistent/model.gguf"
+    coding_model, coding_lock = MagicMock(), threading.Lock()
+    coding_model.create_chat_completion.side_effect = lambda **kwargs: (
+        coding_lock.locked() or pytest.fail("called without the coding model's lock")) and {
+        'choices': [{'message': {'content': '{"intent": "list_dir", "entities": {"path": "."}, "confidence": 0.9}'}}]}
+    nlu_parser.share_coding_model(coding_model, coding_lock)
+
+    result = NLUParser(ctx).parse_intent("what have we got here")
+    assert result["intent"] == "list_dir"
+    mock_llama.assert_not_called()
+    assert coding_model.create_chat_completion.call_count == 1
+
+def test_no_backend_asks_for_configuration(mock_config, ctx):
+    """Tests that without a model file or API key the parser asks for configuration."""
+    mock_config.LANGUAGE_MODEL_PATH = "/nonexistent/model.gguf"
+    result = NLUParser(ctx).parse_intent("peek at a.py")
+    assert result["intent"] == "clarify"
+
+@pytest.fixture
+def clear_latencies():
+    for samples in NLUParser._latencies.values():
+        samples.clear()
+    yield
+    for samples in NLUParser._latencies.values():
+        samples.clear()
+
+def _deepseek_reply():
+    reply = MagicMock()
+    reply.json.return_value = {"choices": [{"message": {
+        "content": '{"intent": "read_file", "entities": {"path": "a.py"}, "confidence": 0.9}'}}]}
+    return reply
+
+@patch('services.nlu_parser.time.sleep')
+@patch('services.nlu_parser.requests.post')
+def test_retries_back_off_with_jitter(mock_post, mock_sleep, mock_config, ctx):
+    """Tests that failed attempts are retried with bounded, growing backoff."""
+    mock_config.NLU_BACKEND = "deepseek"
+    mock_config.DEEPSEEK_API_KEY = "sk-test"
+    mock_post.side_effect = [requests.exceptions.ConnectionError("down"),
+                             requests.exceptions.ConnectionError("down"), _deepseek_reply()]
+    parser = NLUParser(ctx)
+    assert parser.parse_intent("peek at a.py")["intent"] == "read_file"
+    assert parser.retries == 2
+    delays = [c.args[0] for c in mock_sleep.call_args_list]
+    assert all(0 <= d <= mock_config.NLU_BACKOFF_MAX_SECONDS for d in delays)
+
+@patch('services.nlu_parser.random.uniform', side_effect=lambda low, high: high)
+@patch('services.nlu_parser.requests.post')
+def test_deadline_caps_request_timeout(mock_post, mock_uniform, mock_config, ctx):
+    """Tests that no request may outlive the overall deadline."""
+    mock_config.NLU_BACKEND = "deepseek"
+    mock_config.DEEPSEEK_API_KEY = "sk-test"
+    mock_config.NLU_DEADLINE_SECONDS = 2
+    mock_post.side_effect = requests.exceptions.Timeout("slow")
+    mock_config.NLU_BACKOFF_BASE_SECONDS = 10
+    mock_config.NLU_BACKOFF_MAX_SECONDS = 10
+    result = NLUParser(ctx).parse_intent("peek at a.py")
+    assert result["intent"] == "clarify"
+    assert mock_post.call_count == 1
+    assert mock_post.call_args.kwargs["timeout"] <= 2
+
+@patch('services.nlu_parser.requests.post')
+def test_slow_request_is_hedged(mock_post, mock_config, ctx, clear_latencies):
+    """Tests that a request slower than the latency percentile gets a hedged duplicate."""
+    mock_config.NLU_BACKEND = "deepseek"
+    mock_config.DEEPSEEK_API_KEY = "sk-test"
+    mock_config.NLU_HEDGE_ENABLED = True
+    NLUParser._latencies["deepseek"].extend([0.05] * NLUParser.HEDGE_MIN_SAMPLES)
+    release = threading.Event()
+
+    def post(*args, **kwargs):
+        if mock_post.call_count == 1:
+            release.wait(2)
+            raise requests.exceptions.Timeout("stuck")
+        return _deepseek_reply()
+    mock_post.side_effect = post
+
+    parser = NLUParser(ctx)
+    assert parser.parse_intent("peek at a.py")["intent"] == "read_file"
+    release.set()
+    assert parser.hedges == 1
+    assert parser.retries == 0
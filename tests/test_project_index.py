@@ -0,0 +1,60 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from services.project_index import ProjectIndex
+from services.context_manager import ContextManager
+from models.session import CommandContext
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "core.py").write_text("import os, sys\nfrom pkg.util import helper\n\nclass Engine:\n    pass\n\ndef run():\n    pass\n")
+    (tmp_path / "pkg" / "util.py").write_text("def helper():\n    return 1\n")
+    (tmp_path / "README.md").write_text("# Demo\n")
+    return tmp_path
+
+def test_indexes_metadata_imports_and_symbols(project):
+    """Tests that each file is recorded with its language, hash, imports and symbols."""
+    index = ProjectIndex(project)
+    assert index.refresh(force=True)["added"] == 3
+
+    record = index.get("pkg/core.py")
+    assert record["language"] == "python"
+    assert len(record["hash"]) == 64
+    assert record["imports"] == ["os", "sys", "pkg.util", "pkg.util.helper"]
+    assert [s["name"] for s in record["symbols"]] == ["Engine", "run"]
+    matches = index.find_symbol("helper")
+    assert [(m["path"], m["kind"], m["line"]) for m in matches] == [("pkg/util.py", "function", 1)]
+
+def test_refresh_only_touches_changed_files(project):
+    """Tests that unchanged files are not re-read and deletions are dropped."""
+    index = ProjectIndex(project)
+    index.refresh(force=True)
+
+    util = project / "pkg" / "util.py"
+    util.write_text("def helper():\n    return 2\n\ndef other():\n    pass\n")
+    os.utime(util, (util.stat().st_atime, util.stat().st_mtime + 10))
+    (project / "README.md").unlink()
+
+    with patch.object(index.extractor, "extract_many", wraps=index.extractor.extract_many) as extract_many:
+        counts = index.refresh(force=True)
+    assert counts == {"added": 0, "updated": 1, "removed": 1, "unchanged": 1}
+    assert extract_many.call_args.args[0] == [util]
+    assert [s["name"] for s in index.get("pkg/util.py")["symbols"]] == ["helper", "other"]
+    assert index.get("README.md") is None
+
+def test_refresh_is_throttled(project):
+    """Tests that back-to-back refreshes within the interval skip the rescan."""
+    index = ProjectIndex(project)
+    index.refresh(force=True)
+    (project / "new.py").write_text("x = 1\n")
+    assert index.refresh()["added"] == 0
+    assert index.refresh(force=True)["added"] == 1
+
+def test_context_manager_tree_uses_index(project):
+    """Tests that the context file tree lists indexed files under their directories."""
+    (project / "node_modules" / "x").mkdir(parents=True)
+    (project / "node_modules" / "x" / "index.js").write_text("")
+    ctx = CommandContext(root_path=project, mcp_client=MagicMock(), sandbox_path=project)
+    tree = ContextManager(ctx)._get_file_tree()
+    assert tree.splitlines() == ["pkg/", "    core.py", "    util.py", "README.md"]
@@ -0,0 +1,62 @@
+import pytest
+from services.project_index import ProjectIndex
+from services.import_graph import ImportGraph
+from services.repo_map import RepoMap
+
+@pytest.fixture
+def project(tmp_path):
+    files = {
+        "core/models.py": "class User:\n    def save(self):\n        pass\n\ndef load_user(uid):\n    pass\n",
+        "core/db.py": "from core.models import User\n\ndef connect():\n    pass\n",
+        "api/views.py": "from core.models import User, load_user\nfrom core.db import connect\n\ndef show(uid):\n    pass\n",
+        "api/admin.py": "from core.models import User\n\ndef ban(uid):\n    pass\n",
+        "scripts/report.py": "def monthly_report():\n    pass\n",
+    }
+    for rel, content in files.items():
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text(content)
+    return tmp_path
+
+def _map(root):
+    return RepoMap(ImportGraph(ProjectIndex(root)))
+
+def test_central_files_rank_first(project):
+    """Tests that the most imported file gets the highest PageRank and leads the map."""
+    repo_map = _map(project)
+    text = repo_map.render("", max_tokens=1000)
+    ranks = repo_map.pagerank()
+    assert max(ranks, key=ranks.get) == "core/models.py"
+    assert abs(sum(ranks.values()) - 1) < 1e-6
+    assert text.splitlines()[0] == "core/models.py:"
+    assert "    class User" in text and "        def save(self)" in text
+
+def test_budget_keeps_highest_value_signatures(project):
+    """Tests that a small budget keeps only the most referenced definitions."""
+    text = _map(project).render("", max_tokens=12)
+    assert "class User" in text
+    assert "monthly_report" not in text
+
+def test_prompt_personalizes_ranking(project):
+    """Tests that files and symbols named in the prompt move to the top."""
+    repo_map = _map(project)
+    assert "monthly_report" not in repo_map.render("", max_tokens=12)
+    text = repo_map.render("why is scripts/report.py slow?", max_tokens=12)
+    assert text.splitlines()[0] == "scripts/report.py:"
+    assert "monthly_report" in repo_map.render("what calls monthly_report", max_tokens=12)
+
+def test_map_is_cached_until_the_graph_changes(project):
+    """Tests that rendering is cached per graph version and recomputed after a change."""
+    repo_map = _map(project)
+    first = repo_map.render("", max_tokens=1000)
+    version = repo_map.graph.version
+    db_rank = repo_map.pagerank()["core/db.py"]
+    repo_map.graph.index.last_refresh = 0
+    assert repo_map.render("", max_tokens=1000) is first
+
+    (project / "scripts/report.py").write_text("from core.db import connect\n\ndef monthly_report():\n    pass\n")
+    repo_map.graph.index.last_refresh = 0
+    repo_map.graph.index.refresh(force=True)
+    second = repo_map.render("", max_tokens=1000)
+    assert repo_map.graph.version == version + 1
+    assert second is not first
+    assert repo_map.pagerank()["core/db.py"] > db_rank
@@ -0,0 +1,74 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from services.response_cache import ResponseCache
+from models.session import CommandContext
+
+PAYLOAD = {"model": "deepseek-coder", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.1}
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(tmp_path / "cache.db", ttl=60, max_entries=2)
+
+def test_miss_then_hit(cache):
+    """Tests that a stored response is returned for an identical payload."""
+    assert cache.get(PAYLOAD) is None
+    cache.put(PAYLOAD, "hello")
+    assert cache.get(dict(PAYLOAD)) == "hello"
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+
+def test_key_depends_on_parameters(cache):
+    """Tests that changing a sampling parameter produces a different key."""
+    other = dict(PAYLOAD, temperature=0.7)
+    assert ResponseCache.key_for(PAYLOAD) != ResponseCache.key_for(other)
+    cache.put(PAYLOAD, "hello")
+    assert cache.get(other) is None
+
+def test_entries_expire_after_ttl(tmp_path):
+    """Tests that entries older than the TTL are treated as misses and removed."""
+    cache = ResponseCache(tmp_path / "cache.db", ttl=10, max_entries=10)
+    with patch('services.response_cache.time.time', return_value=1000.0):
+        cache.put(PAYLOAD, "old")
+    with patch('services.response_cache.time.time', return_value=1011.0):
+        assert cache.get(PAYLOAD) is None
+    assert cache.stats()["expired"] == 1
+    assert cache.stats()["entries"] == 0
+
+def test_lru_eviction(tmp_path):
+    """Tests that the least recently used entry is evicted when the cap is exceeded."""
+    cache = ResponseCache(tmp_path / "cache.db", ttl=10**10, max_entries=2)
+    payloads = [dict(PAYLOAD, messages=[{"role": "user", "content": str(i)}]) for i in range(3)]
+    with patch('services.response_cache.time.time', side_effect=[1.0, 2.0, 3.0, 4.0]):
+        cache.put(payloads[0], "0")
+        cache.put(payloads[1], "1")
+        cache.get(payloads[0])          # payload 1 is now least recently used
+        cache.put(payloads[2], "2")
+    assert cache.get(payloads[1]) is None
+    assert cache.get(payloads[0]) == "0"
+    assert cache.get(payloads[2]) == "2"
+    assert cache.stats()["evictions"] == 1
+
+def test_cache_persists_across_instances(tmp_path):
+    """Tests that entries and stats survive reopening the cache."""
+    ResponseCache(tmp_path / "cache.db").put(PAYLOAD, "persisted")
+    reopened = ResponseCache(tmp_path / "cache.db")
+    assert reopened.get(PAYLOAD) == "persisted"
+
+@patch('services.llm_handler.requests.post')
+def test_deepseek_handler_uses_cache(mock_post, tmp_path):
+    """Tests that a repeated analysis is served from the cache and --no-cache bypasses it."""
+    from services.llm_handler import DeepSeekAnalysisHandler
+    mock_post.return_value = MagicMock(status_code=200, json=lambda: {'choices': [{'message': {'content': 'Answer'}}]})
+    ctx = CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+
+    with patch('services.llm_handler.config.DEEPSEEK_CACHE_ENABLED', True), \
+         patch('services.llm_handler.config.DEEPSEEK_API_KEY', 'sk-' + 'a' * 24), \
+         patch('services.llm_handler.ContextManager', return_value=MagicMock()):
+        for user_input in ["@deepseek analyze", "@deepseek analyze", "@deepseek analyze --no-cache"]:
+            handler = DeepSeekAnalysisHandler(ctx)
+            handler.message_history = []
+            ctx.user_input = user_input
+            handler.handle()
+            assert ctx.response == "Answer"
+
+    assert mock_post.call_count == 2
@@ -0,0 +1,119 @@
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from services.session_db import SessionDatabase, open_session, format_session_list
+from services.session_store import SessionLog
+
+def _messages(n, start=0):
+    return [{"role": "user" if i % 2 else "assistant", "content": f"message {i}"} for i in range(start, start + n)]
+
+@pytest.fixture
+def database(tmp_path):
+    return SessionDatabase(tmp_path / "sessions.db")
+
+def test_named_sessions_resume_independently(database):
+    """Tests that each named session keeps and resumes its own window."""
+    work = database.session("local", "work")
+    work.sync(_messages(3))
+    database.session("local", "hobby").sync(_messages(1, start=10))
+
+    assert database.session("local", "work").load() == _messages(3)
+    assert database.session("local", "hobby").load() == _messages(1, start=10)
+    assert database.session("deepseek", "work").load() == []
+    listed = {(s["handler"], s["name"]): s["messages"] for s in database.list_sessions()}
+    assert listed == {("local", "work"): 3, ("local", "hobby"): 1, ("deepseek", "work"): 0}
+
+def test_trimmed_and_cleared_messages_stay_searchable(database):
+    """Tests that messages leaving the window are archived, not lost, and found by search."""
+    session = database.session("deepseek")
+    history = [{"role": "system", "content": "prompt"}] + _messages(10)
+    history[1] = {"role": "user", "content": "how does the parser handle unicode escapes?"}
+    session.sync(history)
+    history = [history[0]] + history[-8:]
+    session.sync(history)
+    assert database.session("deepseek").load() == history
+
+    hits = database.search("unicode parser")
+    assert len(hits) == 1
+    assert hits[0]["session"] == "default" and "[unicode]" in hits[0]["snippet"]
+
+    session.clear()
+    assert database.session("deepseek").load() == []
+    assert len(database.search("prompt")) == 1
+
+def test_search_without_fts_falls_back_to_like(database):
+    """Tests that search still works on SQLite builds without FTS5."""
+    database.session("local").sync([{"role": "user", "content": "Rename the Config class"}])
+    database.fts_enabled = False
+    assert [r["role"] for r in database.search("config class")] == ["user"]
+    assert database.search("missing") == []
+
+def test_retention_bounds_the_store(database):
+    """Tests that expired sessions, extra sessions and old archived messages are deleted."""
+    for name in ("a", "b", "c"):
+        database.session("local", name).sync(_messages(2))
+        time.sleep(0.01)
+    busy = database.session("local", "c")
+    busy.load()
+    busy.sync(_messages(1, start=50))  # archives the two earlier messages
+    with database._connect() as conn:
+        conn.execute("UPDATE sessions SET updated = 0 WHERE name = 'a'")
+
+    with patch("services.session_db.config.SESSION_RETENTION_DAYS", 30), \
+         patch("services.session_db.config.SESSION_MAX_SESSIONS", 1), \
+         patch("services.session_db.config.SESSION_MAX_ARCHIVED_MESSAGES", 1):
+        counts = database.apply_retention()
+    assert counts == {"sessions": 2, "messages": 5}
+    assert [s["name"] for s in database.list_sessions()] == ["c"]
+    assert database.session("local", "c").load() == _messages(1, start=50)
+
+def test_open_session_imports_jsonl_log(tmp_path):
+    """Tests that the first database session picks up an existing JSONL session log."""
+    log_path = tmp_path / ".deepcoderx" / "local_session.jsonl"
+    SessionLog(log_path).sync(_messages(2), durable=True)
+    session = open_session(tmp_path, "local")
+    assert session.load() == _messages(2)
+    assert not log_path.exists()
+
+    with patch("services.session_db.config.SESSION_STORE", "jsonl"):
+        assert isinstance(open_session(tmp_path, "local"), SessionLog)
+        assert open_session(tmp_path, "local", "batch-1").path.name == "local_batch-1_session.jsonl"
+
+def test_format_session_list_marks_current():
+    """Tests the session table rendering."""
+    table = format_session_list([{"handler": "local", "name": "work", "messages": 4, "updated": 0}], current="work")
+    assert "| **work** (current) | local | 4 |" in table
+    assert format_session_list([]) == "No saved sessions yet."
+
+@patch('services.llm_handler.Llama')
+def test_local_handler_switches_sessions(mock_llama, tmp_path):
+    """Tests that switching saves the current conversation and resumes the other one."""
+    from models.session import CommandContext
+    from services.llm_handler import LocalCodingHandler
+    ctx = CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+    handler = LocalCodingHandler(ctx)
+    system_prompt = handler.message_history[0]
+    handler.message_history.append({"role": "user", "content": "remember me"})
+
+    handler.switch_session("other")
+    assert handler.message_history == [system_prompt]
+    handler.switch_session("default")
+    assert handler.message_history[-1] == {"role": "user", "content": "remember me"}
+
+@pytest.mark.parametrize("store", ["sqlite", "jsonl"])
+def test_blob_references_found_in_either_store(tmp_path, store):
+    """Tests that live blob references are collected from JSONL logs as well as the database."""
+    from services.blob_store import BlobStore
+    from services.session_db import stored_contents_containing
+    blobs = BlobStore(tmp_path / ".deepcoderx" / "blobs")
+    live, dead = blobs.pack("l" * 5000), blobs.pack("d" * 5000)
+    with patch('services.session_db.config.SESSION_STORE', store):
+        session = open_session(tmp_path, "local", "review")
+        session.sync([{"role": "user", "content": "hi"}, {"role": "user", "content": live}], durable=True)
+        session.close()
+        contents = stored_contents_containing(tmp_path, "<<blob:")
+    assert contents == [live]
+    assert blobs.collect_garbage(contents, min_age_seconds=0) == 1
+    fresh = BlobStore(blobs.directory)
+    assert fresh.expand(live) == "l" * 5000
+    assert fresh.expand(dead) == "[Tool result no longer available]"
@@ -20,9 +20,15 @@ def command_context(tmp_path):
     ctx.debug_mode = True
     return ctx
 
+@pytest.fixture(autouse=True)
+def jsonl_store():
+    """These tests cover the per-handler JSONL session files."""
+    with patch('services.session_db.config.SESSION_STORE', 'jsonl'):
+        yield
+
 @pytest.mark.parametrize("handler_class, session_file_name", [
-    (DeepSeekAnalysisHandler, "deepseek_session.json"),
-    (LocalCodingHandler, "local_session.json"),
+    (DeepSeekAnalysisHandler, "deepseek_session.jsonl"),
+    (LocalCodingHandler, "local_session.jsonl"),
 ])
 @patch('services.llm_handler.requests.post')
 @patch('services.llm_handler.Llama')
@@ -41,11 +47,11 @@ def test_session_is_saved_to_file(mock_llama, mock_post, command_context, handle
     session_file = command_context.root_path / ".deepcoderx" / session_file_name
     assert session_file.exists()
 
-    # 4. Verify that the session file contains the correct history
+    # 4. Verify that the session log contains the correct history
     with open(session_file, "r") as f:
-        history = json.load(f)
-    assert len(history) > 0
-    assert history[-1]["content"] == "Test response"
+        records = [json.loads(line) for line in f]
+    assert len(records) > 0
+    assert records[-1] == {"op": "append", "message": {"role": "assistant", "content": "Test response"}}
 
 @pytest.mark.parametrize("handler_class, session_file_name", [
     (DeepSeekAnalysisHandler, "deepseek_session.json"),
@@ -53,7 +59,7 @@ def test_session_is_saved_to_file(mock_llama, mock_post, command_context, handle
 ])
 @patch('services.llm_handler.Llama')
 def test_session_is_loaded_from_file(mock_llama, command_context, handler_class, session_file_name):
-    """Tests that the session history is loaded from a file."""
+    """Tests that a legacy JSON session history is loaded and migrated to the log."""
     # 1. Create a dummy session file
     session_dir = command_context.root_path / ".deepcoderx"
     session_dir.mkdir()
@@ -67,6 +73,8 @@ def test_session_is_loaded_from_file(mock_llama, command_context, handler_class,
 
     # 3. Verify that the history was loaded
     assert handler.message_history == dummy_history
+    assert not session_file.exists()
+    assert session_file.with_suffix(".jsonl").exists()
 
 @pytest.mark.parametrize("handler_class, session_file_name", [
     (DeepSeekAnalysisHandler, "deepseek_session.json"),
@@ -0,0 +1,96 @@
+import json
+from unittest.mock import patch
+from services.session_store import SessionLog
+
+def _messages(n, start=0):
+    return [{"role": "user" if i % 2 else "assistant", "content": f"message {i}"} for i in range(start, start + n)]
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def test_sync_appends_only_new_messages(tmp_path):
+    """Tests that each sync logs just the messages added since the last one."""
+    log = SessionLog(tmp_path / "session.jsonl")
+    history = [{"role": "system", "content": "prompt"}] + _messages(2)
+    log.sync(history)
+    history += _messages(2, start=2)
+    log.sync(history)
+    log.sync(history)
+
+    records = _records(tmp_path / "session.jsonl")
+    assert [r["op"] for r in records] == ["append"] * 5
+    assert SessionLog(tmp_path / "session.jsonl").load() == history
+
+def test_trimmed_window_is_logged_as_drop(tmp_path):
+    """Tests that trimming the history window is recorded without rewriting kept messages."""
+    log = SessionLog(tmp_path / "session.jsonl")
+    history = [{"role": "system", "content": "prompt"}] + _messages(10)
+    log.sync(history)
+    history = [history[0]] + history[-8:] + _messages(1, start=10)
+    log.sync(history)
+
+    records = _records(tmp_path / "session.jsonl")
+    assert records[-2:] == [{"op": "drop", "start": 1, "count": 2},
+                            {"op": "append", "message": {"role": "assistant", "content": "message 10"}}]
+    assert SessionLog(tmp_path / "session.jsonl").load() == history
+
+def test_popped_message_is_dropped(tmp_path):
+    """Tests that removing the last message (e.g. on failover) is logged."""
+    log = SessionLog(tmp_path / "session.jsonl")
+    history = _messages(3)
+    log.sync(history)
+    history.pop()
+    log.sync(history)
+    assert SessionLog(tmp_path / "session.jsonl").load() == history
+
+def test_torn_last_line_is_ignored_and_repaired(tmp_path):
+    """Tests that a line cut short by a crash is skipped and the next append starts a new line."""
+    path = tmp_path / "session.jsonl"
+    SessionLog(path).sync(_messages(2))
+    with open(path, "a") as f:
+        f.write('{"op": "append", "message": {"role": "us')
+
+    log = SessionLog(path)
+    history = log.load()
+    assert history == _messages(2)
+    history.append({"role": "user", "content": "after crash"})
+    log.sync(history, durable=True)
+    assert SessionLog(path).load() == history
+
+def test_snapshots_bound_replay_and_compaction_rewrites(tmp_path):
+    """Tests that loading starts at the last snapshot and large logs are compacted."""
+    path = tmp_path / "session.jsonl"
+    with patch("services.session_store.config.SESSION_SNAPSHOT_EVERY", 4), \
+         patch("services.session_store.config.SESSION_COMPACT_BYTES", 10**9):
+        log = SessionLog(path)
+        history = []
+        for i in range(6):
+            history.append(_messages(1, start=i)[0])
+            log.sync(history)
+    ops = [r["op"] for r in _records(path)]
+    assert ops == ["append"] * 4 + ["snapshot"] + ["append"] * 2
+
+    with patch.object(SessionLog, "READ_BLOCK", 16):
+        reloaded = SessionLog(path)
+        assert reloaded.load() == history
+    assert reloaded._records_since_snapshot == 2
+
+    with patch("services.session_store.config.SESSION_SNAPSHOT_EVERY", 1), \
+         patch("services.session_store.config.SESSION_COMPACT_BYTES", 0):
+        history = history[-2:]
+        reloaded.sync(history)
+    assert _records(path) == [{"op": "snapshot", "messages": history}]
+    assert SessionLog(path).load() == history
+
+def test_legacy_session_is_migrated_and_clear_removes_logs(tmp_path):
+    """Tests that an old whole-file JSON session is converted and that clear() deletes it all."""
+    legacy = tmp_path / "session.json"
+    legacy.write_text(json.dumps(_messages(2), indent=2))
+    log = SessionLog(tmp_path / "session.jsonl", legacy_path=legacy)
+    assert log.load() == _messages(2)
+    assert not legacy.exists()
+    assert _records(tmp_path / "session.jsonl") == [{"op": "snapshot", "messages": _messages(2)}]
+
+    log.clear()
+    assert not (tmp_path / "session.jsonl").exists()
+    assert log.load() == []
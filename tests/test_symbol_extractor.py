@@ -0,0 +1,115 @@
+import os
+from unittest.mock import patch
+from services.symbol_extractor import SymbolExtractor, extract, extract_file
+
+PYTHON_SOURCE = '''
+import os.path
+from . import sibling
+from pkg.util import helper as h
+
+class Engine(Base):
+    """Runs jobs.
+
+    More detail.
+    """
+    def start(self, jobs: list, *, retries=3) -> bool:
+        """Start the engine."""
+        return True
+
+async def main():
+    pass
+'''
+
+def _by_name(symbols):
+    return {s["name"]: s for s in symbols}
+
+def test_python_symbols_and_imports():
+    """Tests that the AST extractor returns signatures, docstrings, parents and line ranges."""
+    result = extract(PYTHON_SOURCE, "python")
+    assert result["imports"] == ["os.path", ".", ".sibling", "pkg.util", "pkg.util.helper"]
+    symbols = _by_name(result["symbols"])
+    assert symbols["Engine"]["signature"] == "class Engine(Base)"
+    assert symbols["Engine"]["doc"] == "Runs jobs."
+    assert (symbols["Engine"]["line"], symbols["Engine"]["end_line"]) == (6, 13)
+    assert symbols["start"]["signature"] == "def start(self, jobs: list, *, retries=3) -> bool"
+    assert symbols["start"]["kind"] == "method"
+    assert symbols["start"]["parent"] == "Engine"
+    assert symbols["main"]["signature"] == "async def main()"
+
+def test_python_syntax_error_falls_back_to_regex():
+    """Tests that unparsable Python still yields top-level definitions."""
+    result = extract("def ok():\n    pass\n\ndef broken(:\n", "python")
+    assert [s["name"] for s in result["symbols"]] == ["ok", "broken"]
+
+def test_javascript_symbols_and_imports():
+    """Tests the tokenizer-level JavaScript extractor, ignoring code inside strings and comments."""
+    source = (
+        "import React from 'react';\n"
+        "const fs = require('fs');\n"
+        "// function notReal() {}\n"
+        "/** Renders the app. */\n"
+        "export function render(props) {\n"
+        "  const s = 'class Fake {}';\n"
+        "  return s;\n"
+        "}\n"
+        "class Store extends Base {\n"
+        "  constructor(x) { this.x = x; }\n"
+        "  get(key) {\n"
+        "    if (key) { return 1; }\n"
+        "  }\n"
+        "}\n"
+        "const add = (a, b) => a + b;\n"
+    )
+    result = extract(source, "javascript")
+    assert result["imports"] == ["react", "fs"]
+    symbols = _by_name(result["symbols"])
+    assert set(symbols) == {"render", "Store", "constructor", "get", "add"}
+    assert symbols["render"]["doc"] == "Renders the app."
+    assert (symbols["render"]["line"], symbols["render"]["end_line"]) == (5, 8)
+    assert (symbols["Store"]["line"], symbols["Store"]["end_line"]) == (9, 14)
+    assert symbols["get"]["parent"] == "Store"
+    assert symbols["get"]["end_line"] == 13
+
+def test_go_symbols_and_imports():
+    """Tests Go imports, functions, methods with receivers and type declarations."""
+    source = (
+        'package main\n'
+        'import (\n  "fmt"\n  "os"\n)\n'
+        '// Server handles requests.\n'
+        'type Server struct {\n  port int\n}\n'
+        'func (s *Server) Start() error {\n  return nil\n}\n'
+        'func main() {\n  fmt.Println("func fake() {")\n}\n'
+    )
+    result = extract(source, "go")
+    assert result["imports"] == ["fmt", "os"]
+    symbols = _by_name(result["symbols"])
+    assert set(symbols) == {"Server", "Start", "main"}
+    assert symbols["Server"]["kind"] == "struct"
+    assert symbols["Server"]["doc"] == "Server handles requests."
+    assert symbols["Start"]["parent"] == "Server"
+    assert (symbols["main"]["line"], symbols["main"]["end_line"]) == (13, 15)
+
+def test_results_are_cached_by_mtime(tmp_path):
+    """Tests that unchanged files are served from the cache and edits invalidate it."""
+    path = tmp_path / "mod.py"
+    path.write_text("def a():\n    pass\n")
+    extractor = SymbolExtractor(workers=1)
+    with patch('services.symbol_extractor.extract_file', wraps=extract_file) as spy:
+        extractor.extract_many([path])
+        extractor.extract_many([path])
+        assert spy.call_count == 1
+        path.write_text("def a():\n    pass\n\ndef b():\n    pass\n")
+        os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 10))
+        result = extractor.extract_many([path])
+        assert spy.call_count == 2
+    assert [s["name"] for s in result[str(path)]["symbols"]] == ["a", "b"]
+
+def test_large_batches_use_process_pool(tmp_path):
+    """Tests that big batches are analyzed in worker processes with the same results."""
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"m{i}.py"
+        path.write_text(f"def f{i}():\n    pass\n")
+        paths.append(path)
+    result = SymbolExtractor(workers=2, parallel_min_files=4).extract_many(paths)
+    assert [result[str(p)]["symbols"][0]["name"] for p in paths] == [f"f{i}" for i in range(6)]
@@ -0,0 +1,90 @@
+import json
+from unittest.mock import MagicMock, patch
+from utils.telemetry import UsageRecorder, percentile, summarize_usage, format_usage_summary
+from models.session import CommandContext
+
+def test_record_computes_tokens_per_sec(tmp_path):
+    """Tests that throughput excludes time-to-first-token and is written to disk."""
+    recorder = UsageRecorder(tmp_path)
+    entry = recorder.record("local", latency=3.0, prompt_tokens=100, completion_tokens=40, ttft=1.0, iteration=2)
+    assert entry["tokens_per_sec"] == 20.0
+
+    lines = (tmp_path / ".deepcoderx" / "llm_metrics.jsonl").read_text().splitlines()
+    assert json.loads(lines[0])["iteration"] == 2
+
+def test_file_rolls_over(tmp_path):
+    """Tests that the metrics file is rotated once it exceeds the size cap."""
+    recorder = UsageRecorder(tmp_path, max_bytes=200)
+    for i in range(10):
+        recorder.record("deepseek", latency=float(i))
+    assert (tmp_path / ".deepcoderx" / "llm_metrics.jsonl.1").exists()
+    # Only the two newest generations remain, oldest records first
+    latencies = [r["latency"] for r in recorder.load()]
+    assert latencies == sorted(latencies)
+    assert latencies[-1] == 9.0
+    assert len(latencies) < 10
+
+def test_percentile_nearest_rank():
+    """Tests the nearest-rank percentile."""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+def test_summary_groups_by_backend():
+    """Tests that summaries are grouped per backend with token totals."""
+    records = [
+        {"backend": "local", "latency": 1.0, "prompt_tokens": 10, "completion_tokens": 5, "tokens_per_sec": 5.0, "ttft": None},
+        {"backend": "local", "latency": 3.0, "prompt_tokens": 10, "completion_tokens": 5, "tokens_per_sec": 2.0, "ttft": None},
+        {"backend": "deepseek", "latency": 2.0, "prompt_tokens": 100, "completion_tokens": 50, "tokens_per_sec": 25.0, "ttft": None},
+    ]
+    summary = summarize_usage(records)
+    assert summary["local"]["calls"] == 2
+    assert summary["local"]["prompt_tokens"] == 20
+    assert summary["local"]["latency"][99] == 3.0
+    assert summary["deepseek"]["ttft"][50] is None
+
+    table = format_usage_summary(summary)
+    assert "| local | 2 |" in table
+    assert format_usage_summary({}) == "No model calls recorded yet."
+
+@patch('services.llm_handler.Llama')
+def test_local_handler_records_usage(mock_llama, tmp_path):
+    """Tests that every local model call is recorded with its tool-loop iteration."""
+    from services.llm_handler import LocalCodingHandler
+    mock_llama.return_value.create_chat_completion.return_value = {
+        'choices': [{'message': {'content': 'Hi'}}],
+        'usage': {'prompt_tokens': 12, 'completion_tokens': 3},
+    }
+    ctx = CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+    ctx.user_input = "hello"
+    LocalCodingHandler(ctx).handle()
+
+    records = UsageRecorder(tmp_path).load()
+    assert len(records) == 1
+    assert records[0]["backend"] == "local"
+    assert records[0]["prompt_tokens"] == 12
+    assert records[0]["iteration"] == 0
+
+@patch('services.llm_handler.Llama')
+def test_non_streaming_call_records_ttft_upper_bound(mock_llama, tmp_path, monkeypatch):
+    """Tests that an unconstrained local call records its latency as a flagged TTFT upper bound."""
+    from services.llm_handler import LocalCodingHandler
+    from config import config
+    monkeypatch.setattr(config, "LOCAL_CONSTRAINED_DECODING", False)
+    mock_llama.return_value.create_chat_completion.return_value = {
+        'choices': [{'message': {'content': 'Hi'}}],
+        'usage': {'prompt_tokens': 12, 'completion_tokens': 3},
+    }
+    ctx = CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+    ctx.user_input = "hello"
+    LocalCodingHandler(ctx).handle()
+
+    record = UsageRecorder(tmp_path).load()[0]
+    assert record["ttft_upper_bound"] is True
+    assert record["ttft"] == record["latency"]
+
+    summary = summarize_usage([record])
+    assert summary["local"]["ttft"][50] is not None
+    assert summary["local"]["ttft_upper_bounds"] == 1
+    assert "upper bound" in format_usage_summary(summary)
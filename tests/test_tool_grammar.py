@@ -0,0 +1,49 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from services.tool_grammar import LOCAL_TOOLS, build_tool_call_gbnf
+from services.llm_handler import LocalCodingHandler
+from models.session import CommandContext
+
+def test_grammar_has_rule_per_tool():
+    """Tests that every tool in the table gets its own grammar alternative."""
+    grammar = build_tool_call_gbnf()
+    for name, args in LOCAL_TOOLS.items():
+        assert f'"\\"{name}\\""' in grammar
+        for arg, _ in args:
+            assert f'"\\"{arg}\\""' in grammar
+    assert grammar.startswith("root ::= ws ( tool-call | text )")
+
+def test_grammar_without_free_text():
+    """Tests that allow_text=False only accepts tool calls."""
+    grammar = build_tool_call_gbnf(allow_text=False)
+    assert grammar.startswith("root ::= ws tool-call\n")
+    assert "text ::=" not in grammar
+
+@pytest.fixture
+def command_context(tmp_path):
+    ctx = CommandContext(root_path=tmp_path, mcp_client=MagicMock(), sandbox_path=tmp_path)
+    ctx.debug_mode = False
+    return ctx
+
+@patch('services.llm_handler.LlamaGrammar')
+@patch('services.llm_handler.Llama')
+def test_constrained_generation_stops_after_tool_call(mock_llama, mock_grammar, command_context):
+    """Tests that streaming stops as soon as a complete tool call has been emitted."""
+    consumed = []
+    def stream(**kwargs):
+        for delta in ['{"tool": ', '"read_file", "path": "a.txt"}', ' and more prose', ' never read']:
+            consumed.append(delta)
+            yield {'choices': [{'delta': {'content': delta}}]}
+
+    mock_llama.return_value.create_chat_completion.side_effect = stream
+    with patch('services.llm_handler.config.LOCAL_CONSTRAINED_DECODING', True):
+        handler = LocalCodingHandler(command_context)
+
+    assert handler.grammar is mock_grammar.from_string.return_value
+    text = handler._generate_response()
+
+    assert text == '{"tool": "read_file", "path": "a.txt"}'
+    assert len(consumed) == 2
+    _, kwargs = mock_llama.return_value.create_chat_completion.call_args
+    assert kwargs['grammar'] is handler.grammar
+    assert kwargs['stream'] is True
@@ -0,0 +1,75 @@
+import pytest
+from services.tool_results import ToolResultStore
+
+@pytest.fixture
+def store():
+    return ToolResultStore(max_chars=1000, turn_max_chars=1500, page_chars=400)
+
+def test_small_result_is_returned_unchanged(store):
+    """Tests that results under the cap pass through untouched."""
+    assert store.cap("read_file", "short output") == "short output"
+
+def test_large_result_is_excerpted_with_handle(store):
+    """Tests that an oversized result is replaced by a head/tail excerpt and a handle."""
+    text = "HEAD" + "x" * 5000 + "TAIL"
+    excerpt = store.cap("run_bash", text)
+
+    assert len(excerpt) < len(text)
+    assert "Handle: res-1" in excerpt
+    assert excerpt.split("\n")[1].startswith("HEAD")
+    assert excerpt.endswith("TAIL")
+
+def test_read_page_returns_full_content(store):
+    """Tests that paging through a handle reconstructs the original output."""
+    text = "".join(str(i % 10) for i in range(1100))
+    store.cap("read_file", text)
+
+    assert store.page_count("res-1") == 3
+    pages = [store.read_page("res-1", n).split("\n", 1)[1] for n in range(1, 4)]
+    assert "".join(pages) == text
+    assert "out of range" in store.read_page("res-1", 4)
+    assert "Unknown result handle" in store.read_page("res-99", 1)
+
+def test_turn_budget_limits_combined_results(store):
+    """Tests that the per-turn budget shrinks later results in the same turn."""
+    store.new_turn()
+    first = store.cap("read_file", "a" * 900)
+    second = store.cap("read_file", "b" * 900)
+    assert first == "a" * 900
+    assert "Handle:" in second
+
+    # A new turn restores the full allowance
+    store.new_turn()
+    assert store.cap("read_file", "c" * 900) == "c" * 900
+
+def test_read_result_pages_are_not_recapped(store):
+    """Tests that pages fetched via read_result are passed through as-is."""
+    page = "p" * 2000
+    assert store.cap("read_result", page) == page
+
+def test_handles_survive_a_restart_with_a_blob_store(tmp_path):
+    """Tests that a handle saved in history can still be paged by a new store after a restart."""
+    from services.blob_store import BlobStore
+    text = "".join(str(i % 10) for i in range(5000))
+    excerpt = ToolResultStore(max_chars=1000, page_chars=2000, blobs=BlobStore(tmp_path)).cap("run_bash", text)
+    handle = excerpt.split("Handle: ")[1].split(" ")[0]
+    assert "current session" not in excerpt
+
+    restarted = ToolResultStore(page_chars=2000, blobs=BlobStore(tmp_path))
+    pages = [restarted.read_page(handle, n).split("\n", 1)[1] for n in range(1, 4)]
+    assert "".join(pages) == text
+    assert BlobStore(tmp_path).collect_garbage([excerpt], min_age_seconds=0) == 0
+
+def test_in_memory_handles_say_they_are_session_only(store):
+    """Tests that without a blob store the excerpt warns the handle will not outlive the session."""
+    assert "only works in the current session" in store.cap("run_bash", "x" * 5000)
+
+def test_paged_reads_count_toward_the_turn_budget(store):
+    """Tests that pages fetched once the turn budget is spent are deferred to the next turn."""
+    store.cap("read_file", "y" * 5000)
+    store.new_turn()
+    store.cap("read_file", "a" * 1000)
+    store.cap("read_file", "b" * 300)
+    assert "Turn output limit reached" in store.cap("read_result", store.read_page("res-1", 1))
+    store.new_turn()
+    assert store.cap("read_result", store.read_page("res-1", 1)).startswith("[res-1 page 1/")
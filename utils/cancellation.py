@@ -0,0 +1,87 @@
+# utils/cancellation.py
+
+import os
+import time
+import signal
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Optional
+
+POLL_SECONDS = 0.1
+CANCELLED_MESSAGE = "[yellow]Request cancelled.[/]"
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cancellable")
+
+class RequestCancelled(BaseException):
+    """
+    Raised inside a request when the user cancels it (Ctrl-C in the REPL).
+
+    Derives from BaseException, like asyncio.CancelledError, so the broad
+    `except Exception` blocks around model and tool calls let it through to
+    CommandProcessor, which rolls the handler back.
+    """
+
+def cancel_event(ctx: Any) -> Optional[threading.Event]:
+    event = getattr(ctx, "cancel_event", None)
+    return event if isinstance(event, threading.Event) else None
+
+def is_cancelled(ctx: Any) -> bool:
+    event = cancel_event(ctx)
+    return event is not None and event.is_set()
+
+def check_cancelled(ctx: Any):
+    """Raises RequestCancelled if the current request was cancelled."""
+    if is_cancelled(ctx):
+        raise RequestCancelled()
+
+def run_cancellable(ctx: Any, fn: Callable, *args, **kwargs):
+    """
+    Calls `fn` on a worker thread and waits for it, raising RequestCancelled as
+    soon as the request is cancelled. The abandoned call finishes in the
+    background and its result is discarded; use it for calls that cannot be
+    interrupted themselves, like a blocking HTTP request.
+    """
+    if cancel_event(ctx) is None:
+        return fn(*args, **kwargs)
+    check_cancelled(ctx)
+    future = _executor.submit(fn, *args, **kwargs)
+    while True:
+        try:
+            return future.result(timeout=POLL_SECONDS)
+        except FutureTimeout:
+            check_cancelled(ctx)
+
+def run_subprocess(ctx: Any, command: str, timeout: float, cwd=None) -> subprocess.CompletedProcess:
+    """
+    subprocess.run(command, shell=True, capture_output=True, text=True) that
+    kills the command's whole process group when the request is cancelled
+    (raising RequestCancelled) or the timeout passes (raising TimeoutExpired).
+    """
+    process = subprocess.Popen(
+        command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=cwd,
+        start_new_session=(os.name == "posix")
+    )
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            stdout, stderr = process.communicate(timeout=POLL_SECONDS)
+            return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+        except subprocess.TimeoutExpired:
+            cancelled = is_cancelled(ctx)
+            if not cancelled and time.monotonic() < deadline:
+                continue
+            _kill(process)
+            process.communicate()
+            if cancelled:
+                raise RequestCancelled()
+            raise subprocess.TimeoutExpired(command, timeout)
+
+def _kill(process: subprocess.Popen):
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
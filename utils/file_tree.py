@@ -0,0 +1,100 @@
+# utils/file_tree.py
+
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import config
+
+class FileTreeRenderer:
+    """
+    Renders root-relative file paths as an indented tree with size caps.
+
+    Directories below `max_depth` collapse to a one-line summary, directories
+    with more than `max_entries` children list the first ones followed by
+    "... N more files", and the whole tree stops after `max_lines` lines.
+    Rendered trees can be cached on disk against a fingerprint of the paths.
+    """
+    INDENT = "    "
+
+    def __init__(self, max_depth: Optional[int] = None, max_entries: Optional[int] = None,
+                 max_lines: Optional[int] = None):
+        self.max_depth = max_depth if max_depth is not None else config.FILE_TREE_MAX_DEPTH
+        self.max_entries = max_entries if max_entries is not None else config.FILE_TREE_MAX_ENTRIES
+        self.max_lines = max_lines if max_lines is not None else config.FILE_TREE_MAX_LINES
+
+    def fingerprint(self, paths: List[str]) -> str:
+        """Changes whenever a path is added or removed, or the caps change."""
+        digest = hashlib.sha1(f"{self.max_depth}:{self.max_entries}:{self.max_lines}".encode())
+        for path in paths:
+            digest.update(path.encode("utf-8", errors="replace") + b"\n")
+        return digest.hexdigest()
+
+    @staticmethod
+    def _build(paths: Iterable[str]) -> Dict[str, Any]:
+        tree: Dict[str, Any] = {}
+        for path in paths:
+            node = tree
+            parts = path.split("/")
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node.setdefault(parts[-1], None)
+        return tree
+
+    @staticmethod
+    def _count(node: Dict[str, Any]) -> int:
+        return sum(1 if child is None else FileTreeRenderer._count(child) for child in node.values())
+
+    def render(self, paths: Iterable[str]) -> str:
+        lines: List[str] = []
+        self._render(self._build(paths), 0, lines)
+        if self.max_lines and len(lines) > self.max_lines:
+            lines = lines[:self.max_lines] + [f"... tree truncated at {self.max_lines} lines"]
+        return "\n".join(lines)
+
+    def _render(self, node: Dict[str, Any], depth: int, lines: List[str]):
+        indent = self.INDENT * depth
+        dirs = sorted(name for name, child in node.items() if child is not None)
+        files = sorted(name for name, child in node.items() if child is None)
+        entries = [(name, node[name]) for name in dirs] + [(name, None) for name in files]
+        shown = entries[:self.max_entries] if self.max_entries else entries
+
+        for name, child in shown:
+            if child is None:
+                lines.append(f"{indent}{name}")
+            elif self.max_depth and depth + 1 >= self.max_depth:
+                lines.append(f"{indent}{name}/ ({self._count(child)} files)")
+            else:
+                lines.append(f"{indent}{name}/")
+                self._render(child, depth + 1, lines)
+            # Stop early; render() trims to the exact cap
+            if self.max_lines and len(lines) > self.max_lines:
+                return
+
+        hidden = entries[len(shown):]
+        if hidden:
+            hidden_files = sum(1 if child is None else self._count(child) for _, child in hidden)
+            hidden_dirs = sum(1 for _, child in hidden if child is not None)
+            summary = f"... {hidden_files} more files"
+            if hidden_dirs:
+                summary += f" across {hidden_dirs} more directories"
+            lines.append(f"{indent}{summary}")
+
+    def render_cached(self, paths: List[str], cache_path: Path) -> str:
+        """Returns the cached rendering if the fingerprint still matches, otherwise re-renders and stores it."""
+        key = self.fingerprint(paths)
+        try:
+            cached = json.loads(Path(cache_path).read_text())
+            if cached.get("fingerprint") == key:
+                return cached["tree"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+        tree = self.render(paths)
+        try:
+            Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(cache_path).write_text(json.dumps({"fingerprint": key, "tree": tree}))
+        except OSError:
+            pass
+        return tree
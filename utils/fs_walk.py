@@ -0,0 +1,160 @@
+# utils/fs_walk.py
+
+import os
+import re
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+
+from config import config
+
+# Directories never worth descending into, in addition to hidden ones and .gitignore matches
+IGNORED_DIRS = {"venv", "env", "node_modules", "__pycache__", "site-packages", "dist", "build"}
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translates a gitignore glob into a regex over '/'-separated paths."""
+    regex, i = "", 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex += "/.*"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            regex += f"[{body}]"
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return regex
+
+class GitIgnore:
+    """
+    A stack of .gitignore rules, evaluated git-style: the last matching rule wins
+    and a leading '!' re-includes a path. Rules from a nested .gitignore apply
+    relative to its own directory.
+    """
+
+    def __init__(self):
+        # (base directory relative to the root, regex, negated, directory only, matches full path)
+        self.rules: List[Tuple[str, re.Pattern, bool, bool, bool]] = []
+
+    def add_file(self, gitignore: Path, base: str = ""):
+        try:
+            lines = gitignore.read_text(encoding="utf-8", errors="ignore").splitlines()
+        except OSError:
+            return
+        self.add_patterns(lines, base)
+
+    def add_patterns(self, lines: Iterable[str], base: str = ""):
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            # A slash anywhere but the end anchors the pattern to the .gitignore's directory
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if not line:
+                continue
+            self.rules.append((base, re.compile(_glob_to_regex(line)), negated, dir_only, anchored))
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        ignored = False
+        name = rel_path.rsplit("/", 1)[-1]
+        for base, regex, negated, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                sub_path = rel_path[len(base) + 1:]
+            else:
+                sub_path = rel_path
+            if regex.fullmatch(sub_path if anchored else name):
+                ignored = not negated
+        return ignored
+
+class FileWalker:
+    """
+    Single-pass, ignore-aware file discovery built on os.scandir.
+
+    Hidden entries, IGNORED_DIRS and .gitignore matches are pruned before
+    descending. The walk stops early once max_files files have been found or
+    max_seconds have elapsed; `truncated` records whether that happened.
+    """
+
+    def __init__(self, root_path: Path, extensions: Optional[Set[str]] = None,
+                 max_files: Optional[int] = None, max_seconds: Optional[float] = None,
+                 use_gitignore: bool = True):
+        self.root_path = Path(root_path)
+        self.extensions = set(extensions) if extensions else None
+        self.max_files = max_files if max_files is not None else config.FS_WALK_MAX_FILES
+        self.max_seconds = max_seconds if max_seconds is not None else config.FS_WALK_MAX_SECONDS
+        self.use_gitignore = use_gitignore
+        self.truncated = False
+
+    def walk(self) -> List[Path]:
+        """Returns matching files in a stable depth-first order."""
+        self.truncated = False
+        deadline = time.monotonic() + self.max_seconds if self.max_seconds else None
+        gitignore = GitIgnore()
+        files: List[Path] = []
+        stack = [(str(self.root_path), "")]
+        while stack:
+            dir_path, rel_dir = stack.pop()
+            if self.use_gitignore and os.path.isfile(os.path.join(dir_path, ".gitignore")):
+                gitignore.add_file(Path(dir_path) / ".gitignore", rel_dir)
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+
+            subdirs = []
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    if entry.name in IGNORED_DIRS or gitignore.is_ignored(rel_path, True):
+                        continue
+                    subdirs.append((entry.path, rel_path))
+                    continue
+                if self.extensions is not None and os.path.splitext(entry.name)[1] not in self.extensions:
+                    continue
+                if gitignore.is_ignored(rel_path, False):
+                    continue
+                files.append(Path(entry.path))
+                if self.max_files and len(files) >= self.max_files:
+                    self.truncated = True
+                    return files
+
+            if deadline is not None and time.monotonic() > deadline:
+                self.truncated = True
+                return files
+            # Reversed so the stack pops subdirectories in name order
+            stack.extend(reversed(subdirs))
+        return files
@@ -0,0 +1,175 @@
+# utils/json_stream.py
+
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Characters that can change the scanner state inside an object
+_SPECIAL = re.compile(r'[{}"\\]')
+# Deeper objects are never tool calls, and json.loads would recurse on them
+MAX_NESTING = 64
+
+class JsonObjectExtractor:
+    """
+    Incremental, single-pass extractor for top-level JSON objects embedded in text.
+
+    Tracks string literals, escapes and brace nesting, so objects containing
+    nested JSON or code with braces are returned whole. A '{' in prose that
+    cannot start an object is skipped. A balanced candidate that is not valid
+    JSON is returned too, followed by the largest valid objects nested in it;
+    their offsets are recorded during the scan, so nothing is scanned twice.
+    Text can be fed in arbitrary chunks (e.g. streamed tokens); each call
+    returns the objects completed by that chunk.
+    """
+    def __init__(self):
+        self.objects: List[str] = []
+        self.reset()
+
+    def reset(self):
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._opening = False
+        self._parts: List[str] = []
+        self._size = 0
+        # [start offset, nesting level, deepest level inside] per open object
+        self._open: List[List[int]] = []
+        # (start, end, height) of every closed object nested in the candidate
+        self._nested: List[Tuple[int, int, int]] = []
+
+    @property
+    def in_object(self) -> bool:
+        """True while an object has been opened but not yet closed."""
+        return self._depth > 0
+
+    def feed(self, chunk: str) -> List[str]:
+        completed = []
+        n = len(chunk)
+        pos, seg_start = 0, 0
+        # Offset in the current candidate of chunk[seg_start]
+        base = self._size
+
+        # A backslash at the end of the previous chunk escapes our first char
+        if self._escape and n:
+            pos, self._escape = 1, False
+
+        while pos < n:
+            if self._depth == 0:
+                start = chunk.find("{", pos)
+                if start == -1:
+                    break
+                self._depth, self._parts, seg_start, pos = 1, [], start, start + 1
+                base, self._open, self._nested = 0, [[0, 1, 1]], []
+                self._opening = True
+                continue
+
+            if self._opening:
+                # An object's first token is a key or its closing brace; anything
+                # else means the '{' was prose, so scanning resumes after it
+                while pos < n and chunk[pos].isspace():
+                    pos += 1
+                if pos == n:
+                    break
+                self._opening = False
+                if chunk[pos] not in '"}':
+                    self._depth, self._parts = 0, []
+                    continue
+
+            match = _SPECIAL.search(chunk, pos)
+            if not match:
+                pos = n
+                break
+            ch, pos = match.group(), match.end()
+
+            if self._in_string:
+                if ch == "\\":
+                    if pos < n:
+                        pos += 1
+                    else:
+                        self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+                self._open.append([base + pos - 1 - seg_start, self._depth, self._depth])
+            elif ch == "}":
+                self._depth -= 1
+                start, level, deepest = self._open.pop()
+                if self._open:
+                    self._open[-1][2] = max(self._open[-1][2], deepest)
+                    self._nested.append((start, base + pos - seg_start, deepest - level))
+                    continue
+                self._parts.append(chunk[seg_start:pos])
+                candidate = "".join(self._parts)
+                completed.append(candidate)
+                if deepest - level > MAX_NESTING or not _is_json(candidate):
+                    # A stray '{' may have swallowed real objects
+                    completed.extend(self._valid_nested(candidate))
+                self._parts, self._nested = [], []
+
+        if self._depth > 0:
+            self._parts.append(chunk[seg_start:])
+            self._size = base + n - seg_start
+        else:
+            self._size = 0
+
+        self.objects.extend(completed)
+        return completed
+
+    def _valid_nested(self, candidate: str) -> List[str]:
+        """The outermost valid objects nested in an invalid candidate, in order."""
+        found, covered = [], 0
+        for start, end, height in sorted(self._nested):
+            if start < covered or height > MAX_NESTING:
+                continue
+            text = candidate[start:end]
+            if _is_json(text):
+                found.append(text)
+                covered = end
+        return found
+
+def _is_json(candidate: str) -> bool:
+    try:
+        json.loads(candidate)
+    except (ValueError, RecursionError):
+        return False
+    return True
+
+def extract_json_objects(text: str) -> List[str]:
+    """Returns every complete top-level JSON object found in `text`."""
+    return JsonObjectExtractor().feed(text)
+
+def parse_tool_call(candidate: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Classifies a candidate object.
+
+    Returns (is_tool_call, parsed). `parsed` is None when the candidate looks
+    like a tool call but is not valid JSON.
+    """
+    try:
+        parsed = json.loads(candidate)
+    except (json.JSONDecodeError, RecursionError):
+        return ('"tool"' in candidate, None)
+    if isinstance(parsed, dict) and "tool" in parsed:
+        return (True, parsed)
+    return (False, None)
+
+def extract_tool_calls(text: str) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Finds tool calls in a model response.
+
+    Returns a list of (raw_json, parsed) pairs; `parsed` is None for calls
+    that could not be decoded. Objects without a "tool" key are ignored.
+    """
+    classified = [(candidate, *parse_tool_call(candidate)) for candidate in extract_json_objects(text)]
+    calls = []
+    for candidate, is_tool_call, parsed in classified:
+        if not is_tool_call:
+            continue
+        # An undecodable span that merely wraps a valid call (a stray brace before it) is not a call
+        if parsed is None and any(p is not None and c in candidate for c, _, p in classified if c is not candidate):
+            continue
+        calls.append((candidate, parsed))
+    return calls
@@ -0,0 +1,142 @@
+# utils/telemetry.py
+
+import json
+import math
+import time
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import config
+
+class UsageRecorder:
+    """
+    Appends one JSON record per model call to .deepcoderx/llm_metrics.jsonl.
+
+    The file is rolled over to llm_metrics.jsonl.1 once it exceeds
+    TELEMETRY_MAX_BYTES, so at most two generations are kept on disk.
+    """
+    FILE_NAME = "llm_metrics.jsonl"
+    _lock = threading.Lock()
+
+    def __init__(self, root_path: Path, max_bytes: Optional[int] = None):
+        self.path = Path(root_path) / ".deepcoderx" / self.FILE_NAME
+        self.max_bytes = max_bytes or config.TELEMETRY_MAX_BYTES
+
+    def record(self, backend: str, latency: float, prompt_tokens: Optional[int] = None,
+               completion_tokens: Optional[int] = None, ttft: Optional[float] = None,
+               iteration: Optional[int] = None, ttft_upper_bound: bool = False,
+               **extra: Any) -> Dict[str, Any]:
+        """
+        Records a single model call and returns the stored record.
+
+        Non-streaming calls cannot observe the first token, so they pass
+        `ttft_upper_bound=True`: their TTFT is recorded as the full latency
+        and the record is flagged, and tokens/s uses the full latency too.
+        """
+        if ttft_upper_bound:
+            ttft = latency
+        generation_time = latency - ttft if ttft is not None and not ttft_upper_bound else latency
+        tokens_per_sec = None
+        if completion_tokens and generation_time > 0:
+            tokens_per_sec = round(completion_tokens / generation_time, 2)
+
+        entry = {
+            "ts": round(time.time(), 3),
+            "backend": backend,
+            "latency": round(latency, 4),
+            "ttft": round(ttft, 4) if ttft is not None else None,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_per_sec": tokens_per_sec,
+            "iteration": iteration,
+        }
+        if ttft_upper_bound:
+            entry["ttft_upper_bound"] = True
+        entry.update(extra)
+
+        if not config.TELEMETRY_ENABLED:
+            return entry
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                if self.path.exists() and self.path.stat().st_size > self.max_bytes:
+                    self.path.replace(self.path.with_name(self.FILE_NAME + ".1"))
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+        except OSError:
+            # Telemetry must never break a request
+            pass
+        return entry
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Reads all records from the rolled-over and current files, oldest first."""
+        records = []
+        for path in (self.path.with_name(self.FILE_NAME + ".1"), self.path):
+            if not path.exists():
+                continue
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        return records
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize_usage(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Groups records by backend and computes call counts, token totals and percentiles."""
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        grouped.setdefault(record.get("backend", "unknown"), []).append(record)
+
+    summary = {}
+    for backend, items in sorted(grouped.items()):
+        def values(key):
+            return [r[key] for r in items if isinstance(r.get(key), (int, float))]
+        latency, ttft, tps = values("latency"), values("ttft"), values("tokens_per_sec")
+        summary[backend] = {
+            "calls": len(items),
+            "prompt_tokens": sum(values("prompt_tokens")),
+            "completion_tokens": sum(values("completion_tokens")),
+            "latency": {p: percentile(latency, p) for p in (50, 90, 99)},
+            "ttft": {p: percentile(ttft, p) for p in (50, 90, 99)},
+            "ttft_upper_bounds": sum(1 for r in items if r.get("ttft_upper_bound")),
+            "tokens_per_sec": {p: percentile(tps, p) for p in (50, 90, 99)},
+        }
+    return summary
+
+def format_usage_summary(summary: Dict[str, Dict[str, Any]]) -> str:
+    """Renders a usage summary as a markdown table."""
+    if not summary:
+        return "No model calls recorded yet."
+
+    def fmt(stats, unit=""):
+        parts = [f"{stats[p]:.2f}{unit}" if stats[p] is not None else "-" for p in (50, 90, 99)]
+        return " / ".join(parts)
+
+    lines = [
+        "| Backend | Calls | Prompt tok | Completion tok | Latency p50/p90/p99 | TTFT p50/p90/p99 | Tok/s p50/p90/p99 |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    upper_bounds = False
+    for backend, stats in summary.items():
+        ttft = fmt(stats['ttft'], 's')
+        if stats.get('ttft_upper_bounds'):
+            ttft += " *"
+            upper_bounds = True
+        lines.append(
+            f"| {backend} | {stats['calls']} | {stats['prompt_tokens']} | {stats['completion_tokens']} "
+            f"| {fmt(stats['latency'], 's')} | {ttft} | {fmt(stats['tokens_per_sec'])} |"
+        )
+    if upper_bounds:
+        lines.append("")
+        lines.append("TTFT marked * includes non-streaming calls, recorded as their full latency (an upper bound).")
+    return "\n".join(lines)